@@ -0,0 +1,192 @@
+"""Background win estimates for a human player's options.
+
+While a human is deciding which card to play, a RolloutAdvisor plays random
+games from the current position in a background thread, round-robin over
+the valid cards, with the same determinized rollouts as the Monte Carlo CPU
+(monte_carlo.rollout). The main thread is blocked in input() and does not
+need the interpreter meanwhile, so a thread costs the prompt nothing, and
+it can read the live game without copying it to another process.
+
+On a terminal, the line above the prompt shows the estimates and is
+redrawn in place (with ANSI cursor save/restore) while the player types.
+Entering a move cancels the search after the rollout in progress.
+"""
+
+import random
+import sys
+import threading
+import time
+
+from collaborative_assignment_card_game_inst326 import Deck, Player
+from monte_carlo import rollout
+
+REFRESH_SECONDS = 0.5
+
+# Save the cursor, go to the start of the line above, clear it ... restore.
+_LINE_ABOVE = "\0337\033[1A\r\033[2K"
+_RESTORE = "\0338"
+
+
+class RolloutAdvisor:
+    """Estimates the win rate of every valid card while a human decides.
+
+    One advisor can serve every human player of a game; it runs for one
+    decision at a time, between start and stop.
+
+    Attributes:
+        refresh (float): Seconds between redraws of the estimate line.
+        stream (file): Where the estimates are written.
+        rng (random.Random): Source of the rollout seeds.
+        cards (list[Card]): The valid cards of the current decision, in the
+            order the prompt lists them.
+        moves (list[tuple]): (card id, suit or None) moves searched; a wild
+            card is tried with every suit.
+        scores (list[float]): Total rollout score per move.
+        visits (list[int]): Rollouts per move.
+    """
+
+    def __init__(self, refresh=REFRESH_SECONDS, stream=None, seed=None):
+        """Creates an idle advisor.
+
+        Args:
+            refresh (float, optional): Seconds between redraws. Defaults to
+                REFRESH_SECONDS.
+            stream (file, optional): Output stream. Defaults to sys.stdout.
+            seed (int, optional): Seed for the rollouts. Defaults to None.
+        """
+        self.refresh = refresh
+        self.stream = stream if stream is not None else sys.stdout
+        self.rng = random.Random(seed)
+        self.cards = []
+        self.moves = []
+        self.scores = []
+        self.visits = []
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._shown = False
+
+    def start(self, game, seat, cards):
+        """Starts estimating in the background.
+
+        Args:
+            game (Game): The game, with seat to move. It is only read, once,
+                before this returns.
+            seat (int): The seat of the deciding player.
+            cards (list[Card]): The valid cards, as the prompt lists them.
+
+        Side effects:
+            Starts a daemon thread; stops the previous search first.
+        """
+        self.stop()
+        state = game.snapshot()
+        moves = []
+        for card in cards:
+            if card.ranktype == "8":
+                moves.extend((card.id, suit) for suit in Deck.SUITS)
+            else:
+                moves.append((card.id, None))
+        self.cards = list(cards)
+        self.moves = list(dict.fromkeys(moves))
+        self.scores = [0.0] * len(self.moves)
+        self.visits = [0] * len(self.moves)
+        self._stop.clear()
+        self._shown = False
+        self._thread = threading.Thread(
+            target=self._search, args=(state, seat, self.rng.getrandbits(64)),
+            daemon=True)
+        self._thread.start()
+
+    def _search(self, state, seat, seed):
+        """Runs rollouts round-robin until stopped, redrawing as it goes."""
+        rng = random.Random(seed)
+        players = [Player(f"Rollout {i + 1}", is_cpu=True)
+                   for i in range(len(state.hands))]
+        next_redraw = time.perf_counter() + self.refresh
+        while True:
+            for i, move in enumerate(self.moves):
+                if self._stop.is_set():
+                    return
+                score = rollout(state, seat, move, players, rng)
+                with self._lock:
+                    self.scores[i] += score
+                    self.visits[i] += 1
+                if time.perf_counter() >= next_redraw:
+                    self._redraw()
+                    next_redraw = time.perf_counter() + self.refresh
+
+    def _redraw(self):
+        """Rewrites the estimate line above the prompt, if it is shown."""
+        line = self.summary()
+        with self._write_lock:
+            if self._shown and not self._stop.is_set():
+                self.stream.write(_LINE_ABOVE + line + _RESTORE)
+                self.stream.flush()
+
+    def estimates(self):
+        """Returns the current estimate for every valid card.
+
+        Returns:
+            list[tuple]: (win rate or None, rollouts, best suit or None) per
+            card of the prompt; the suit is the one to pick after an 8.
+        """
+        with self._lock:
+            by_card = {}
+            for (card_id, suit), score, count in zip(self.moves, self.scores,
+                                                     self.visits):
+                rate = score / count if count else None
+                best = by_card.get(card_id)
+                if best is None:
+                    by_card[card_id] = (rate, count, suit)
+                elif rate is not None and (best[0] is None or rate > best[0]):
+                    by_card[card_id] = (rate, best[1] + count, suit)
+                else:
+                    by_card[card_id] = (best[0], best[1] + count, best[2])
+            return [by_card[card.id] for card in self.cards]
+
+    def summary(self):
+        """Formats the estimates as one line.
+
+        Returns:
+            str: The win estimate per option number, e.g.
+            "Advisor: 1: 54%  2: 61% -> CLUBS  [420 rollouts]".
+        """
+        parts = []
+        total = 0
+        for i, (rate, count, suit) in enumerate(self.estimates(), 1):
+            total += count
+            text = f"{i}: {'--' if rate is None else f'{rate:.0%}'}"
+            if suit is not None:
+                text += f" -> {suit}"
+            parts.append(text)
+        return f"Advisor: {'  '.join(parts)}  [{total} rollouts]"
+
+    def show(self):
+        """Prints the estimate line; call it right before the prompt.
+
+        On a terminal the line is then redrawn in place until stop.
+
+        Side effects:
+            Writes one line to the stream.
+        """
+        if self._thread is None:
+            return
+        line = self.summary()
+        with self._write_lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+            self._shown = self.stream.isatty()
+
+    def stop(self):
+        """Cancels the search and waits for the rollout in progress.
+
+        Side effects:
+            Stops the background thread; the estimates are kept.
+        """
+        self._stop.set()
+        with self._write_lock:
+            self._shown = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,423 @@
+"""Streaming statistics over many games.
+
+GameAggregate consumes game results one at a time and keeps only counters
+and histograms, so its memory does not grow with the number of games.
+Aggregates of separate streams (e.g. one per worker process) merge into
+one. A game result is a dict like the ones play_headless_game returns with
+keep_moves=True: "winner" (seat or None), "turns", "reshuffles" and
+"moves" (the (seat, card id or None, suit or None) entries of Game.moves).
+
+Streams can come from live simulations (simulation.headless_games) or from
+a stored journal (journal_games):
+
+    python3 analytics.py -n 100000 --seed 1
+    python3 analytics.py --journal games.journal
+"""
+
+import math
+import os
+import random
+import sys
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+
+from collaborative_assignment_card_game_inst326 import CARDS, Deck
+from journal import FLAG_RESHUFFLE, FLAG_WIN, NO_CARD, JournalReader
+from simulation import MAX_TURNS, headless_games, split_games
+
+Z_95 = 1.959964
+
+
+def wilson_interval(successes, trials, z=Z_95):
+    """Confidence interval for a proportion (Wilson score interval).
+
+    Args:
+        successes (int): Number of successes.
+        trials (int): Number of trials.
+        z (float, optional): Normal quantile. Defaults to Z_95 (95%).
+
+    Returns:
+        tuple[float, float]: Lower and upper bound; (0, 1) without trials.
+    """
+    if not trials:
+        return 0.0, 1.0
+    p = successes / trials
+    denominator = 1 + z * z / trials
+    centre = (p + z * z / (2 * trials)) / denominator
+    half = z * math.sqrt(p * (1 - p) / trials
+                         + z * z / (4 * trials * trials)) / denominator
+    return max(0.0, centre - half), min(1.0, centre + half)
+
+
+class GameAggregate:
+    """Mergeable counters over a stream of game results.
+
+    Attributes:
+        n_players (int): Players in every game.
+        games (int): Games added.
+        wins (list[int]): Wins per seat.
+        first_wins (int): Games won by the seat that moved first.
+        draws (int): Games without a winner.
+        lengths (dict[int, int]): Number of games per game length in turns.
+        length_mean (float): Mean game length.
+        length_m2 (float): Sum of squared deviations from length_mean.
+        reshuffles (dict[int, int]): Number of games per count of deck
+            reloads.
+        cards_played (int): Cards played in all games.
+        winner_cards (int): Cards played by the eventual winners.
+        draw_turns (int): Turns on which a player drew instead of playing.
+        actions (dict[str, int]): Plays of each action card.
+        winner_actions (dict[str, int]): Plays of each action card by the
+            eventual winner.
+        eights (int): 8s played.
+        suit_picks (dict[str, int]): Suits chosen with an 8.
+    """
+
+    def __init__(self, n_players):
+        """Creates an empty aggregate.
+
+        Args:
+            n_players (int): Players in every game.
+        """
+        self.n_players = n_players
+        self.games = 0
+        self.wins = [0] * n_players
+        self.first_wins = 0
+        self.draws = 0
+        self.lengths = {}
+        self.length_mean = 0.0
+        self.length_m2 = 0.0
+        self.reshuffles = {}
+        self.cards_played = 0
+        self.winner_cards = 0
+        self.draw_turns = 0
+        self.actions = dict.fromkeys(Deck.ACTIONS, 0)
+        self.winner_actions = dict.fromkeys(Deck.ACTIONS, 0)
+        self.eights = 0
+        self.suit_picks = dict.fromkeys(Deck.SUITS, 0)
+
+    def add(self, result):
+        """Adds one game.
+
+        Args:
+            result (dict): The game's result, with its moves.
+
+        Side effects:
+            Updates the counters.
+        """
+        moves = result["moves"]
+        winner = result["winner"]
+        turns = result["turns"]
+        self.games += 1
+        if winner is None:
+            self.draws += 1
+        else:
+            self.wins[winner] += 1
+            if moves and moves[0][0] == winner:
+                self.first_wins += 1
+
+        self.lengths[turns] = self.lengths.get(turns, 0) + 1
+        delta = turns - self.length_mean
+        self.length_mean += delta / self.games
+        self.length_m2 += delta * (turns - self.length_mean)
+        count = result["reshuffles"]
+        self.reshuffles[count] = self.reshuffles.get(count, 0) + 1
+
+        actions, winner_actions = self.actions, self.winner_actions
+        for seat, cid, suit in moves:
+            if cid is None:
+                self.draw_turns += 1
+                continue
+            self.cards_played += 1
+            by_winner = seat == winner
+            if by_winner:
+                self.winner_cards += 1
+            if suit is not None:
+                self.eights += 1
+                self.suit_picks[suit] += 1
+            action = CARDS[cid].action
+            if action:
+                actions[action] += 1
+                if by_winner:
+                    winner_actions[action] += 1
+
+    def merge(self, other):
+        """Adds another aggregate (e.g. from a worker) to this one.
+
+        Args:
+            other (GameAggregate): Aggregate to merge in.
+
+        Side effects:
+            Updates the counters.
+        """
+        games = self.games + other.games
+        if games:
+            delta = other.length_mean - self.length_mean
+            self.length_m2 += (other.length_m2
+                               + delta * delta * self.games * other.games / games)
+            self.length_mean += delta * other.games / games
+        self.games = games
+        self.wins = [a + b for a, b in zip(self.wins, other.wins)]
+        self.first_wins += other.first_wins
+        self.draws += other.draws
+        for turns, count in other.lengths.items():
+            self.lengths[turns] = self.lengths.get(turns, 0) + count
+        for reloads, count in other.reshuffles.items():
+            self.reshuffles[reloads] = self.reshuffles.get(reloads, 0) + count
+        self.cards_played += other.cards_played
+        self.winner_cards += other.winner_cards
+        self.draw_turns += other.draw_turns
+        for action in Deck.ACTIONS:
+            self.actions[action] += other.actions[action]
+            self.winner_actions[action] += other.winner_actions[action]
+        self.eights += other.eights
+        for suit in Deck.SUITS:
+            self.suit_picks[suit] += other.suit_picks[suit]
+
+    def consume(self, results):
+        """Adds every game of a stream.
+
+        Args:
+            results (iterable of dict): Game results.
+
+        Returns:
+            GameAggregate: This aggregate, for chaining.
+        """
+        for result in results:
+            self.add(result)
+        return self
+
+    def length_percentile(self, fraction):
+        """Returns a game length percentile from the histogram.
+
+        Args:
+            fraction (float): E.g. 0.5 for the median.
+
+        Returns:
+            int: The game length in turns.
+        """
+        target = fraction * self.games
+        seen = 0
+        for turns in sorted(self.lengths):
+            seen += self.lengths[turns]
+            if seen >= target:
+                return turns
+        return 0
+
+    def length_interval(self, z=Z_95):
+        """Confidence interval for the mean game length.
+
+        Args:
+            z (float, optional): Normal quantile. Defaults to Z_95 (95%).
+
+        Returns:
+            tuple[float, float]: Lower and upper bound.
+        """
+        if self.games < 2:
+            return self.length_mean, self.length_mean
+        half = z * math.sqrt(self.length_m2 / (self.games - 1) / self.games)
+        return self.length_mean - half, self.length_mean + half
+
+    def summary(self):
+        """Formats the statistics for the terminal.
+
+        Returns:
+            str: Multi-line report with 95% confidence intervals.
+        """
+        games = self.games or 1
+
+        def rate(successes, trials):
+            low, high = wilson_interval(successes, trials)
+            share = successes / trials if trials else 0.0
+            return f"{share:6.1%} [{low:.1%}, {high:.1%}]"
+
+        lines = [f"Games: {self.games}  Draws: {self.draws}",
+                 "Win rate by seat (95% CI):"]
+        for seat, wins in enumerate(self.wins):
+            lines.append(f"  Seat {seat + 1}: {rate(wins, self.games)}")
+        lines.append(f"  First player: {rate(self.first_wins, self.games)}")
+
+        low, high = self.length_interval()
+        lines.append(f"Game length: mean {self.length_mean:.1f} "
+                     f"[{low:.1f}, {high:.1f}], "
+                     f"median {self.length_percentile(0.5)}, "
+                     f"p90 {self.length_percentile(0.9)}, "
+                     f"p99 {self.length_percentile(0.99)}, "
+                     f"max {max(self.lengths, default=0)} turns")
+        reloads = sum(count * n for count, n in self.reshuffles.items())
+        lines.append(f"Deck reloads per game: {reloads / games:.3f}, games "
+                     "with a reload: "
+                     f"{rate(self.games - self.reshuffles.get(0, 0), self.games)}")
+        lines.append(f"Draw turns per game: {self.draw_turns / games:.2f}")
+
+        lines.append("Action cards (per game; share played by the winner, "
+                     f"vs {self.winner_cards / (self.cards_played or 1):.1%} "
+                     "of all cards):")
+        for action in Deck.ACTIONS:
+            plays = self.actions[action]
+            lines.append(f"  {action:13} {plays / games:5.2f}  "
+                         f"{rate(self.winner_actions[action], plays)}")
+
+        lines.append(f"8s per game: {self.eights / games:.2f} "
+                     f"({self.eights / (self.cards_played or 1):.1%} of cards "
+                     "played)")
+        lines.append("Suit picked with an 8:")
+        for suit in Deck.SUITS:
+            lines.append(f"  {suit:8} {rate(self.suit_picks[suit], self.eights)}")
+        return "\n".join(lines)
+
+
+def journal_games(path):
+    """Streams the games stored in a journal.
+
+    Args:
+        path (str): The journal file.
+
+    Yields:
+        dict: The result of each game, with its moves, as from
+        play_headless_game, plus "players": the number of seats that moved
+        in it (the journal does not store the table size).
+    """
+    with JournalReader(path) as reader:
+        for game in range(reader.n_games()):
+            moves = []
+            winner = None
+            reshuffles = 0
+            seed = None
+            seats = 0
+            for record in reader.iter_game(game):
+                seed = record.seed
+                seats = max(seats, record.player + 1)
+                card = None if record.card == NO_CARD else record.card
+                suit = None
+                if card is not None and CARDS[card].ranktype == "8":
+                    suit = Deck.SUITS[record.suit]
+                moves.append((record.player, card, suit))
+                if record.flags & FLAG_WIN:
+                    winner = record.player
+                if record.flags & FLAG_RESHUFFLE:
+                    reshuffles += 1
+            yield {"seed": seed, "winner": winner, "turns": len(moves),
+                   "reshuffles": reshuffles, "moves": moves, "players": seats}
+
+
+def aggregate_journal(path, n_players=None):
+    """Aggregates the games stored in a journal.
+
+    Args:
+        path (str): The journal file.
+        n_players (int, optional): Players in every game. Defaults to the
+            number of seats that moved anywhere in the journal (see
+            JournalReader.n_seats); big tables often have seats that never
+            move in a given game.
+
+    Returns:
+        GameAggregate: Statistics of all games.
+
+    Raises:
+        ValueError: If a game has more seats than n_players.
+    """
+    if n_players is None:
+        with JournalReader(path) as reader:
+            n_players = reader.n_seats() or 2
+    aggregate = GameAggregate(n_players)
+    for index, result in enumerate(journal_games(path)):
+        if result["players"] > n_players:
+            raise ValueError(
+                f"{path}: game {index + 1} has {result['players']} players, "
+                f"expected {n_players}")
+        aggregate.add(result)
+    return aggregate
+
+
+def _aggregate_chunk(first, n_games, seed, n_players, max_turns):
+    """Plays a chunk of games inside one worker and aggregates them.
+
+    Args:
+        first (int): Index of the first game of the chunk within the run.
+        n_games (int): Number of games to play.
+        seed (int): Base seed of the run.
+        n_players (int): CPU players per game.
+        max_turns (int): Turn limit per game.
+
+    Returns:
+        GameAggregate: Statistics of the chunk.
+    """
+    return GameAggregate(n_players).consume(
+        headless_games(n_games, n_players, seed, first, max_turns))
+
+
+def aggregate_simulation(n_games, n_players=2, workers=None, seed=None,
+                         max_turns=MAX_TURNS):
+    """Plays all-CPU games across a process pool and aggregates them.
+
+    Every worker aggregates its own games; only the aggregates travel back
+    and are merged. The games are the same as simulate_games plays for the
+    same seed.
+
+    Args:
+        n_games (int): Number of games to play.
+        n_players (int, optional): CPU players per game. Defaults to 2.
+        workers (int, optional): Worker processes. Defaults to all cores.
+        seed (int, optional): Base seed. Defaults to a fresh seed.
+        max_turns (int, optional): Turn limit per game. Defaults to MAX_TURNS.
+
+    Returns:
+        GameAggregate: Statistics of all games.
+    """
+    workers = workers or os.cpu_count() or 1
+    if seed is None:
+        seed = random.getrandbits(64)
+    chunks = [(first, size, seed, n_players, max_turns)
+              for first, size in split_games(n_games, workers)]
+    aggregate = GameAggregate(n_players)
+    if workers == 1:
+        for chunk in chunks:
+            aggregate.merge(_aggregate_chunk(*chunk))
+        return aggregate
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_aggregate_chunk, *chunk) for chunk in chunks]
+        for future in futures:
+            aggregate.merge(future.result())
+    return aggregate
+
+
+def parse_args(arglist):
+    """Parse command-line arguments.
+
+    Args:
+        arglist (list of str): list of command-line arguments.
+
+    Returns:
+        namespace: a namespace with attributes "games", "players",
+        "workers", "seed" and "journal".
+    """
+    parser = ArgumentParser(description="Statistics over many games")
+    parser.add_argument("-n", "--games", type=int, default=10000,
+                        help="number of games to simulate")
+    parser.add_argument("-p", "--players", type=int, default=None,
+                        help="players per game (default: 2, or read from "
+                        "the journal)")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="worker processes (default: all cores)")
+    parser.add_argument("-s", "--seed", type=int, default=None,
+                        help="base seed for reproducible runs")
+    parser.add_argument("--journal", default=None, metavar="FILE",
+                        help="read games from a journal instead of playing")
+    return parser.parse_args(arglist)
+
+
+if __name__ == "__main__":
+    args = parse_args(sys.argv[1:])
+    start = time.perf_counter()
+    if args.journal:
+        try:
+            stats = aggregate_journal(args.journal, args.players)
+        except ValueError as error:
+            sys.exit(f"error: {error}")
+    else:
+        stats = aggregate_simulation(args.games, args.players or 2,
+                                     args.workers, args.seed)
+    print(stats.summary())
+    print(f"Elapsed: {time.perf_counter() - start:.2f}s")
@@ -5,60 +5,387 @@ number."""
 """Steve was here."""
 """Shelly was here"""
 
-from argparse import ArgumentParser
+from argparse import ArgumentParser, ArgumentTypeError, FileType
+from decimal import Decimal, InvalidOperation, localcontext
+from fractions import Fraction
+from functools import lru_cache
+from itertools import islice
+import math
 import sys
-   
+import time
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is only needed for the batch mode.
+    np = None
+
+CHUNK_SIZE = 65536
+FLOAT_DIGITS = 15
+GUARD_DIGITS = 5
+CACHE_SIZE = 256
+
+
+def initial_guess(number):
+    """Guesses a square root from the exponent of a positive float.
+
+    With number = m * 2**e and m in [1, 4) after making e even, the root is
+    sqrt(m) * 2**(e / 2), and (1 + m) / 2 is a guess for sqrt(m) that is never
+    too small and at most 25% too big. A handful of Babylonian steps then
+    reach full float precision for any magnitude.
+
+    Args:
+        number (float): A positive number.
+
+    Returns:
+        float: A guess at the square root of number.
+    """
+    m, e = math.frexp(number)
+    if e % 2:
+        m *= 2.0
+        e -= 1
+    return math.ldexp((1.0 + m) / 2.0, e // 2)
+
+
 def sqrt_b(number, x, p = 1e-10):
     """Approximating th square root of a positive number using  babylion method
     Args:
         number (float): number that is being calculated to find its square root.
         p (float): precision of approxiation.
-        x: number close to the approximation.
-        
+        x: number close to the approximation. None starts from a guess based
+            on the exponent of number.
+
     Returns:
         float: square root approximation of the input.
-    
+
     Side effects:
-    
+
     Raises:
-    """        
+    """
     if number <= 0.0:
         return 0.0
-    
+
     if x is None:
-        x = number / 2.0
-        
+        x = initial_guess(number)
+
+    # After the first step the iterates only go down, so a step that does
+    # not go down means float precision ran out before p was reached.
     y = (x + number / x) / 2.0
-    e = abs(y - x)
-    
-    if e <= p:
-        return y
-    else:
-        return sqrt_b(number, y, p)
-    
+    while abs(y - x) > p:
+        x, y = y, (y + number / y) / 2.0
+        if y >= x:
+            return x
+    return y
+
+
+def sqrt_batch(numbers, p=1e-10):
+    """Approximates the square roots of many numbers at once with NumPy.
+
+    Every element runs the same iteration as sqrt_b, started from the same
+    exponent-based guess; elements that have converged drop out, so the
+    loop ends when the slowest element is done.
+
+    Args:
+        numbers (array-like of float): The numbers. Elements that are not
+            positive give 0.0, like sqrt_b; inf gives inf and nan gives nan,
+            like numpy.sqrt.
+        p (float, optional): Precision of the approximation. Defaults to
+            1e-10.
+
+    Returns:
+        numpy.ndarray: The square roots, as float64.
+
+    Raises:
+        ImportError: If NumPy is not installed.
+    """
+    if np is None:
+        raise ImportError("sqrt_batch needs NumPy")
+    numbers = np.asarray(numbers, dtype=np.float64)
+    roots = np.zeros_like(numbers)
+    out = roots.ravel()
+    flat = numbers.ravel()
+    finite = np.isfinite(flat)
+    # inf and nan are their own roots and never enter the iteration.
+    special = np.flatnonzero(~finite & ~(flat < 0.0))
+    out[special] = flat[special]
+    active = np.flatnonzero(finite & (flat > 0.0))
+    values = flat[active]
+
+    m, e = np.frexp(values)
+    odd = e % 2
+    m = m * (1 + odd)
+    x = np.ldexp((1.0 + m) / 2.0, (e - odd) // 2)
+    y = (x + values / x) / 2.0
+    while active.size:
+        done = np.abs(y - x) <= p
+        out[active[done]] = y[done]
+        keep = ~done
+        active, values, y = active[keep], values[keep], y[keep]
+        x, y = y, (y + values / y) / 2.0
+        # A step that does not go down (or gives nan) ends the element.
+        stalled = ~(y < x)
+        out[active[stalled]] = x[stalled]
+        keep = ~stalled
+        active, values, x, y = active[keep], values[keep], x[keep], y[keep]
+    return roots
+
+
+def sqrt_stream(lines, p=1e-10, chunk_size=CHUNK_SIZE):
+    """Approximates square roots of numbers read one per line, in chunks.
+
+    Only one chunk is held in memory at a time, so input of any length can
+    be streamed, e.g. from stdin.
+
+    Args:
+        lines (iterable of str): Lines holding one number each. Blank lines
+            are skipped.
+        p (float, optional): Precision of the approximation. Defaults to
+            1e-10.
+        chunk_size (int, optional): Numbers per NumPy batch. Defaults to
+            CHUNK_SIZE.
+
+    Yields:
+        tuple[numpy.ndarray, numpy.ndarray]: The numbers of a chunk and their
+        square roots.
+
+    Raises:
+        ValueError: If a line is not a number; the message gives its line
+            number.
+    """
+    lines = ((n, line) for n, line in enumerate(lines, 1) if line.strip())
+    while True:
+        chunk = list(islice(lines, chunk_size))
+        if not chunk:
+            return
+        texts = [line for _, line in chunk]
+        try:
+            numbers = np.array(texts, dtype=np.float64)
+        except ValueError:
+            for n, line in chunk:
+                try:
+                    float(line)
+                except ValueError:
+                    raise ValueError(f"line {n} is not a number: "
+                                     f"{line.strip()!r}") from None
+            raise
+        yield numbers, sqrt_batch(numbers, p)
+
+
+def throughput(n=1000000, p=1e-10, seed=326):
+    """Measures square roots per second of each method.
+
+    Args:
+        n (int, optional): Numbers to take the square root of. Defaults to
+            1,000,000; sqrt_b only gets a tenth of them.
+        p (float, optional): Precision of the approximation. Defaults to
+            1e-10.
+        seed (int, optional): Seed for the numbers. Defaults to 326.
+
+    Returns:
+        dict: Square roots per second for "math.sqrt", "sqrt_b",
+        "sqrt_batch" and "numpy.sqrt".
+    """
+    rng = np.random.default_rng(seed)
+    numbers = 10.0 ** rng.uniform(-6.0, 12.0, n)
+    scalars = numbers.tolist()
+    rates = {}
+    for name, run, count in (
+            ("math.sqrt", lambda: [math.sqrt(v) for v in scalars], n),
+            ("sqrt_b", lambda: [sqrt_b(v, None, p) for v in scalars[:n // 10]],
+             n // 10),
+            ("sqrt_batch", lambda: sqrt_batch(numbers, p), n),
+            ("numpy.sqrt", lambda: np.sqrt(numbers), n)):
+        start = time.perf_counter()
+        run()
+        rates[name] = count / (time.perf_counter() - start)
+    return rates
+
+
+def precision_schedule(digits):
+    """Lists the working precisions of the Decimal iteration.
+
+    Each Babylonian step doubles the number of correct digits, so a step
+    only needs about twice the digits the previous one ended with. Starting
+    from a float guess, the schedule is the target precision halved until it
+    fits in a float, in increasing order.
+
+    Args:
+        digits (int): Significant digits wanted.
+
+    Returns:
+        list[int]: Working precision of each step; the last one is digits
+        plus GUARD_DIGITS.
+    """
+    precisions = [digits + GUARD_DIGITS]
+    while precisions[-1] > 2 * FLOAT_DIGITS:
+        precisions.append(precisions[-1] // 2 + 1)
+    return precisions[::-1]
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _sqrt_decimal(number, digits):
+    """Cached body of sqrt_decimal for a positive Decimal."""
+    # Scale to [1, 100) so the float guess neither overflows nor underflows.
+    exponent = number.adjusted() // 2
+    guess = math.sqrt(float(number.scaleb(-2 * exponent)))
+    x = Decimal(guess).scaleb(exponent)
+    with localcontext() as ctx:
+        for precision in precision_schedule(digits):
+            ctx.prec = precision
+            x = (x + number / x) / 2
+        ctx.prec = digits
+        return +x
+
+
+def sqrt_decimal(number, digits=50):
+    """Approximates a square root to any number of digits with Decimal.
+
+    The Babylonian iteration starts from the float square root and raises
+    the working precision at every step (see precision_schedule), so only
+    the last step runs at full precision. Results are kept in an LRU cache
+    of CACHE_SIZE entries.
+
+    Args:
+        number (int, str, float, Decimal or Fraction): A number that is not
+            negative. Strings and floats are converted exactly.
+        digits (int, optional): Significant digits of the result. Defaults
+            to 50.
+
+    Returns:
+        Decimal: The square root rounded to digits significant digits.
+
+    Raises:
+        ValueError: If number is negative or digits is not positive.
+    """
+    if digits < 1:
+        raise ValueError("digits must be positive")
+    if isinstance(number, Fraction):
+        with localcontext() as ctx:
+            ctx.prec = 2 * (digits + GUARD_DIGITS)
+            number = Decimal(number.numerator) / number.denominator
+    number = Decimal(number)
+    if number < 0:
+        raise ValueError(f"Cannot take the square root of {number}")
+    if not number:
+        return Decimal(0)
+    return _sqrt_decimal(number, digits)
+
+
+def sqrt_bounds(number, digits=50):
+    """Brackets a square root between two exact fractions.
+
+    Args:
+        number (int, str, float, Decimal or Fraction): A number that is not
+            negative.
+        digits (int, optional): Significant digits of the bounds. Defaults
+            to 50.
+
+    Returns:
+        tuple[Fraction, Fraction]: lower and upper with lower**2 <= number
+        <= upper**2, one unit in the last digit apart (equal if the root is
+        exact).
+
+    Raises:
+        ValueError: If number is negative or digits is not positive.
+    """
+    root = sqrt_decimal(number, digits)
+    exact = Fraction(number)
+    if not root:
+        return Fraction(0), Fraction(0)
+    step = Fraction(Decimal(1).scaleb(root.adjusted() - digits + 1))
+    lower = Fraction(root)
+    if lower * lower == exact:
+        return lower, lower
+    while lower * lower > exact:
+        lower -= step
+    upper = lower + step
+    while upper * upper < exact:
+        lower, upper = upper, upper + step
+    return lower, upper
+
+
+def decimal_number(text):
+    """Converts a command-line argument to an exact Decimal.
+
+    Args:
+        text (str): The argument.
+
+    Returns:
+        Decimal: Its value.
+
+    Raises:
+        ArgumentTypeError: If text is not a finite number.
+    """
+    try:
+        number = Decimal(text)
+    except InvalidOperation:
+        number = None
+    if number is None or not number.is_finite():
+        raise ArgumentTypeError(f"invalid number: {text!r}")
+    return number
+
+
 def parse_args(arglist):
     """Parse command-line arguments.
-    
-    Expect one required argument (a positive number whose square root the user
-    wants to calculate) and one optional parameter (a precision, specified by
-    the short flag -p or the long flag --precision). Both values
-    are floats. The default precision is 0.0000000001 (1e-10).
-    
+
+    Expect one argument (a positive number whose square root the user wants
+    to calculate) and one optional parameter (a precision, specified by the
+    short flag -p or the long flag --precision). Both values are floats. The
+    default precision is 0.0000000001 (1e-10). With -d/--digits the root is
+    computed with Decimal to that many significant digits instead. Instead
+    of a number, --batch reads numbers from a file (or - for stdin) and
+    --bench measures throughput; both need NumPy.
+
     Args:
         arglist (list of str): list of command-line arguments.
-        
+
     Returns:
-        namespace: a namespace with attributes "number" and "precision". The
-        value of each of these attributes will be a float.
+        namespace: a namespace with attributes "number" (a Decimal),
+        "precision", "digits", "batch" (an open file) and "bench".
     """
     parser = ArgumentParser()
-    parser.add_argument("number", type=float,
+    parser.add_argument("number", type=decimal_number, nargs="?", default=None,
                         help="number to compute the square root of")
     parser.add_argument("-p", "--precision", type=float, default=0.0000000001)
-    return parser.parse_args(arglist)
+    parser.add_argument("-d", "--digits", type=int, default=None,
+                        help="compute the root to this many significant "
+                             "digits with Decimal")
+    parser.add_argument("--batch", type=FileType("r"), default=None,
+                        metavar="FILE",
+                        help="print the square root of every number in FILE "
+                             "(one per line, - for stdin)")
+    parser.add_argument("--bench", type=int, default=None, metavar="N",
+                        help="compare throughput with math.sqrt on N numbers")
+    args = parser.parse_args(arglist)
+    if args.number is None and args.batch is None and args.bench is None:
+        parser.error("give a number, --batch FILE or --bench N")
+    if args.digits is not None:
+        if args.digits < 1:
+            parser.error("--digits must be positive")
+        if args.number is not None and args.number < 0:
+            parser.error(f"cannot take the square root of {args.number} "
+                         "with --digits")
+    return args
 
 
 if __name__ == "__main__":
     args = parse_args(sys.argv[1:])
-    print(f"The square root of {args.number} is approximately"
-          f" {sqrt_b(args.number, args.precision)}")
+    if args.bench is not None:
+        for method, rate in throughput(args.bench, args.precision).items():
+            print(f"{method:12} {rate:>16,.0f} roots/s")
+    elif args.batch is not None:
+        source = args.batch
+        try:
+            for _, batch_roots in sqrt_stream(source, args.precision):
+                sys.stdout.write("\n".join(map(repr, batch_roots.tolist()))
+                                 + "\n")
+        except ValueError as error:
+            sys.exit(f"babylonian.py: error: {source.name}: {error}")
+        finally:
+            if source is not sys.stdin:
+                source.close()
+    elif args.digits is not None:
+        print(f"The square root of {args.number} is approximately"
+              f" {sqrt_decimal(args.number, args.digits)}")
+    else:
+        print(f"The square root of {float(args.number)} is approximately"
+              f" {sqrt_b(float(args.number), None, args.precision)}")
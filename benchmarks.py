@@ -0,0 +1,377 @@
+"""Benchmark suite for the game's hot paths and babylonian.sqrt_b.
+
+Every benchmark has a setup step, which is not timed, and a run step, which
+is timed and returns how many operations it performed. Runs repeat until a
+minimum time has passed; the best repetition gives operations per second.
+Peak memory is measured in a separate run under tracemalloc, so tracing does
+not slow down the timings.
+
+Results are saved as JSON, and two result files can be compared with a
+regression threshold:
+
+    python3 benchmarks.py run -o before.json
+    python3 benchmarks.py run -o after.json
+    python3 benchmarks.py compare before.json after.json --threshold 0.1
+"""
+
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from argparse import ArgumentParser
+
+import babylonian
+from babylonian import sqrt_b, sqrt_batch
+from collaborative_assignment_card_game_inst326 import (
+    CARDS, DECK_TEMPLATE, NULL_SINK, TEMPLATE_IDS, Deck, DeckExhausted, Game,
+    Hand, Player, card_validation)
+from simulation import play_headless_game
+
+SEED = 326
+BATCH = 1000
+
+
+class Benchmark:
+    """One named measurement.
+
+    Attributes:
+        name (str): Name shown in reports and used as the key in result files.
+        setup (callable): Returns the state the run step works on. Not timed.
+        run (callable): Takes that state, does the work and returns the
+            number of operations performed.
+    """
+
+    def __init__(self, name, setup, run):
+        """Creates a benchmark.
+
+        Args:
+            name (str): Name of the benchmark.
+            setup (callable): Untimed preparation; its result goes to run.
+            run (callable): Timed work returning its operation count.
+        """
+        self.name = name
+        self.setup = setup
+        self.run = run
+
+    def measure(self, min_time=0.5, repeat=5):
+        """Times the benchmark and measures its peak memory.
+
+        Args:
+            min_time (float, optional): Seconds each repetition lasts at
+                least. Defaults to 0.5.
+            repeat (int, optional): Repetitions; the fastest one counts.
+                Defaults to 5.
+
+        Returns:
+            dict: "ops_per_sec" and "peak_kib".
+        """
+        best = 0.0
+        for _ in range(repeat):
+            ops = 0
+            elapsed = 0.0
+            while elapsed < min_time:
+                state = self.setup()
+                start = time.perf_counter()
+                ops += self.run(state)
+                elapsed += time.perf_counter() - start
+            best = max(best, ops / elapsed)
+
+        state = self.setup()
+        tracemalloc.start()
+        self.run(state)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return {"ops_per_sec": best, "peak_kib": peak / 1024}
+
+
+def _new_deck():
+    """Returns a seeded deck whose piles the benchmarks then rearrange."""
+    return Deck(rng=random.Random(SEED))
+
+
+def _setup_empty_deck():
+    """Returns a deck with no cards for build_deck to fill."""
+    deck = _new_deck()
+    deck.piles.load(b"", b"")
+    return deck
+
+
+def _run_build_deck(deck):
+    """Builds the deck BATCH times."""
+    for _ in range(BATCH):
+        deck.piles.load(b"", b"")
+        deck.build_deck()
+    return BATCH
+
+
+def _run_shuffle(deck):
+    """Shuffles the 64-card deck BATCH times."""
+    for _ in range(BATCH):
+        deck.shuffle()
+    return BATCH
+
+
+def _run_card_pull(deck):
+    """Pulls every card of a full deck, about BATCH pulls in total."""
+    for _ in range(BATCH // len(DECK_TEMPLATE)):
+        deck.piles.load(TEMPLATE_IDS, b"")
+        for _ in range(len(DECK_TEMPLATE)):
+            deck.card_pull()
+    return BATCH // len(DECK_TEMPLATE) * len(DECK_TEMPLATE)
+
+
+def _run_reload(deck):
+    """Reloads a full played pile into an empty deck BATCH times."""
+    for _ in range(BATCH):
+        deck.piles.load(b"", TEMPLATE_IDS)
+        deck.reload_played_cards()
+    return BATCH
+
+
+def _setup_shuffled_decks():
+    """Returns a deck and BATCH shuffled card orders to start games from."""
+    deck = _new_deck()
+    orders = []
+    for _ in range(BATCH):
+        deck.shuffle()
+        orders.append(deck.piles.draw_ids())
+    return deck, orders
+
+
+def _run_start_game(setup):
+    """Picks a starting card from each shuffled order."""
+    deck, orders = setup
+    for order in orders:
+        deck.piles.load(order, b"")
+        deck.start_game()
+    return len(orders)
+
+
+def _setup_positions():
+    """Random hands, top cards and suits for the validation benchmarks."""
+    rng = random.Random(SEED)
+    positions = []
+    for _ in range(BATCH):
+        player = Player("CPU", is_cpu=True)
+        player.hand = Hand(rng.sample(CARDS, rng.randint(1, 12)))
+        positions.append((player, rng.choice(CARDS), rng.choice(Deck.SUITS)))
+    return positions
+
+
+def _run_card_validation(positions):
+    """Validates every position's hand."""
+    for player, top, suit in positions:
+        card_validation(player.hand, top, suit)
+    return len(positions)
+
+
+def _run_play_card(positions):
+    """Lets a CPU player choose a card in every position."""
+    for player, top, suit in positions:
+        player.play_card(top, suit)
+    return len(positions)
+
+
+def _setup_games():
+    """Deals 100 seeded two-player CPU games."""
+    rng = random.Random(SEED)
+    return [Game([Player("CPU 1", True), Player("CPU 2", True)], NULL_SINK,
+                 seed=rng.getrandbits(64)) for _ in range(100)]
+
+
+def _run_play_turn(games):
+    """Plays every game to the end, counting turns."""
+    turns = 0
+    for game in games:
+        try:
+            while not game.play_turn():
+                turns += 1
+        except DeckExhausted:
+            pass
+        turns += 1
+    return turns
+
+
+def _setup_tables(n_players):
+    """Deals two seeded all-CPU games with n_players each."""
+    rng = random.Random(SEED)
+    return [Game([Player(f"CPU {i + 1}", True) for i in range(n_players)],
+                 NULL_SINK, seed=rng.getrandbits(64)) for _ in range(2)]
+
+
+def _run_table_turns(games):
+    """Plays up to 2000 turns of every game, counting turns."""
+    turns = 0
+    for game in games:
+        try:
+            for _ in range(2000):
+                turns += 1
+                if game.play_turn():
+                    break
+        except DeckExhausted:
+            pass
+    return turns
+
+
+def _run_clone(games):
+    """Clones every freshly dealt game ten times."""
+    for game in games:
+        for _ in range(10):
+            game.clone()
+    return len(games) * 10
+
+
+def _run_full_games(seeds):
+    """Deals and plays one headless game per seed."""
+    for seed in seeds:
+        play_headless_game(seed=seed)
+    return len(seeds)
+
+
+def _setup_numbers():
+    """Returns BATCH positive numbers spread over many magnitudes."""
+    rng = random.Random(SEED)
+    return [10 ** rng.uniform(-6, 12) for _ in range(BATCH)]
+
+
+def _run_sqrt_b(numbers):
+    """Takes the square root of every number."""
+    for number in numbers:
+        sqrt_b(number, None)
+    return len(numbers)
+
+
+def _run_sqrt_batch(numbers):
+    """Takes the square roots of all numbers in one NumPy batch."""
+    sqrt_batch(numbers)
+    return len(numbers)
+
+
+BENCHMARKS = [
+    Benchmark("Deck.build_deck", _setup_empty_deck, _run_build_deck),
+    Benchmark("Deck.shuffle", _new_deck, _run_shuffle),
+    Benchmark("Deck.card_pull", _new_deck, _run_card_pull),
+    Benchmark("Deck.reload_played_cards", _new_deck, _run_reload),
+    Benchmark("Deck.start_game", _setup_shuffled_decks, _run_start_game),
+    Benchmark("card_validation", _setup_positions, _run_card_validation),
+    Benchmark("Player.play_card (CPU)", _setup_positions, _run_play_card),
+    Benchmark("Game.play_turn", _setup_games, _run_play_turn),
+    Benchmark("Game.clone", _setup_games, _run_clone),
+    *[Benchmark(f"Game.play_turn ({n} players)",
+                lambda n=n: _setup_tables(n), _run_table_turns)
+      for n in (4, 32, 256)],
+    Benchmark("CPU-vs-CPU game", lambda: list(range(SEED, SEED + 100)),
+              _run_full_games),
+    Benchmark("sqrt_b", _setup_numbers, _run_sqrt_b),
+    *([Benchmark("sqrt_batch", _setup_numbers, _run_sqrt_batch)]
+      if babylonian.np is not None else []),
+]
+
+
+def run_benchmarks(names=None, min_time=0.5, repeat=5):
+    """Runs the benchmark suite.
+
+    Args:
+        names (str, optional): Only run benchmarks whose name contains this
+            text. Defaults to running all of them.
+        min_time (float, optional): Seconds per repetition. Defaults to 0.5.
+        repeat (int, optional): Repetitions per benchmark. Defaults to 5.
+
+    Returns:
+        dict: "meta" (machine and time) and "results" keyed by benchmark
+        name.
+
+    Side effects:
+        Prints each result as it finishes.
+    """
+    results = {}
+    for benchmark in BENCHMARKS:
+        if names and names not in benchmark.name:
+            continue
+        results[benchmark.name] = result = benchmark.measure(min_time, repeat)
+        print(f"{benchmark.name:28} {result['ops_per_sec']:>14,.0f} ops/s"
+              f" {result['peak_kib']:>10,.1f} KiB peak")
+    meta = {"python": platform.python_version(),
+            "machine": platform.platform(),
+            "time": time.strftime("%Y-%m-%d %H:%M:%S")}
+    return {"meta": meta, "results": results}
+
+
+def compare(old, new, threshold=0.1):
+    """Compares two saved runs.
+
+    Args:
+        old (dict): The baseline run, as saved by run_benchmarks.
+        new (dict): The run to check.
+        threshold (float, optional): Allowed relative slowdown before a
+            benchmark counts as a regression. Defaults to 0.1 (10%).
+
+    Returns:
+        tuple[list[str], bool]: Report lines, and whether any benchmark
+        regressed.
+    """
+    lines = []
+    regressed = False
+    for name, result in new["results"].items():
+        if name not in old["results"]:
+            lines.append(f"{name:28} (new)")
+            continue
+        before = old["results"][name]["ops_per_sec"]
+        change = result["ops_per_sec"] / before - 1
+        flag = ""
+        if change < -threshold:
+            flag = "  REGRESSION"
+            regressed = True
+        lines.append(f"{name:28} {before:>14,.0f} -> "
+                     f"{result['ops_per_sec']:>14,.0f} ops/s "
+                     f"({change:+.1%}){flag}")
+    return lines, regressed
+
+
+def parse_args(arglist):
+    """Parse command-line arguments.
+
+    Args:
+        arglist (list of str): list of command-line arguments.
+
+    Returns:
+        namespace: a namespace with a "command" attribute ("run" or
+        "compare") and that command's options.
+    """
+    parser = ArgumentParser(description="Benchmark the card game")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run = subparsers.add_parser("run", help="run the benchmarks")
+    run.add_argument("-o", "--output", default=None,
+                     help="JSON file to save the results to")
+    run.add_argument("-k", "--filter", default=None,
+                     help="only run benchmarks whose name contains this")
+    run.add_argument("--min-time", type=float, default=0.5,
+                     help="seconds per repetition")
+    run.add_argument("--repeat", type=int, default=5,
+                     help="repetitions per benchmark")
+    comp = subparsers.add_parser("compare", help="compare two result files")
+    comp.add_argument("old", help="baseline result file")
+    comp.add_argument("new", help="result file to check")
+    comp.add_argument("-t", "--threshold", type=float, default=0.1,
+                      help="allowed relative slowdown (default 0.1)")
+    return parser.parse_args(arglist)
+
+
+if __name__ == "__main__":
+    args = parse_args(sys.argv[1:])
+    if args.command == "run":
+        report = run_benchmarks(args.filter, args.min_time, args.repeat)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+    else:
+        with open(args.old, encoding="utf-8") as f:
+            old_report = json.load(f)
+        with open(args.new, encoding="utf-8") as f:
+            new_report = json.load(f)
+        report_lines, any_regressed = compare(old_report, new_report,
+                                              args.threshold)
+        print("\n".join(report_lines))
+        sys.exit(1 if any_regressed else 0)
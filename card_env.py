@@ -0,0 +1,538 @@
+"""Reset/step environments for training learned CPU players.
+
+CardEnv wraps one Game in which seat 0 is the learner and every other seat
+is a CPU strategy. Observations are fixed-size arrays:
+
+    [0, 64)  copies of each card id in the learner's hand
+    64       id of the top card
+    65       index of the current suit in Deck.SUITS
+    66       direction of play (1 or -1)
+    67       cards in the next player's hand
+
+An action is card id * 4 + suit index, playing that card and, for a wild
+card, switching to that suit (other cards only take their own suit), or
+DRAW_ACTION to draw. The action mask marks the legal ones, from the same
+legal-play tables card_validation uses. Rewards are 1 for a win, -1 for a
+loss and 0 otherwise.
+
+VectorCardEnv steps many games at once in worker processes. Actions,
+observations, masks, rewards and end flags live in shared memory, and the
+workers are woken with a single byte per step, so nothing is pickled while
+stepping. Finished games restart on their own.
+
+    python3 card_env.py --envs 64 --steps 2000
+
+NumPy is required for this file only.
+"""
+
+import os
+import random
+import sys
+import time
+from argparse import ArgumentParser
+from multiprocessing import Pipe, Process
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from collaborative_assignment_card_game_inst326 import (
+    CARDS, NULL_SINK, SUIT_INDEX, Deck, DeckExhausted, Game, Player,
+    derive_seed)
+from simulation import MAX_TURNS
+from strategies import make_strategy
+
+N_CARDS = len(CARDS)
+N_SUITS = len(Deck.SUITS)
+OBS_SIZE = N_CARDS + 4
+DRAW_ACTION = N_CARDS * N_SUITS
+N_ACTIONS = DRAW_ACTION + 1
+OBS_DTYPE = np.int16
+WIN_REWARD = 1.0
+LOSS_REWARD = -1.0
+
+_STEP = b"s"
+_RESET = b"r"
+_CLOSE = b"c"
+_DONE = b"d"
+
+# Actions allowed by each RuleTables.wild table, before legality.
+_ALLOWED = {}
+
+
+def encode_action(card_id, suit=None):
+    """Turns a move into an action number.
+
+    Args:
+        card_id (int or None): The card to play, or None to draw.
+        suit (str, optional): Suit to switch to with a wild card. Defaults to
+            the card's own suit.
+
+    Returns:
+        int: The action.
+    """
+    if card_id is None:
+        return DRAW_ACTION
+    return card_id * N_SUITS + SUIT_INDEX[suit or CARDS[card_id].suit]
+
+
+def decode_action(action):
+    """Turns an action number into a move.
+
+    Args:
+        action (int): The action.
+
+    Returns:
+        tuple: (card id, suit), or (None, None) for DRAW_ACTION.
+    """
+    if action == DRAW_ACTION:
+        return None, None
+    return action // N_SUITS, Deck.SUITS[action % N_SUITS]
+
+
+def allowed_actions(wild):
+    """Lists the actions that exist for each card id under a wild table.
+
+    Args:
+        wild (bytes): 1 for every card id that lets its player pick a suit.
+
+    Returns:
+        numpy.ndarray: DRAW_ACTION booleans; a wild card allows every suit,
+        any other card only its own.
+    """
+    allowed = _ALLOWED.get(wild)
+    if allowed is None:
+        allowed = np.array([wild[action // N_SUITS]
+                            or action % N_SUITS == action // N_SUITS >> 4
+                            for action in range(DRAW_ACTION)])
+        allowed.flags.writeable = False
+        _ALLOWED[wild] = allowed
+    return allowed
+
+
+class CardEnv:
+    """One game with a learner in seat 0 against CPU strategies.
+
+    Attributes:
+        n_players (int): Players per game.
+        opponent (str): Strategy of the other seats, from STRATEGIES.
+        rules (RuleSet or None): The rules to play by.
+        max_turns (int): Turn limit after which an episode is truncated.
+        rng (random.Random): Source of the seeds of new games.
+        game (Game or None): The game being played.
+    """
+
+    def __init__(self, n_players=2, opponent="first-valid", rules=None,
+                 max_turns=MAX_TURNS, seed=None):
+        """Creates the environment; call reset before stepping.
+
+        Args:
+            n_players (int, optional): Players per game. Defaults to 2.
+            opponent (str, optional): Strategy of the other seats. Defaults
+                to "first-valid".
+            rules (RuleSet, optional): The rules to play by. Defaults to the
+                standard rules.
+            max_turns (int, optional): Turn limit per game. Defaults to
+                MAX_TURNS.
+            seed (int, optional): Seed for the sequence of games. Defaults to
+                None.
+
+        Raises:
+            ValueError: If the opponent is unknown or the rules allow
+                jump-ins, which would need the learner between turns.
+        """
+        if rules is not None and rules.jump_in:
+            raise ValueError("CardEnv does not support jump-in rules")
+        self.n_players = n_players
+        self.opponent = opponent
+        self._strategy = make_strategy(opponent)
+        self.rules = rules
+        self.max_turns = max_turns
+        self.rng = random.Random(seed)
+        self.game = None
+
+    def reset(self, seed=None):
+        """Deals a new game and plays the CPU seats until the learner moves.
+
+        Args:
+            seed (int, optional): Seed of the game. Defaults to the next
+                seed from rng.
+
+        Returns:
+            tuple[numpy.ndarray, dict]: The observation and an info dict
+            with "action_mask" and "seed".
+        """
+        if seed is None:
+            seed = self.rng.getrandbits(64)
+        players = [Player("Learner")] + [
+            Player(f"CPU {i}", strategy=self._strategy)
+            for i in range(1, self.n_players)]
+        self.game = Game(players, NULL_SINK, seed=seed, rules=self.rules)
+        self._play_opponents()
+        return self.observe(), {"action_mask": self.action_mask(),
+                                "seed": seed}
+
+    def _play_opponents(self):
+        """Plays CPU turns until the learner is to move or the game ends.
+
+        Returns:
+            bool: True if the game ended without a winner (it stalled).
+        """
+        game = self.game
+        try:
+            while (game.current_player_idx and game.winner is None
+                   and game.turns < self.max_turns):
+                game.play_turn()
+        except DeckExhausted:
+            # Both the deck and the played pile ran out; nobody can win.
+            return True
+        return False
+
+    def step(self, action):
+        """Plays the learner's move and the CPU turns after it.
+
+        Args:
+            action (int): A legal action (see action_mask).
+
+        Returns:
+            tuple: observation (numpy.ndarray), reward (float), terminated
+            (bool), truncated (bool) and an info dict with "action_mask",
+            "turns" and "winner" (seat index or None).
+
+        Raises:
+            ValueError: If the action is not legal.
+        """
+        if not self.action_mask()[action]:
+            raise ValueError(f"Illegal action {action}")
+        game = self.game
+        card_id, suit = decode_action(action)
+        stalled = False
+        try:
+            if card_id is None:
+                game.apply_move(None)
+            else:
+                game.apply_move(CARDS[card_id],
+                                suit if game.tables.wild[card_id] else None)
+        except DeckExhausted:
+            stalled = True
+        if not stalled and game.winner is None:
+            stalled = self._play_opponents()
+
+        reward = 0.0
+        winner = None
+        if game.winner is not None:
+            winner = game.players.index(game.winner)
+            reward = WIN_REWARD if winner == 0 else LOSS_REWARD
+        terminated = winner is not None or stalled
+        truncated = not terminated and game.turns >= self.max_turns
+        info = {"action_mask": self.action_mask(), "turns": game.turns,
+                "winner": winner}
+        return self.observe(), reward, terminated, truncated, info
+
+    def observe(self, out=None):
+        """Writes the learner's observation.
+
+        Args:
+            out (numpy.ndarray, optional): OBS_SIZE integers to fill.
+                Defaults to a new array.
+
+        Returns:
+            numpy.ndarray: The observation.
+        """
+        if out is None:
+            out = np.empty(OBS_SIZE, dtype=OBS_DTYPE)
+        game = self.game
+        out[:N_CARDS] = np.frombuffer(game.players[0].hand.counts, np.uint8)
+        out[N_CARDS] = game.played_card.id
+        out[N_CARDS + 1] = SUIT_INDEX[game.current_suit]
+        out[N_CARDS + 2] = game.direction
+        out[N_CARDS + 3] = len(game.players[game.direction
+                                            % self.n_players].hand)
+        return out
+
+    def action_mask(self, out=None):
+        """Writes which actions the learner may take now.
+
+        A card is legal when the learner's hand allows it under the game's
+        legal-play tables (Hand.legal_mask, which card_validation also
+        uses). Drawing is legal when no card is, or when DRAW 2 CARDS are
+        stacked on the learner.
+
+        Args:
+            out (numpy.ndarray, optional): N_ACTIONS booleans to fill.
+                Defaults to a new array.
+
+        Returns:
+            numpy.ndarray: The mask; all False once the game is over.
+        """
+        if out is None:
+            out = np.empty(N_ACTIONS, dtype=bool)
+        game = self.game
+        if game.winner is not None or game.current_player_idx:
+            out[:] = False
+            return out
+        legal = game.players[0].hand.legal_mask(
+            game.played_card, game.current_suit, game.legal_masks)
+        bits = np.unpackbits(np.frombuffer(legal.to_bytes(N_CARDS // 8,
+                                                          "little"),
+                                           np.uint8), bitorder="little")
+        np.logical_and(bits.repeat(N_SUITS), allowed_actions(game.tables.wild),
+                       out=out[:DRAW_ACTION])
+        out[DRAW_ACTION] = not legal or bool(game.pending_draws)
+        return out
+
+
+def _attach(spec):
+    """Opens shared arrays created by VectorCardEnv.
+
+    Args:
+        spec (dict): name -> (shared memory name, shape, dtype).
+
+    Returns:
+        tuple[list[SharedMemory], dict]: The blocks, to close later, and the
+        arrays by name.
+    """
+    blocks, arrays = [], {}
+    for key, (name, shape, dtype) in spec.items():
+        block = SharedMemory(name=name)
+        blocks.append(block)
+        arrays[key] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+    return blocks, arrays
+
+
+def _run_worker(conn, spec, first, count, seed, env_kwargs):
+    """Steps a slice of a VectorCardEnv's environments until told to stop.
+
+    Args:
+        conn (Connection): Receives one command byte per step and answers
+            with one byte when the shared arrays are written.
+        spec (dict): The shared arrays, see _attach.
+        first (int): Index of the first environment of the slice.
+        count (int): Environments in the slice.
+        seed (int): Base seed; environment i uses derive_seed(seed, i).
+        env_kwargs (dict): Arguments for CardEnv.
+    """
+    blocks, arrays = _attach(spec)
+    obs, masks = arrays["obs"], arrays["masks"]
+    actions, rewards = arrays["actions"], arrays["rewards"]
+    terminated, truncated = arrays["terminated"], arrays["truncated"]
+    envs = [CardEnv(seed=derive_seed(seed, i), **env_kwargs)
+            for i in range(first, first + count)]
+    try:
+        while True:
+            command = conn.recv_bytes()
+            if command == _CLOSE:
+                break
+            for i, env in enumerate(envs, first):
+                if command == _RESET:
+                    env.reset()
+                    rewards[i], terminated[i], truncated[i] = 0.0, False, False
+                else:
+                    _, rewards[i], terminated[i], truncated[i], _ = env.step(
+                        int(actions[i]))
+                    if terminated[i] or truncated[i]:
+                        env.reset()
+                env.observe(obs[i])
+                env.action_mask(masks[i])
+            conn.send_bytes(_DONE)
+    finally:
+        del obs, masks, actions, rewards, terminated, truncated, arrays
+        for block in blocks:
+            block.close()
+
+
+class VectorCardEnv:
+    """Many CardEnvs stepped together in worker processes.
+
+    The arrays returned by reset and step are views of shared memory and
+    are overwritten by the next call; copy them to keep them.
+
+    Attributes:
+        n_envs (int): Number of environments.
+        workers (int): Number of worker processes.
+        obs (numpy.ndarray): Observations, n_envs x OBS_SIZE.
+        masks (numpy.ndarray): Action masks, n_envs x N_ACTIONS.
+        actions (numpy.ndarray): The actions of the current step.
+        rewards (numpy.ndarray): Rewards of the last step.
+        terminated (numpy.ndarray): Games that ended in the last step; they
+            have already been restarted, and obs shows the new game.
+        truncated (numpy.ndarray): Games cut off by the turn limit in the
+            last step, restarted the same way.
+    """
+
+    def __init__(self, n_envs, workers=None, seed=None, **env_kwargs):
+        """Starts the workers.
+
+        Args:
+            n_envs (int): Number of environments.
+            workers (int, optional): Worker processes. Defaults to all
+                cores, and never more than n_envs.
+            seed (int, optional): Base seed. Defaults to a fresh seed.
+            **env_kwargs: Arguments for every CardEnv, such as n_players or
+                opponent.
+        """
+        workers = min(workers or os.cpu_count() or 1, n_envs)
+        if seed is None:
+            seed = random.getrandbits(64)
+        self.n_envs = n_envs
+        self.workers = workers
+        layout = {"obs": ((n_envs, OBS_SIZE), OBS_DTYPE),
+                  "masks": ((n_envs, N_ACTIONS), np.bool_),
+                  "actions": ((n_envs,), np.int64),
+                  "rewards": ((n_envs,), np.float32),
+                  "terminated": ((n_envs,), np.bool_),
+                  "truncated": ((n_envs,), np.bool_)}
+        self._blocks = []
+        spec = {}
+        for key, (shape, dtype) in layout.items():
+            size = max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize)
+            block = SharedMemory(create=True, size=size)
+            self._blocks.append(block)
+            spec[key] = (block.name, shape, dtype)
+            setattr(self, key, np.ndarray(shape, dtype=dtype,
+                                          buffer=block.buf))
+
+        self._conns = []
+        self._processes = []
+        first = 0
+        for w in range(workers):
+            count = n_envs // workers + (1 if w < n_envs % workers else 0)
+            parent, child = Pipe()
+            process = Process(target=_run_worker, daemon=True,
+                              args=(child, spec, first, count, seed,
+                                    env_kwargs))
+            process.start()
+            child.close()
+            self._conns.append(parent)
+            self._processes.append(process)
+            first += count
+
+    def _broadcast(self, command):
+        """Sends a command to every worker and waits until all are done."""
+        for conn in self._conns:
+            conn.send_bytes(command)
+        for conn in self._conns:
+            conn.recv_bytes()
+
+    def reset(self):
+        """Deals a new game in every environment.
+
+        Returns:
+            tuple[numpy.ndarray, numpy.ndarray]: Observations and action
+            masks.
+        """
+        self._broadcast(_RESET)
+        return self.obs, self.masks
+
+    def step(self, actions):
+        """Plays one learner move in every environment.
+
+        Args:
+            actions (array-like of int): A legal action per environment.
+
+        Returns:
+            tuple: observations, rewards, terminated, truncated and action
+            masks, as arrays over the environments.
+        """
+        self.actions[:] = actions
+        self._broadcast(_STEP)
+        return (self.obs, self.rewards, self.terminated, self.truncated,
+                self.masks)
+
+    def close(self):
+        """Stops the workers and frees the shared memory.
+
+        Side effects:
+            The arrays of this object become unusable.
+        """
+        if not self._processes:
+            return
+        for conn in self._conns:
+            conn.send_bytes(_CLOSE)
+            conn.close()
+        for process in self._processes:
+            process.join()
+        self._processes = []
+        for key in ("obs", "masks", "actions", "rewards", "terminated",
+                    "truncated"):
+            setattr(self, key, None)
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def random_actions(masks, rng):
+    """Picks a random legal action in every environment.
+
+    Args:
+        masks (numpy.ndarray): Action masks, one row per environment.
+        rng (numpy.random.Generator): Source of the choices.
+
+    Returns:
+        numpy.ndarray: One action per row.
+    """
+    return np.where(masks, rng.random(masks.shape), -1.0).argmax(axis=1)
+
+
+def benchmark(n_envs=64, steps=2000, worker_counts=None, seed=0):
+    """Measures vector environment steps per second with random play.
+
+    Args:
+        n_envs (int, optional): Environments per vector environment.
+            Defaults to 64.
+        steps (int, optional): Vector steps per measurement. Defaults to
+            2000.
+        worker_counts (list[int], optional): Worker counts to measure.
+            Defaults to 1, 4 and all cores.
+        seed (int, optional): Base seed. Defaults to 0.
+
+    Returns:
+        dict: Environment steps per second by worker count.
+    """
+    if worker_counts is None:
+        worker_counts = sorted({1, 4, os.cpu_count() or 1})
+    rng = np.random.default_rng(seed)
+    rates = {}
+    for workers in worker_counts:
+        with VectorCardEnv(n_envs, workers, seed) as env:
+            _, masks = env.reset()
+            start = time.perf_counter()
+            for _ in range(steps):
+                _, _, _, _, masks = env.step(random_actions(masks, rng))
+            rates[workers] = n_envs * steps / (time.perf_counter() - start)
+    return rates
+
+
+def parse_args(arglist):
+    """Parse command-line arguments.
+
+    Args:
+        arglist (list of str): list of command-line arguments.
+
+    Returns:
+        namespace: a namespace with attributes "envs", "steps", "workers"
+        and "seed".
+    """
+    parser = ArgumentParser(description="Benchmark the vector environment "
+                                        "with random legal actions")
+    parser.add_argument("-e", "--envs", type=int, default=64,
+                        help="environments per vector environment")
+    parser.add_argument("-n", "--steps", type=int, default=2000,
+                        help="vector steps per measurement")
+    parser.add_argument("-w", "--workers", type=int, nargs="+", default=None,
+                        help="worker counts to measure (default: 1, 4 and "
+                             "all cores)")
+    parser.add_argument("-s", "--seed", type=int, default=0)
+    return parser.parse_args(arglist)
+
+
+if __name__ == "__main__":
+    args = parse_args(sys.argv[1:])
+    rates = benchmark(args.envs, args.steps, args.workers, args.seed)
+    for workers, rate in rates.items():
+        print(f"{workers:3} worker(s): {rate:12,.0f} steps/s")
@@ -1,21 +1,37 @@
+def _skip(card, get_next_player, draw_cards, reverse_direction):
+    """Skips the next player."""
+    return f"Skipped {get_next_player()}"
+
+
+def _reverse(card, get_next_player, draw_cards, reverse_direction):
+    """Reverses the direction of play."""
+    reverse_direction()
+    return "Direction reversed"
+
+
+def _draw_two(card, get_next_player, draw_cards, reverse_direction):
+    """Makes the next player draw 2 cards."""
+    next_player = get_next_player()
+    draw_cards(next_player, 2)
+    return f"{next_player} draws 2 cards."
+
+
+# Action names as in Deck.ACTIONS of the game module.
+SPECIAL_ACTIONS = {
+    "SKIP": _skip,
+    "REVERSE": _reverse,
+    "DRAW 2 CARDS": _draw_two,
+}
+
+
 def apply_special_action(card, get_next_player, draw_cards, reverse_direction):
     """Applies a special card action (skip, reverse, draw 2). Uses mock
     functions for the purpose of deliverable."""
-    
+
     if card.action is None:
         return "NO_ACTION"
-    
-    if card.action == "SKIP":
-        next_player = get_next_player()
-        return f"Skipped {next_player}"
-    
-    elif card.action == "REVERSE":
-        reverse_direction()
-        return "Direction reversed"
-    
-    elif card.action == "DRAW 2":
-        next_player = get_next_player()
-        draw_cards(next_player, 2)
-        return f"{next_player} draws 2 cards."
-    
-    return "UNKNOWN_ACTION"
\ No newline at end of file
+
+    action = SPECIAL_ACTIONS.get(card.action)
+    if action is None:
+        return "UNKNOWN_ACTION"
+    return action(card, get_next_player, draw_cards, reverse_direction)
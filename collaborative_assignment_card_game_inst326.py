@@ -1,19 +1,33 @@
 
 #Steve Rozario
 
+import copy
+import json
 import random
+import sys
+import time
+from abc import ABC, abstractmethod
+from argparse import ArgumentParser
+from collections import namedtuple
 from typing import List, Optional
 
 class Card:
     """This represesnts a card in the game. The card can be a normal or special 
     card.
+
+    Cards are small immutable values: every card also has an integer id that
+    packs its suit, rank and action into one byte (see card_id). Decks share
+    the interned instances in CARDS instead of building new ones.
     
     Attributes:
         suit (str): The suit of the card.
         ranktype (str): The value/rank of the card.
         action (str): Special effects of the card. 
+        id (int): Compact id of the card, from 0 to 63.
     
     """
+    __slots__ = ("suit", "ranktype", "action", "id", "_label")
+
     def __init__(self, suit, ranktype, action=None):
     
         """Creates card object with the suit, ranktype, and action. 
@@ -29,6 +43,11 @@ class Card:
         self.suit = suit
         self.ranktype = ranktype
         self.action = action
+        self.id = card_id(suit, ranktype, action)
+        if action:
+            self._label = f"{ranktype} of {suit} ({action})"
+        else:
+            self._label = f"{ranktype} of {suit}"
     
     def __repr__(self):
         """String representation of the card 
@@ -36,20 +55,344 @@ class Card:
         Returns:
             str: Description of the card and any special actions that was done.
         """
-        if self.action:
-            return f"{self.ranktype} of {self.suit} ({self.action})"
-        return f"{self.ranktype} of {self.suit}"
+        return self._label
+
+    def __eq__(self, other):
+        """Cards are equal when they have the same suit, rank and action.
+
+        Args:
+            other (object): The object to compare with.
+
+        Returns:
+            bool: True if other is a Card with the same id.
+        """
+        return isinstance(other, Card) and self.id == other.id
+
+    def __hash__(self):
+        """Hashes the card by its id.
+
+        Returns:
+            int: The card id.
+        """
+        return self.id
+
+    @staticmethod
+    def from_id(cid):
+        """Looks up the shared card instance for an id.
+
+        Args:
+            cid (int): Card id, from 0 to 63.
+
+        Returns:
+            Card: The interned card from CARDS.
+        """
+        return CARDS[cid]
     
     
 
 
+class CardPiles:
+    """The draw pile and the played pile of a deck in one buffer of card ids.
+
+    The buffer is circular. The draw pile starts at start, with the next card
+    to draw there, and the played pile follows right after it, with its top
+    card last:
+
+        [start, start + n_draw)  draw pile
+        [start + n_draw, start + n_draw + n_played)  played pile
+
+    (all positions modulo capacity). Drawing advances start, playing writes
+    just after the played pile, and reshuffling turns everything except the
+    top played card into the new draw pile by moving the two counters and
+    shuffling that stretch in place. Cards held in hands are not stored,
+    which is what leaves room for the played pile to grow.
+
+    Attributes:
+        buf (bytearray): The card ids.
+        capacity (int): Size of the buffer, at least the cards in the game.
+        start (int): Position of the top of the draw pile.
+        n_draw (int): Cards in the draw pile.
+        n_played (int): Cards in the played pile.
+        played_counts (list[int]): Copies of each card id in the played
+            pile, kept up to date on every play and reshuffle.
+    """
+
+    def __init__(self, capacity):
+        """Creates two empty piles.
+
+        Args:
+            capacity (int): Number of cards the piles can hold together.
+        """
+        self.buf = bytearray(capacity)
+        self.capacity = capacity
+        self.start = 0
+        self.n_draw = 0
+        self.n_played = 0
+        self.played_counts = [0] * len(CARDS)
+
+    def load(self, draw_ids, played_ids, capacity=None):
+        """Replaces both piles.
+
+        Args:
+            draw_ids (bytes or list[int]): Draw pile ids, bottom first and top
+                last (the order of Deck.cards).
+            played_ids (bytes or list[int]): Played pile ids, top last.
+            capacity (int, optional): New buffer size. Defaults to the current
+                size, grown if the piles do not fit.
+
+        Side effects:
+            Rewrites the buffer and counters.
+        """
+        n_draw, n_played = len(draw_ids), len(played_ids)
+        capacity = max(capacity or self.capacity, n_draw + n_played)
+        if capacity != self.capacity:
+            self.buf = bytearray(capacity)
+            self.capacity = capacity
+        self.buf[:n_draw] = bytes(draw_ids)[::-1]
+        self.buf[n_draw:n_draw + n_played] = bytes(played_ids)
+        self.start = 0
+        self.n_draw = n_draw
+        self.n_played = n_played
+        counts = self.played_counts = [0] * len(CARDS)
+        for cid in bytes(played_ids):
+            counts[cid] += 1
+
+    def copy(self):
+        """Makes an independent copy.
+
+        Returns:
+            CardPiles: Piles with the same cards in the same order.
+        """
+        piles = CardPiles.__new__(CardPiles)
+        piles.buf = self.buf[:]
+        piles.capacity = self.capacity
+        piles.start = self.start
+        piles.n_draw = self.n_draw
+        piles.n_played = self.n_played
+        piles.played_counts = self.played_counts.copy()
+        return piles
+
+    def pull(self):
+        """Takes the top card of the draw pile.
+
+        Returns:
+            int: Card id of the drawn card.
+        """
+        start = self.start
+        cid = self.buf[start]
+        start += 1
+        self.start = start if start < self.capacity else 0
+        self.n_draw -= 1
+        return cid
+
+    def push(self, cid):
+        """Puts a card on top of the played pile.
+
+        Args:
+            cid (int): Card id of the played card.
+        """
+        self.buf[(self.start + self.n_draw + self.n_played)
+                 % self.capacity] = cid
+        self.n_played += 1
+        self.played_counts[cid] += 1
+
+    def pop(self):
+        """Takes the top card of the played pile.
+
+        Returns:
+            int: Card id of the removed card.
+        """
+        self.n_played -= 1
+        cid = self.buf[(self.start + self.n_draw + self.n_played)
+                       % self.capacity]
+        self.played_counts[cid] -= 1
+        return cid
+
+    def shuffle_draw(self, rng):
+        """Shuffles the draw pile in place (Fisher-Yates).
+
+        Args:
+            rng (random.Random): Source of randomness.
+        """
+        buf, start, capacity = self.buf, self.start, self.capacity
+        random_ = rng.random
+        if start + self.n_draw <= capacity:
+            # The pile does not wrap around, so no modulo is needed.
+            for i in range(start + self.n_draw - 1, start, -1):
+                j = start + int(random_() * (i - start + 1))
+                buf[i], buf[j] = buf[j], buf[i]
+            return
+        for i in range(self.n_draw - 1, 0, -1):
+            j = int(random_() * (i + 1))
+            a, b = (start + i) % capacity, (start + j) % capacity
+            buf[a], buf[b] = buf[b], buf[a]
+
+    def reload(self, rng):
+        """Turns all played cards but the top one into the draw pile.
+
+        Any cards still in the draw pile stay in it and are shuffled along.
+
+        Args:
+            rng (random.Random): Source of randomness for the shuffle.
+        """
+        top = self.buf[(self.start + self.n_draw + self.n_played - 1)
+                       % self.capacity]
+        self.n_draw += self.n_played - 1
+        self.n_played = 1
+        self.played_counts = [0] * len(CARDS)
+        self.played_counts[top] = 1
+        self.shuffle_draw(rng)
+
+    def draw_ids(self):
+        """Returns the draw pile, bottom first and top last.
+
+        Returns:
+            bytes: The card ids.
+        """
+        return self._span(self.start, self.n_draw)[::-1]
+
+    def played_ids(self):
+        """Returns the played pile, top last.
+
+        Returns:
+            bytes: The card ids.
+        """
+        return self._span(self.start + self.n_draw, self.n_played)
+
+    def _span(self, first, count):
+        """Reads count ids from position first, wrapping around the buffer.
+
+        Args:
+            first (int): Starting position, may be past the end.
+            count (int): Number of ids.
+
+        Returns:
+            bytes: The ids in buffer order.
+        """
+        first %= self.capacity
+        end = first + count
+        if end <= self.capacity:
+            return bytes(self.buf[first:end])
+        return bytes(self.buf[first:]) + bytes(self.buf[:end - self.capacity])
+
+
+class PileView:
+    """List-like access to one of a deck's piles, as Card objects.
+
+    Deck.cards and Deck.played_cards return these so that code written for
+    plain lists keeps working. Index 0 is the bottom of the pile and -1 its
+    top, just like the lists the piles used to be.
+    """
+
+    def __init__(self, deck, played):
+        """Creates a view.
+
+        Args:
+            deck (Deck): The deck whose piles are shown.
+            played (bool): True for the played pile, False for the draw pile.
+        """
+        self._deck = deck
+        self._played = played
+
+    def _ids(self):
+        """Returns the pile's card ids, bottom first."""
+        piles = self._deck.piles
+        return piles.played_ids() if self._played else piles.draw_ids()
+
+    def __len__(self):
+        """Number of cards in the pile."""
+        piles = self._deck.piles
+        return piles.n_played if self._played else piles.n_draw
+
+    def __iter__(self):
+        """Iterates from the bottom of the pile to the top."""
+        return iter(unpack_cards(self._ids()))
+
+    def __getitem__(self, index):
+        """Returns one card, or a list of cards for a slice."""
+        if isinstance(index, slice):
+            return unpack_cards(self._ids()[index])
+        piles = self._deck.piles
+        size = len(self)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("pile index out of range")
+        if self._played:
+            position = piles.start + piles.n_draw + index
+        else:
+            position = piles.start + piles.n_draw - 1 - index
+        return CARDS[piles.buf[position % piles.capacity]]
+
+    def __eq__(self, other):
+        """Compares the cards with any sequence of cards."""
+        return list(self) == list(other)
+
+    def __repr__(self):
+        """String representation of the cards, bottom first."""
+        return repr(list(self))
+
+    def append(self, card):
+        """Puts a card on top of the pile.
+
+        Args:
+            card (Card): The card to add.
+        """
+        if self._played:
+            self._deck.discard(card)
+        else:
+            self.extend([card])
+
+    def extend(self, cards):
+        """Puts cards on top of the pile, in order.
+
+        Args:
+            cards (iterable of Card): The cards to add.
+        """
+        if self._played:
+            for card in cards:
+                self._deck.discard(card)
+        else:
+            piles = self._deck.piles
+            piles.load(self._ids() + pack_cards(cards), piles.played_ids())
+
+    def pop(self):
+        """Removes and returns the top card of the pile.
+
+        Returns:
+            Card: The top card.
+
+        Raises:
+            IndexError: If the pile is empty.
+        """
+        if not len(self):
+            raise IndexError("pop from empty pile")
+        piles = self._deck.piles
+        if self._played:
+            return CARDS[piles.pop()]
+        return CARDS[piles.pull()]
+
+    def copy(self):
+        """Returns the cards as a plain list, bottom first."""
+        return list(self)
+
+
+class DeckExhausted(ValueError):
+    """Raised when a card must be drawn but the deck and the played pile
+    (apart from its top card) are both empty, so nobody can win the game.
+    """
+
+
 class Deck:
     """Shows the deck of cards that will be used. The deck has normal and action
     cards. Additionally, the deck class will handle shuffling, pulling cards, 
     and looping the deck back once the cards have run out.
 
+    The draw pile and the played pile live together in a CardPiles buffer;
+    cards and played_cards give list-like access to them.
+
     Raises:
-        ValueError: Happens when there isn't enough cards and deck is trying to
+        DeckExhausted: Happens when there isn't enough cards and deck is trying to
         reload the cards already played.
 
     Returns:
@@ -59,113 +402,906 @@ class Deck:
     RANKS = ["A", "2", "3", "4", "5", "6", "7", "8", "9", "10", "J", "Q", "K"]
     ACTIONS = ["SKIP", "DRAW 2 CARDS", "REVERSE"]
     
-    def __init__(self):
+    def __init__(self, events=None, rng=None, decks=1):
         """Creates the cards, card shuffling, and selecting random ranks for 
         wild cards.
-        """
-        self.cards = []           
-        self.played_cards = []   
 
-        self.wild_rank = random.choice(self.RANKS)
+        Args:
+            events (EventSink, optional): Receives "reshuffle" events.
+                Defaults to NULL_SINK.
+            rng (random.Random, optional): Random generator used for every
+                shuffle. Defaults to a new, unseeded generator.
+            decks (int, optional): Number of 64-card decks combined into one
+                shoe. Defaults to 1.
+
+        Raises:
+            ValueError: If decks is not positive.
+        """
+        if decks < 1:
+            raise ValueError(f"a shoe needs at least one deck, not {decks}")
+        self.decks = decks
+        self.piles = CardPiles(len(DECK_TEMPLATE) * decks)
+        self.reshuffles = 0
+        self.start_retries = 0
+        self.events = events if events is not None else NULL_SINK
+        self.rng = rng if rng is not None else random.Random()
+
+        self.wild_rank = self.rng.choice(self.RANKS)
         self.build_deck()
         self.shuffle()
+
+    @property
+    def cards(self):
+        """PileView: The draw pile; the last card is drawn next."""
+        return PileView(self, played=False)
+
+    @cards.setter
+    def cards(self, cards):
+        self.piles.load(pack_cards(cards), self.piles.played_ids())
+
+    @property
+    def played_cards(self):
+        """PileView: The played pile; the last card is on top."""
+        return PileView(self, played=True)
+
+    @played_cards.setter
+    def played_cards(self, cards):
+        self.piles.load(self.piles.draw_ids(), pack_cards(cards))
+
+    def played_count(self, suit):
+        """Counts the cards of a suit in the played pile.
+
+        The pile keeps a running count per card id, so this does not depend
+        on how many cards have been played.
+
+        Args:
+            suit (str): One of SUITS.
+
+        Returns:
+            int: Cards of that suit played since the last reshuffle,
+            including the top card.
+        """
+        index = self.SUITS.index(suit) << 4
+        return sum(self.piles.played_counts[index:index + 16])
         
     def build_deck(self):
         """Makes the complete deck with the normal cards and the action cards. 
         The action cards have special effects(Skip, reverse, Draw 2 cards).
+
+        The card ids are copied from the prebuilt DECK_TEMPLATE, once per
+        deck in the shoe, so no new Card objects are created.
         """
-        for suit in self.SUITS:
-            for rank in self.RANKS:
-                self.cards.append(Card(suit, rank))
-        
-        for suit in self.SUITS:
-            for action in self.ACTIONS:
-                self.cards.append(Card(suit, "ACTION", action))
+        piles = self.piles
+        piles.load(piles.draw_ids() + TEMPLATE_IDS * self.decks,
+                   piles.played_ids())
                 
     def shuffle(self):
         """Cards in the deck get randomized.
         """
-        random.shuffle(self.cards)
+        self.piles.shuffle_draw(self.rng)
         
     def card_pull(self):
         """Draws a card and if needed, reshuffles the card pile that is already 
         used.
 
         Returns:
-            Card: Card taken from the top of the deck.
-        """
-        if not self.cards:
-            self.reload_played_cards()
-        return self.cards.pop()
-    
-    def reload_played_cards(self):
-        """Reloads the cards played back into the deck excluding the top card.
-        
-        Raises:
-            ValueError: In case there isn't enough cards to rebuild the deck.
+            Card: Card taken from the top of the deck.
+
+        Raises:
+            DeckExhausted: If there is no card left to draw.
+        """
+        piles = self.piles
+        if not piles.n_draw:
+            self.reload_played_cards()
+        return CARDS[piles.pull()]
+
+    def discard(self, card):
+        """Puts a played card on top of the played pile.
+
+        Args:
+            card (Card): The card that was played.
+        """
+        self.piles.push(card.id)
+    
+    def reload_played_cards(self):
+        """Reloads the cards played back into the deck excluding the top card.
+
+        The cards are shuffled in place in the shared buffer; nothing is
+        copied.
+        
+        Raises:
+            DeckExhausted: In case there isn't enough cards to rebuild the deck.
+        """
+        if self.piles.n_played <= 1:
+            raise DeckExhausted("Not enough cards to restart deck")
+        
+        self.piles.reload(self.rng)
+        self.reshuffles += 1
+        if self.events.enabled:
+            self.events.emit("reshuffle", count=self.piles.n_draw)
+        
+    def start_game(self):
+        """Draws a card that is valid and not an action card.
+
+        Instead of putting action cards back and reshuffling the whole deck,
+        a random card of the draw pile is swapped to the top until it is not
+        an action card (one lazy Fisher-Yates step per try). The starting card
+        and the rest of the pile end up just as random as before.
+
+        Returns:
+            Card: The card that starts the game(Non-action card).
+        """
+        piles = self.piles
+        if not piles.n_draw:
+            self.reload_played_cards()
+        buf, top = piles.buf, piles.start
+        while True:
+            pick = (top + int(self.rng.random() * piles.n_draw)) % piles.capacity
+            buf[top], buf[pick] = buf[pick], buf[top]
+            if CARDS[buf[top]].action is None:
+                break
+            self.start_retries += 1
+        
+        card = CARDS[piles.pull()]
+        piles.push(card.id)
+        return card
+
+
+# Card ids pack the suit index into the high bits and the rank (0-12) or
+# action (13-15) into the low four bits, so all 64 cards fit in one byte.
+ACTION_OFFSET = len(Deck.RANKS)
+
+
+def card_id(suit, ranktype, action=None):
+    """Computes the compact integer id of a card.
+
+    Args:
+        suit (str): The suit of the card.
+        ranktype (str): The value/rank of the card, or "ACTION".
+        action (str, optional): Special effect of the card. Defaults to None.
+
+    Returns:
+        int: (suit index << 4) | rank index, where action cards use
+        ACTION_OFFSET + action index as their rank index.
+
+    Raises:
+        ValueError: If the suit, rank or action is unknown.
+    """
+    if action is not None:
+        kind = ACTION_OFFSET + Deck.ACTIONS.index(action)
+    else:
+        kind = Deck.RANKS.index(ranktype)
+    return Deck.SUITS.index(suit) << 4 | kind
+
+
+def _build_card_table():
+    """Builds the interned card instances, indexed by card id.
+
+    Returns:
+        tuple[Card]: One Card for every id from 0 to 63.
+    """
+    table = [None] * (len(Deck.SUITS) << 4)
+    for suit in Deck.SUITS:
+        for rank in Deck.RANKS:
+            card = Card(suit, rank)
+            table[card.id] = card
+        for action in Deck.ACTIONS:
+            card = Card(suit, "ACTION", action)
+            table[card.id] = card
+    return tuple(table)
+
+
+CARDS = _build_card_table()
+
+# Unshuffled deck in the original build order: normal cards, then actions.
+DECK_TEMPLATE = tuple(
+    [CARDS[card_id(suit, rank)] for suit in Deck.SUITS for rank in Deck.RANKS]
+    + [CARDS[card_id(suit, "ACTION", action)]
+       for suit in Deck.SUITS for action in Deck.ACTIONS])
+TEMPLATE_IDS = bytes([card.id for card in DECK_TEMPLATE])
+
+# Large tables get one more deck for every PLAYERS_PER_DECK players, so the
+# shoe never runs dry while dealing and hands can still grow.
+PLAYERS_PER_DECK = 4
+HAND_SIZE = 7
+
+
+def decks_needed(n_players):
+    """Returns how many decks a table of n_players plays with by default.
+
+    Args:
+        n_players (int): Number of players at the table.
+
+    Returns:
+        int: One deck for up to PLAYERS_PER_DECK players, one more for each
+        PLAYERS_PER_DECK after that.
+    """
+    return max(1, -(-n_players // PLAYERS_PER_DECK))
+
+
+def check_shoe(n_players, decks):
+    """Checks that a shoe of decks can deal a table of n_players.
+
+    Args:
+        n_players (int): Number of players at the table.
+        decks (int): Decks in the shoe.
+
+    Raises:
+        ValueError: If decks is not positive, or the shoe has fewer cards
+            than the hands and the starting card need.
+    """
+    if decks < 1:
+        raise ValueError(f"a shoe needs at least one deck, not {decks}")
+    needed = n_players * HAND_SIZE + 1
+    if needed > len(DECK_TEMPLATE) * decks:
+        raise ValueError(f"{n_players} players need {needed} cards, but "
+                         f"{decks} deck(s) hold {len(DECK_TEMPLATE) * decks}")
+
+
+def pack_cards(cards):
+    """Stores a list of cards compactly as one byte per card.
+
+    Args:
+        cards (iterable of Card): Cards such as Deck.cards or Player.hand.
+
+    Returns:
+        bytes: The card ids in the same order.
+    """
+    return bytes([card.id for card in cards])
+
+
+def unpack_cards(data):
+    """Turns packed card ids back into the shared Card instances.
+
+    Args:
+        data (bytes or array): Card ids, e.g. from pack_cards.
+
+    Returns:
+        list[Card]: The cards in the same order.
+    """
+    return [CARDS[cid] for cid in data]
+
+
+_MASK_64 = (1 << 64) - 1
+
+
+def derive_seed(seed, index):
+    """Derives an independent seed, e.g. for one game of a simulation.
+
+    Uses one SplitMix64 step, so seeds for different indexes are unrelated
+    even when the base seeds are consecutive.
+
+    Args:
+        seed (int): Base seed.
+        index (int): Which derived seed to compute.
+
+    Returns:
+        int: A 64-bit seed.
+    """
+    z = (seed + (index + 1) * 0x9E3779B97F4A7C15) & _MASK_64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK_64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK_64
+    return z ^ (z >> 31)
+
+
+SUIT_INDEX = {suit: i for i, suit in enumerate(Deck.SUITS)}
+
+
+def _build_legal_masks(wild_mask=0):
+    """Precomputes which card ids may be played on every top card and suit.
+
+    Args:
+        wild_mask (int, optional): Card ids that are wild like the 8s.
+            Defaults to none.
+
+    Returns:
+        tuple[int]: Bitmasks over card ids, indexed by
+        (top card id << 2) | current suit index.
+    """
+    action_mask = eight_mask = 0
+    suit_masks = [0] * len(Deck.SUITS)
+    rank_masks = [0] * 16
+    for card in CARDS:
+        bit = 1 << card.id
+        suit_masks[SUIT_INDEX[card.suit]] |= bit
+        rank_masks[card.id & 15] |= bit
+        if card.action is not None:
+            action_mask |= bit
+        elif card.ranktype == "8":
+            eight_mask |= bit
+
+    masks = [0] * (len(CARDS) << 2)
+    for top in CARDS:
+        # Cards with the same ranktype as an action card are the actions.
+        same_rank = action_mask if top.action else rank_masks[top.id & 15]
+        for suit, index in SUIT_INDEX.items():
+            #rule: cards that follow uno rules(special)
+            #rule: Crazy 8/wildcard
+            #rule: Makes sure the suit matches
+            #rule: The ranks of the cards match
+            masks[top.id << 2 | index] = (action_mask | eight_mask | wild_mask
+                                          | suit_masks[index] | same_rank)
+    return tuple(masks)
+
+
+LEGAL_MASKS = _build_legal_masks()
+
+
+class Hand:
+    """The cards a player holds, indexed by card id.
+
+    The cards keep the order they were drawn in, and a bitmask of the card ids
+    held is updated on every draw and play. The legal plays for a top card and
+    suit are then a single AND with a row of LEGAL_MASKS. Counts per suit and
+    per rank are kept up to date the same way, so CPU heuristics can ask
+    about the hand's make-up without scanning it.
+
+    Attributes:
+        cards (list[Card]): The cards in the order they were drawn.
+        counts (bytearray): How many copies of each card id are held.
+        mask (int): Bit i is set when card id i is held.
+        suit_counts (list[int]): Cards held of each suit, in the order of
+            Deck.SUITS.
+        rank_counts (list[int]): Cards held of each rank, indexed by the low
+            four bits of the card id: Deck.RANKS, then Deck.ACTIONS.
+    """
+
+    def __init__(self, cards=()):
+        """Creates a hand, optionally holding some cards already.
+
+        Args:
+            cards (iterable of Card, optional): Starting cards. Defaults to none.
+        """
+        self.cards = []
+        self.counts = bytearray(len(CARDS))
+        self.mask = 0
+        self.suit_counts = [0] * len(Deck.SUITS)
+        self.rank_counts = [0] * 16
+        for card in cards:
+            self.append(card)
+
+    @classmethod
+    def from_ids(cls, data):
+        """Rebuilds a hand from packed card ids.
+
+        Args:
+            data (bytes): Card ids in hand order, e.g. from pack_cards.
+
+        Returns:
+            Hand: A hand holding those cards.
+        """
+        hand = cls()
+        hand.cards = [CARDS[cid] for cid in data]
+        counts, suits, ranks = hand.counts, hand.suit_counts, hand.rank_counts
+        mask = 0
+        for cid in data:
+            counts[cid] += 1
+            suits[cid >> 4] += 1
+            ranks[cid & 15] += 1
+            mask |= 1 << cid
+        hand.mask = mask
+        return hand
+
+    def copy(self):
+        """Makes an independent copy of the hand.
+
+        Returns:
+            Hand: A hand with the same cards in the same order.
+        """
+        hand = Hand.__new__(Hand)
+        hand.cards = self.cards.copy()
+        hand.counts = self.counts[:]
+        hand.mask = self.mask
+        hand.suit_counts = self.suit_counts.copy()
+        hand.rank_counts = self.rank_counts.copy()
+        return hand
+
+    def append(self, card):
+        """Adds a card to the end of the hand.
+
+        Args:
+            card (Card): The card drawn.
+
+        Side effects:
+            Updates the card list, counts and mask.
+        """
+        cid = card.id
+        self.cards.append(card)
+        self.counts[cid] += 1
+        self.suit_counts[cid >> 4] += 1
+        self.rank_counts[cid & 15] += 1
+        self.mask |= 1 << cid
+
+    def remove(self, card):
+        """Removes the first copy of a card from the hand.
+
+        Args:
+            card (Card): The card played.
+
+        Raises:
+            ValueError: If the card is not in the hand.
+
+        Side effects:
+            Updates the card list, counts and mask.
+        """
+        cid = card.id
+        self.cards.remove(card)
+        counts = self.counts
+        counts[cid] -= 1
+        self.suit_counts[cid >> 4] -= 1
+        self.rank_counts[cid & 15] -= 1
+        if not counts[cid]:
+            self.mask &= ~(1 << cid)
+
+    @property
+    def action_count(self):
+        """int: Number of action cards held."""
+        return sum(self.rank_counts[ACTION_OFFSET:])
+
+    def legal_mask(self, played_card, current_suit, masks=LEGAL_MASKS):
+        """Finds the card ids in the hand that may be played.
+
+        Args:
+            played_card (Card): The recent card on top of the card pile.
+            current_suit (str): The suit that has to be followed.
+            masks (tuple[int], optional): Legal plays laid out like
+                LEGAL_MASKS, e.g. Game.legal_masks for a rule variant.
+                Defaults to LEGAL_MASKS.
+
+        Returns:
+            int: Bitmask of the legal card ids held.
+        """
+        return self.mask & masks[played_card.id << 2
+                                 | SUIT_INDEX[current_suit]]
+
+    def valid_cards(self, played_card, current_suit, masks=LEGAL_MASKS):
+        """Lists the legal cards in hand order.
+
+        Args:
+            played_card (Card): The recent card on top of the card pile.
+            current_suit (str): The suit that has to be followed.
+            masks (tuple[int], optional): Legal plays, see legal_mask.
+                Defaults to LEGAL_MASKS.
+
+        Returns:
+            list[Card]: The cards that may be played, in hand order.
+        """
+        legal = self.legal_mask(played_card, current_suit, masks)
+        if not legal:
+            return []
+        return [card for card in self.cards if legal >> card.id & 1]
+
+    def first_valid(self, played_card, current_suit, masks=LEGAL_MASKS):
+        """Finds the first legal card in hand order.
+
+        Args:
+            played_card (Card): The recent card on top of the card pile.
+            current_suit (str): The suit that has to be followed.
+            masks (tuple[int], optional): Legal plays, see legal_mask.
+                Defaults to LEGAL_MASKS.
+
+        Returns:
+            Card or None: The first card that may be played, if any.
+        """
+        legal = self.legal_mask(played_card, current_suit, masks)
+        if legal:
+            for card in self.cards:
+                if legal >> card.id & 1:
+                    return card
+        return None
+
+    def __len__(self):
+        """Number of cards held."""
+        return len(self.cards)
+
+    def __iter__(self):
+        """Iterates over the cards in hand order."""
+        return iter(self.cards)
+
+    def __getitem__(self, index):
+        """Returns the card at a position in the hand."""
+        return self.cards[index]
+
+    def __contains__(self, card):
+        """Checks the mask for a card in constant time."""
+        return bool(self.mask >> card.id & 1)
+
+    def __repr__(self):
+        """String representation of the cards in hand order."""
+        return repr(self.cards)
+
+
+def card_validation(hand, played_card, current_suit):
+    """Returns the valid card using Crazy 8 and Uno rules. It handles concerns
+    determining whether or not the cards played are valid/invalid.
+
+    A card is valid if it is an action card, an 8, follows the current suit,
+    or has the same rank as the played card. The checks are precomputed in
+    LEGAL_MASKS and applied through the hand's index.
+
+    Args:
+        hand (Hand or list[Card]): The hand player has currently.
+        played_card (Card): The recent card on top of the card pile
+        current_suit (str): To follow the suit that is being played unless it 
+        is changed by the wild card(8).
+
+    Returns:
+        Card or None: Plays the first card that is valid, otherwise it will 
+        return none.
+    """
+    if not isinstance(hand, Hand):
+        hand = Hand(hand)
+    return hand.first_valid(played_card, current_suit)
+
+
+DRAW_2_MASK = sum(1 << card.id for card in CARDS
+                  if card.action == "DRAW 2 CARDS")
+
+
+class RuleSet:
+    """A variant of the rules, selectable per game.
+
+    The standard rules are STANDARD_RULES; the variants in RULESETS switch on
+    any of:
+
+        stack_draws   a DRAW 2 CARDS may be answered with another one, and
+                      the first player who cannot answer draws them all
+        wild_rank     cards of the deck's wild rank are wild like the 8s
+        jump_in       a player holding the same card as the one just played
+                      may play it at once, out of turn; play goes on from
+                      them
+
+    A rule set is compiled once into RuleTables (per wild rank when that
+    matters), so a turn only looks rules up by card id.
+
+    Attributes:
+        name (str): Name of the rule set, used in recordings and on the
+            command line.
+        stack_draws (bool): Whether DRAW 2 CARDS stack.
+        wild_rank (bool): Whether the deck's wild rank is wild.
+        jump_in (bool): Whether players may jump in.
+    """
+
+    def __init__(self, name, stack_draws=False, wild_rank=False,
+                 jump_in=False):
+        """Creates a rule set.
+
+        Args:
+            name (str): Name of the rule set.
+            stack_draws (bool, optional): DRAW 2 CARDS stack. Defaults to
+                False.
+            wild_rank (bool, optional): The deck's wild rank is wild.
+                Defaults to False.
+            jump_in (bool, optional): Players may jump in. Defaults to False.
+        """
+        self.name = name
+        self.stack_draws = stack_draws
+        self.wild_rank = wild_rank
+        self.jump_in = jump_in
+        self._tables = {}
+
+    def tables(self, wild_rank):
+        """Returns the compiled rules for a deck.
+
+        Args:
+            wild_rank (str): The deck's wild rank (Deck.wild_rank).
+
+        Returns:
+            RuleTables: The tables, compiled on first use and then shared by
+            every game with the same rules and wild rank.
+        """
+        key = wild_rank if self.wild_rank else None
+        tables = self._tables.get(key)
+        if tables is None:
+            tables = self._tables[key] = RuleTables(self, key)
+        return tables
+
+    def __repr__(self):
+        """String representation of the rule set."""
+        return f"RuleSet({self.name!r})"
+
+
+class RuleTables:
+    """The rules of a RuleSet compiled into tables indexed by card id.
+
+    Attributes:
+        rules (RuleSet): The rule set the tables were compiled from.
+        legal_masks (tuple[int]): Legal plays, laid out like LEGAL_MASKS (and
+            LEGAL_MASKS itself under the standard rules).
+        stack_masks (tuple[int] or None): The same layout while DRAW 2 CARDS
+            are stacked, where only another DRAW 2 CARDS is legal.
+        wild (bytes): 1 for every card id that lets the player pick a suit.
+        actions (tuple): The Game method applying each card id's action, or
+            None for cards without one.
+        draw_counts (bytes): Cards the next player draws at once because of
+            each card id.
+        jump_in (bool): Whether players may jump in.
+    """
+
+    def __init__(self, rules, wild_rank=None):
+        """Compiles the tables.
+
+        Args:
+            rules (RuleSet): The rules to compile.
+            wild_rank (str, optional): Rank that is wild besides the 8s.
+                Defaults to none.
+        """
+        self.rules = rules
+        wild = [card.action is None and card.ranktype in ("8", wild_rank)
+                for card in CARDS]
+        wild_mask = sum(1 << card.id for card in CARDS
+                        if wild[card.id] and card.ranktype != "8")
+        self.legal_masks = (_build_legal_masks(wild_mask) if wild_mask
+                            else LEGAL_MASKS)
+        self.stack_masks = None
+        self.wild = bytes(wild)
+
+        draw = Game._stack_draw_two if rules.stack_draws else Game._draw_two
+        handlers = {"SKIP": Game._skip, "REVERSE": Game._reverse,
+                    "DRAW 2 CARDS": draw}
+        self.actions = tuple(handlers[card.action] if card.action else None
+                             for card in CARDS)
+        self.draw_counts = bytes(
+            2 if card.action == "DRAW 2 CARDS" and not rules.stack_draws
+            else 0 for card in CARDS)
+        if rules.stack_draws:
+            self.stack_masks = (DRAW_2_MASK,) * len(LEGAL_MASKS)
+        self.jump_in = rules.jump_in
+
+
+STANDARD_RULES = RuleSet("standard")
+RULESETS = {
+    STANDARD_RULES.name: STANDARD_RULES,
+    "stacking": RuleSet("stacking", stack_draws=True),
+    "wild-rank": RuleSet("wild-rank", wild_rank=True),
+    "jump-in": RuleSet("jump-in", jump_in=True),
+    "house": RuleSet("house", stack_draws=True, wild_rank=True, jump_in=True),
+}
+            
+        
+class EventSink(ABC):
+    """Receives the structured events of a game.
+
+    Game, Deck and Player call emit with an event kind and keyword fields
+    instead of printing. The kinds are "start", "card_played",
+    "suit_changed", "skip", "reverse", "draw", "reshuffle" and "win".
+    Callers check enabled first, so a disabled sink costs one attribute
+    lookup per event.
+
+    Attributes:
+        enabled (bool): Whether the sink wants events at all.
+    """
+    enabled = True
+
+    @abstractmethod
+    def emit(self, kind, **fields):
+        """Handles one event.
+
+        Args:
+            kind (str): The kind of event, e.g. "card_played".
+            **fields: Event data such as player names, cards and suits.
+        """
+
+    def close(self):
+        """Flushes and releases anything the sink holds.
+        """
+
+
+class NullSink(EventSink):
+    """Discards every event. Used by headless simulations.
+    """
+    enabled = False
+
+    def emit(self, kind, **fields):
+        """Ignores the event.
+        """
+
+
+NULL_SINK = NullSink()
+
+
+class TerminalSink(EventSink):
+    """Prints events as the messages of the interactive game.
+
+    Attributes:
+        file (file object or None): Where messages go. None means stdout.
+    """
+    MESSAGES = {
+        "start": "Starting card: {card}",
+        "card_played": "{player} plays: {card}",
+        "suit_changed": "{player} changes suit to {suit}",
+        "skip": "{player} played SKIP! {target} is skipped!",
+        "reverse": "{player} played REVERSE! Changing direction.",
+        "draw": "{player} has no valid cards. Drawing a card...",
+        "reshuffle": "Reshuffling {count} played cards into the deck.",
+        "stack": "{player} played DRAW 2 CARDS! {target} must play another "
+                 "or draw {count} cards.",
+        "jump_in": "{player} jumps in with {card}!",
+        "win": "\n{player} has won the game! Congratulations!",
+    }
+    DRAW_2_MESSAGE = "{by} played DRAW 2 CARDS! {player} draws {count} cards."
+
+    def __init__(self, file=None):
+        """Creates a renderer.
+
+        Args:
+            file (file object, optional): Output stream. Defaults to stdout.
+        """
+        self.file = file
+
+    def emit(self, kind, **fields):
+        """Prints the message for an event.
+
+        Args:
+            kind (str): The kind of event.
+            **fields: Values for the message template.
+
+        Side effects:
+            Prints to the terminal.
+        """
+        if kind == "draw" and fields.get("by"):
+            message = self.DRAW_2_MESSAGE
+        else:
+            message = self.MESSAGES[kind]
+        print(message.format(**fields), file=self.file)
+
+
+class ListSink(EventSink):
+    """Keeps every event in memory as a dictionary.
+
+    Attributes:
+        events (list[dict]): Events in order, each with an "event" key for
+            the kind plus its fields.
+    """
+
+    def __init__(self):
+        """Creates an empty buffer.
+        """
+        self.events = []
+
+    def emit(self, kind, **fields):
+        """Stores the event.
+
+        Args:
+            kind (str): The kind of event.
+            **fields: The event data.
+
+        Side effects:
+            Appends to events.
+        """
+        self.events.append({"event": kind, **fields})
+
+
+class JsonLinesSink(EventSink):
+    """Writes events to a newline-delimited JSON file in batches.
+
+    Cards are written as their text (e.g. "8 of HEARTS"). Lines are kept in
+    a buffer and written batch_size at a time; call close (or use the sink as
+    a context manager) to write the rest.
+
+    Attributes:
+        batch_size (int): Number of events per write.
+    """
+
+    def __init__(self, path, batch_size=1000):
+        """Opens the output file.
+
+        Args:
+            path (str): File to append to.
+            batch_size (int, optional): Events per write. Defaults to 1000.
+
+        Side effects:
+            Opens path for appending.
+        """
+        self.batch_size = batch_size
+        self._file = open(path, "a", encoding="utf-8")
+        self._lines = []
+
+    def emit(self, kind, **fields):
+        """Buffers the event as one JSON line.
+
+        Args:
+            kind (str): The kind of event.
+            **fields: The event data.
+
+        Side effects:
+            Writes to the file when the buffer is full.
+        """
+        self._lines.append(json.dumps({"event": kind, **fields}, default=repr))
+        if len(self._lines) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Writes the buffered lines.
+
+        Side effects:
+            Writes to the file and empties the buffer.
+        """
+        if self._lines:
+            self._file.write("\n".join(self._lines) + "\n")
+            self._lines = []
+
+    def close(self):
+        """Writes the buffered lines and closes the file.
+
+        Side effects:
+            Closes the file.
+        """
+        self.flush()
+        self._file.close()
+
+    def __enter__(self):
+        """Returns the sink for use in a with statement."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Closes the sink at the end of a with statement."""
+        self.close()
+
+
+class Strategy(ABC):
+    """Decides the moves of a CPU player.
+
+    A strategy picks the card to play and the suit to change to after an 8.
+    It gets the player's hand and the game, and must not change either.
+    Strategies keep no per-game state, so one instance can serve any number
+    of players and games. The built-in CPU plays FirstValidStrategy; more
+    strategies are in strategies.py.
+
+    Attributes:
+        name (str): Name of the strategy, used in recordings and reports.
+    """
+    name = None
+
+    @abstractmethod
+    def choose_card(self, hand, game):
+        """Picks the card to play.
+
+        Args:
+            hand (Hand): The player's cards.
+            game (Game): The game being played.
+
+        Returns:
+            Card or None: A legal card from the hand, or None to draw.
         """
-        if len(self.played_cards) <= 1:
-            raise ValueError("Not enough cards to restart deck")
-        
-        top = self.played_cards[-1]
-        self.cards = self.played_cards[:-1]
-        self.played_cards = [top]
-        self.shuffle()
-        
-    def start_game(self):
-        """Draws a card that is valid and not an action card.
+
+    def choose_suit(self, hand, game):
+        """Picks the new suit after playing an 8.
+
+        The default picks a suit at random with the game's generator.
+
+        Args:
+            hand (Hand): The player's cards, without the 8 just played.
+            game (Game): The game being played.
 
         Returns:
-            Card: The card that starts the game(Non-action card).
+            str: One of Deck.SUITS.
         """
-        card = self.card_pull()
-        
-        while card.action is not None:
-            self.cards.insert(0, card)
-            self.shuffle()
-            card = self.card_pull()
-        
-        self.played_cards.append(card)
-        return card
+        return game.rng.choice(Deck.SUITS)
 
 
-def card_validation(hand, played_card, current_suit):
-    """Returns the valid card using Crazy 8 and Uno rules. It handles concerns
-    determining whether or not the cards played are valid/invalid.
+class FirstValidStrategy(Strategy):
+    """Plays the first legal card in hand order and picks a random suit.
+    """
+    name = "first-valid"
 
-    Args:
-        hand (list[Card]): The hand player has currently.
-        played_card (Card): The recent card on top of the card pile
-        current_suit (str): To follow the suit that is being played unless it 
-        is changed by the wild card(8).
+    def choose_card(self, hand, game):
+        """Picks the first legal card.
+
+        Args:
+            hand (Hand): The player's cards.
+            game (Game): The game being played.
+
+        Returns:
+            Card or None: The first legal card, or None to draw.
+        """
+        return hand.first_valid(game.played_card, game.current_suit,
+                                game.legal_masks)
+
+
+FIRST_VALID = FirstValidStrategy()
 
-    Returns:
-        Card or None: Plays the first card that is valid, otherwise it will 
-        return none.
-    """
-    valid_cards= []
-    for card in hand:
 
-        #rule: cards that follow uno rules(special)
-        if card.action is not None:
-            valid_cards.append(card)
-        
-        #rule: Crazy 8/wildcard
-        elif card.ranktype == "8":
-            valid_cards.append(card)
-            
-        #rule: Makes sure the suit matches
-        elif card.suit == current_suit:
-            valid_cards.append(card)
-            
-        #rule: The ranks of the cards match 
-        elif card.ranktype == played_card.ranktype:
-            valid_cards.append(card)
-            
-            
-    return valid_cards[0] if valid_cards else None
-            
-        
 #Brandon Appleton
 
 class Player:
@@ -174,24 +1310,35 @@ class Player:
 
     Attributes:
         name (str): Name of the player.
-        hand (list[Card]): List of cards currently held by the player.
+        hand (Hand): Cards currently held by the player.
         is_cpu (bool): Whether the player is controlled by CPU.
+        strategy (Strategy or None): How a CPU player moves; None for
+            humans.
+        advisor (RolloutAdvisor or None): Shows a human player win
+            estimates for their valid cards while they decide (advisor.py).
     """
 
-    def __init__(self, name, is_cpu=False):
+    def __init__(self, name, is_cpu=False, strategy=None):
         """
         Initializes a Player object with a name, an empty hand, and CPU flag.
 
         Args:
             name (str): The name of the player.
             is_cpu (bool, optional): True if CPU-controlled, False otherwise. Defaults to False.
+            strategy (Strategy, optional): How the CPU moves. Giving one
+                makes the player a CPU. Defaults to FIRST_VALID for CPU
+                players.
 
         Side effects:
             Creates an empty hand for the player.
         """
         self.name = name
-        self.hand = []
-        self.is_cpu = is_cpu
+        self.hand = Hand()
+        self.is_cpu = is_cpu or strategy is not None
+        if strategy is None and self.is_cpu:
+            strategy = FIRST_VALID
+        self.strategy = strategy
+        self.advisor = None
 
     def draw_card(self, deck, count=1):
         """
@@ -207,29 +1354,109 @@ class Player:
         for _ in range(count):
             self.hand.append(deck.card_pull())
 
-    def play_card(self, played_card, current_suit):
+    def choose_card(self, game):
+        """
+        Decides this player's move for the current turn.
+
+        CPU players ask their strategy and humans are asked through
+        play_card. Subclasses that need more than a strategy (e.g. search
+        with worker processes) override this.
+
+        Args:
+            game (Game): The game being played.
+
+        Returns:
+            Card or None: The card to play, or None to draw a card.
+
+        Side effects:
+            With an advisor, runs it in the background while a human
+            decides.
+        """
+        if self.strategy is not None:
+            return self.strategy.choose_card(self.hand, game)
+        if self.advisor is not None:
+            cards = self.hand.valid_cards(game.played_card, game.current_suit,
+                                          game.legal_masks)
+            if cards:
+                self.advisor.start(game, game.players.index(self), cards)
+                try:
+                    return self.play_card(game.played_card, game.current_suit,
+                                          game.legal_masks)
+                finally:
+                    self.advisor.stop()
+        return self.play_card(game.played_card, game.current_suit,
+                              game.legal_masks)
+
+    def choose_suit(self, game):
+        """
+        Picks the new suit after this player plays an 8.
+
+        Args:
+            game (Game): The game being played.
+
+        Returns:
+            str: The chosen suit.
+
+        Side effects:
+            For humans: prompts terminal input.
+            For CPU: asks the strategy, which may use the game's random
+            generator.
+        """
+        if self.strategy is not None:
+            return self.strategy.choose_suit(self.hand, game)
+        return game.choose_suit()
+
+    def choose_jump_in(self, game):
+        """
+        Decides whether to jump in with a copy of the card just played.
+
+        Only asked under jump-in rules, and only when the player holds a
+        copy. CPU players jump in whenever they can; human players are asked.
+
+        Args:
+            game (Game): The game being played.
+
+        Returns:
+            Card or None: The copy of the top card to play, or None to let
+            the chance pass.
+
+        Side effects:
+            For humans: prompts terminal input.
+        """
+        if self.is_cpu:
+            return game.played_card
+
+        print(f"\n{self.name}, you hold a copy of {game.played_card}.")
+        while True:
+            answer = input("Jump in with it? (y/n): ").strip().lower()
+            if answer in ("y", "yes"):
+                return game.played_card
+            if answer in ("n", "no"):
+                return None
+            print("Invalid choice. Try again.")
+
+    def play_card(self, played_card, current_suit, masks=LEGAL_MASKS):
         """
         Selects a card to play. Human players choose via input, CPU players pick automatically.
 
         Args:
             played_card (Card): The card currently on top of the pile.
             current_suit (str): The current suit to match.
+            masks (tuple[int], optional): Legal plays under the game's rules,
+                see Hand.legal_mask. Defaults to LEGAL_MASKS.
 
         Returns:
             Card or None: The chosen card to play, or None if drawing a card.
 
         Side effects:
             For humans: prompts terminal input.
-            For CPU: prints chosen card to terminal.
         """
-        valid_cards = [card for card in self.hand if card_validation([card], played_card, current_suit)]
+        valid_cards = self.hand.valid_cards(played_card, current_suit, masks)
         if not valid_cards:
             return None
 
         if self.is_cpu:
-            chosen_card = valid_cards[0]  # Simple AI: play first valid card
-            print(f"{self.name} plays: {chosen_card}")
-            return chosen_card
+            return valid_cards[0]  # Simple AI: play first valid card
 
         # Human player input
         print(f"\n{self.name}'s turn. Current card: {played_card} (Suit: {current_suit})")
@@ -241,6 +1468,8 @@ class Player:
             print(f"{i}: {card}")
 
         while True:
+            if self.advisor is not None:
+                self.advisor.show()
             try:
                 choice = int(input(f"Select a card to play (1-{len(valid_cards)}) or 0 to draw: "))
                 if choice == 0:
@@ -252,6 +1481,226 @@ class Player:
             print("Invalid choice. Try again.")
 
 
+class GameStats:
+    """
+    Opt-in timing and counters for one or more games.
+
+    attach wraps Game.play_turn, Game.apply_action_card and Deck.card_pull
+    of a single game with timed versions. Games created without profile=True
+    never get the wrappers, so instrumentation costs nothing when disabled.
+
+    Time is split into validation (the current player choosing a card), action
+    handling (apply_action_card, not counting the draws it causes) and drawing
+    (Deck.card_pull, including reshuffles).
+
+    Attributes:
+        games (int): Games recorded.
+        turns (int): Turns recorded.
+        turn_time (float): Total seconds spent in play_turn.
+        max_turn_time (float): Slowest turn in seconds.
+        latency_buckets (list[int]): Turn latency histogram. Bucket i counts
+            turns that took less than 2**i microseconds (and at least half that).
+        validation_time (float): Seconds spent choosing cards.
+        action_time (float): Seconds spent applying action cards.
+        draw_time (float): Seconds spent drawing cards.
+        reshuffles (int): Calls of reload_played_cards.
+        start_retries (int): Action cards put back by Deck.start_game.
+        cards_drawn (dict): Cards drawn per player name, including the deal.
+        peak_hand (int): Largest hand seen.
+    """
+    BUCKETS = 32
+
+    def __init__(self):
+        """
+        Creates empty statistics.
+        """
+        self.games = 0
+        self.turns = 0
+        self.turn_time = 0.0
+        self.max_turn_time = 0.0
+        self.latency_buckets = [0] * self.BUCKETS
+        self.validation_time = 0.0
+        self.action_time = 0.0
+        self.draw_time = 0.0
+        self.reshuffles = 0
+        self.start_retries = 0
+        self.cards_drawn = {}
+        self.peak_hand = 0
+
+    def attach(self, game):
+        """
+        Starts recording a freshly dealt game.
+
+        Args:
+            game (Game): The game to instrument.
+
+        Side effects:
+            Replaces play_turn, apply_move and apply_action_card on the game
+            and card_pull on its deck with timed wrappers. The wrappers call
+            the methods bound before, so jump-in rules keep working; the
+            time from the start of a turn to its move is the validation
+            time.
+        """
+        stats = self
+        deck = game.deck
+        players = game.players
+        clock = time.perf_counter
+        self.games += 1
+        self.start_retries += deck.start_retries
+        for player in players:
+            self.cards_drawn[player.name] = (self.cards_drawn.get(player.name, 0)
+                                             + len(player.hand))
+            self.peak_hand = max(self.peak_hand, len(player.hand))
+
+        card_pull = deck.card_pull
+        apply_action_card = game.apply_action_card
+        apply_move = game.apply_move
+        play_turn = game.play_turn
+        # Start of the turn in progress, until its move is chosen.
+        chosen = [None]
+
+        def timed_card_pull():
+            reshuffles = deck.reshuffles
+            start = clock()
+            card = card_pull()
+            stats.draw_time += clock() - start
+            stats.reshuffles += deck.reshuffles - reshuffles
+            return card
+
+        def timed_apply_action_card(card):
+            drawing = stats.draw_time
+            start = clock()
+            apply_action_card(card)
+            stats.action_time += clock() - start - (stats.draw_time - drawing)
+
+        def timed_apply_move(chosen_card, chosen_suit=None):
+            if chosen[0] is not None:
+                stats.validation_time += clock() - chosen[0]
+                chosen[0] = None
+            player = players[game.current_player_idx]
+            victim = players[game.next_player_index()]
+            size, victim_size = len(player.hand), len(victim.hand)
+            won = apply_move(chosen_card, chosen_suit)
+            for who, before in ((player, size), (victim, victim_size)):
+                if len(who.hand) > before:
+                    stats.cards_drawn[who.name] += len(who.hand) - before
+                    stats.peak_hand = max(stats.peak_hand, len(who.hand))
+            return won
+
+        def timed_play_turn():
+            start = clock()
+            chosen[0] = start
+            won = play_turn()
+            stats._record_turn(clock() - start)
+            return won
+
+        deck.card_pull = timed_card_pull
+        game.apply_action_card = timed_apply_action_card
+        game.apply_move = timed_apply_move
+        game.play_turn = timed_play_turn
+
+    def _record_turn(self, elapsed):
+        """
+        Adds one turn's latency.
+
+        Args:
+            elapsed (float): Seconds the turn took.
+        """
+        self.turns += 1
+        self.turn_time += elapsed
+        if elapsed > self.max_turn_time:
+            self.max_turn_time = elapsed
+        bucket = min(int(elapsed * 1e6).bit_length(), self.BUCKETS - 1)
+        self.latency_buckets[bucket] += 1
+
+    def latency_percentile(self, fraction):
+        """
+        Estimates a turn latency percentile from the histogram.
+
+        Args:
+            fraction (float): E.g. 0.99 for the 99th percentile.
+
+        Returns:
+            float: Upper bound of the bucket holding that percentile, in
+            seconds.
+        """
+        target = fraction * self.turns
+        seen = 0
+        for bucket, count in enumerate(self.latency_buckets):
+            seen += count
+            if count and seen >= target:
+                return (1 << bucket) / 1e6
+        return 0.0
+
+    def merge(self, other):
+        """
+        Adds another set of statistics (e.g. from a worker) to this one.
+
+        Args:
+            other (GameStats): Statistics to merge in.
+
+        Side effects:
+            Updates every counter.
+        """
+        self.games += other.games
+        self.turns += other.turns
+        self.turn_time += other.turn_time
+        self.max_turn_time = max(self.max_turn_time, other.max_turn_time)
+        self.latency_buckets = [a + b for a, b in zip(self.latency_buckets,
+                                                      other.latency_buckets)]
+        self.validation_time += other.validation_time
+        self.action_time += other.action_time
+        self.draw_time += other.draw_time
+        self.reshuffles += other.reshuffles
+        self.start_retries += other.start_retries
+        for name, count in other.cards_drawn.items():
+            self.cards_drawn[name] = self.cards_drawn.get(name, 0) + count
+        self.peak_hand = max(self.peak_hand, other.peak_hand)
+
+    def dump(self):
+        """
+        Formats the statistics for the terminal.
+
+        Returns:
+            str: Multi-line report.
+        """
+        turns = self.turns or 1
+        total = self.turn_time or 1.0
+        other = self.turn_time - (self.validation_time + self.action_time
+                                  + self.draw_time)
+        lines = [
+            f"Games: {self.games}  Turns: {self.turns}",
+            f"Turn latency: mean {self.turn_time / turns * 1e6:.1f}us, "
+            f"p50 <{self.latency_percentile(0.5) * 1e6:.0f}us, "
+            f"p99 <{self.latency_percentile(0.99) * 1e6:.0f}us, "
+            f"max {self.max_turn_time * 1e6:.1f}us",
+            f"  Validation: {self.validation_time / total:6.1%}",
+            f"  Actions:    {self.action_time / total:6.1%}",
+            f"  Drawing:    {self.draw_time / total:6.1%}",
+            f"  Other:      {other / total:6.1%}",
+            f"Reshuffles: {self.reshuffles}  "
+            f"Start card retries: {self.start_retries}",
+            f"Peak hand size: {self.peak_hand}",
+            "Cards drawn:",
+        ]
+        for name, count in self.cards_drawn.items():
+            lines.append(f"  {name}: {count}")
+        return "\n".join(lines)
+
+
+GameState = namedtuple("GameState", [
+    "cards", "played_cards", "hands", "current_player_idx", "direction",
+    "current_suit", "wild_rank", "turns", "winner", "reshuffles",
+    "pending_draws", "played_by"], defaults=(0, None))
+GameState.__doc__ = """Immutable snapshot of everything that changes during a game.
+
+Card piles and hands are stored as packed card ids (see pack_cards), so a
+snapshot costs one byte per card no matter how many objects the game holds.
+The top card is the last byte of played_cards. winner and played_by are
+player indexes or None.
+"""
+
+
 class Game:
     """
     Represents a Crazy Eights/Uno game session.
@@ -263,28 +1712,84 @@ class Game:
         direction (int): Direction of play (1 for clockwise, -1 for counterclockwise).
         played_card (Card): The most recently played card.
         current_suit (str): The current suit to match in play.
+        events (EventSink): Receives what happens during the game.
+        seed (int or None): Seed the game was created from, if known.
+        rng (random.Random): Source of every random choice in the game.
+        moves (list[tuple]): One (player index, card id or None, chosen suit
+            or None) entry per turn, enough to replay the game.
+        stats (GameStats or None): Timings and counters, when profiling.
+        turns (int): Number of turns played so far.
+        winner (Player or None): The player who emptied their hand, if any.
+        rules (RuleSet): The rules the game is played with.
+        tables (RuleTables): The rules compiled for this game's deck.
+        legal_masks (tuple[int]): Legal plays for the current turn, see
+            Hand.legal_mask; they change while DRAW 2 CARDS are stacked.
+        pending_draws (int): Cards stacked on the next player by DRAW 2
+            CARDS (stacking rules only).
+        played_by (int or None): Index of the player who played the top
+            card in the last turn, or None after a draw.
     """
 
-    def __init__(self, players):
+    def __init__(self, players, events=None, seed=None, rng=None,
+                 profile=False, decks=None, rules=None):
         """
         Initializes the Game with a deck, players, and deals starting hands.
 
         Args:
             players (list[Player]): List of Player objects participating.
+            events (EventSink, optional): Where game events go. Defaults to
+                a TerminalSink; headless simulations pass NULL_SINK.
+            seed (int, optional): Seed for the game's random generator. When
+                neither seed nor rng is given a fresh seed is picked, so every
+                game can be replayed.
+            rng (random.Random, optional): Generator to use instead of one
+                created from seed.
+            profile (bool, optional): Record timings and counters in stats.
+                Defaults to False.
+            decks (int, optional): Decks in the shoe. Defaults to
+                decks_needed(len(players)).
+            rules (RuleSet, optional): The rules to play by. Defaults to
+                STANDARD_RULES.
+
+        Raises:
+            ValueError: If the shoe cannot deal every player a hand (see
+                check_shoe).
 
         Side effects:
             Deals 7 cards to each player.
             Draws a starting card for the game.
         """
-        self.deck = Deck()
+        if decks is None:
+            decks = decks_needed(len(players))
+        check_shoe(len(players), decks)
+        if rng is None:
+            if seed is None:
+                seed = random.getrandbits(64)
+            rng = random.Random(seed)
+        self.seed = seed
+        self.rng = rng
+        self.moves = []
+        self.events = events if events is not None else TerminalSink()
+        self.deck = Deck(self.events, rng, decks)
+        self.rules = rules or STANDARD_RULES
+        self.pending_draws = 0
+        self.played_by = None
+        self._use_tables(self.deck.wild_rank)
         self.players = players
         self.current_player_idx = 0
         self.direction = 1
+        self.turns = 0
+        self.winner = None
         self.played_card = self.deck.start_game()
         self.current_suit = self.played_card.suit
 
         for player in self.players:
-            player.draw_card(self.deck, 7)
+            player.draw_card(self.deck, HAND_SIZE)
+
+        self.stats = None
+        if profile:
+            self.stats = GameStats()
+            self.stats.attach(self)
 
     def next_player_index(self):
         """
@@ -299,6 +1804,8 @@ class Game:
         """
         Applies the effect of action cards: SKIP, REVERSE, DRAW 2 CARDS.
 
+        The effect is looked up by card id in the compiled rules.
+
         Args:
             card (Card): The action card that was played.
 
@@ -306,19 +1813,64 @@ class Game:
             Modifies the game direction or forces the next player to draw cards.
             Updates current player index as needed.
         """
+        self.tables.actions[card.id](self, card)
+
+    def _skip(self, card):
+        """Skips the next player."""
+        next_idx = self.next_player_index()
+        if self.events.enabled:
+            self.events.emit("skip", player=self.players[self.current_player_idx].name,
+                             target=self.players[next_idx].name)
+        self.current_player_idx = (next_idx + self.direction) % len(self.players)
+
+    def _reverse(self, card):
+        """Reverses the direction of play."""
+        if self.events.enabled:
+            self.events.emit("reverse", player=self.players[self.current_player_idx].name)
+        self.direction *= -1
+        self.current_player_idx = self.next_player_index()
+
+    def _draw_two(self, card):
+        """Makes the next player draw 2 cards; their turn goes on."""
         next_idx = self.next_player_index()
+        if self.events.enabled:
+            self.events.emit("draw", player=self.players[next_idx].name, count=2,
+                             by=self.players[self.current_player_idx].name)
+        self.players[next_idx].draw_card(self.deck, 2)
+        self.current_player_idx = next_idx
+
+    def _stack_draw_two(self, card):
+        """Stacks 2 cards on the next player, who may pass them on."""
+        next_idx = self.next_player_index()
+        self.pending_draws += 2
+        self.legal_masks = self.tables.stack_masks
+        if self.events.enabled:
+            self.events.emit("stack", player=self.players[self.current_player_idx].name,
+                             target=self.players[next_idx].name,
+                             count=self.pending_draws)
+        self.current_player_idx = next_idx
+
+    def jump_in_player(self):
+        """
+        Finds a player who jumps in with a copy of the card just played.
 
-        if card.action == "SKIP":
-            print(f"{self.players[self.current_player_idx].name} played SKIP! {self.players[next_idx].name} is skipped!")
-            self.current_player_idx = (next_idx + self.direction) % len(self.players)
-        elif card.action == "REVERSE":
-            print(f"{self.players[self.current_player_idx].name} played REVERSE! Changing direction.")
-            self.direction *= -1
-            self.current_player_idx = self.next_player_index()
-        elif card.action == "DRAW 2 CARDS":
-            print(f"{self.players[self.current_player_idx].name} played DRAW 2 CARDS! {self.players[next_idx].name} draws 2 cards.")
-            self.players[next_idx].draw_card(self.deck, 2)
-            self.current_player_idx = next_idx
+        Every player but the one who played it and the one whose turn it is
+        is asked in turn order (Player.choose_jump_in).
+
+        Returns:
+            tuple or None: (player index, card) of the first player who
+            jumps in, or None.
+        """
+        top = self.played_card.id
+        n = len(self.players)
+        for step in range(1, n):
+            idx = (self.current_player_idx + step * self.direction) % n
+            player = self.players[idx]
+            if idx != self.played_by and player.hand.counts[top]:
+                card = player.choose_jump_in(self)
+                if card is not None:
+                    return idx, card
+        return None
 
     def choose_suit(self):
         """
@@ -354,34 +1906,115 @@ class Game:
             Modifies player hands, current card, current suit, and current player index.
         """
         player = self.players[self.current_player_idx]
-        chosen_card = player.play_card(self.played_card, self.current_suit)
+        return self.apply_move(player.choose_card(self))
+
+    def _play_turn_with_jump_ins(self):
+        """
+        play_turn under jump-in rules.
+
+        A player holding a copy of the card just played may play it first;
+        the turn is then theirs. Installed on the game by _use_tables, so
+        the standard rules do not pay for the check.
+
+        Returns:
+            bool: True if the game is won during this turn, False otherwise.
+        """
+        if self.played_by is not None:
+            jump = self.jump_in_player()
+            if jump is not None:
+                self.current_player_idx, card = jump
+                if self.events.enabled:
+                    self.events.emit("jump_in", player=self.players[jump[0]].name,
+                                     card=card)
+                return self.apply_move(card)
+        return Game.play_turn(self)
+
+    def _use_tables(self, wild_rank):
+        """
+        Compiles the game's rules for a wild rank and starts using them.
+
+        Args:
+            wild_rank (str): The deck's wild rank.
+
+        Side effects:
+            Sets tables and legal_masks, and replaces play_turn on the game
+            under jump-in rules (unless it is already replaced, e.g. by
+            GameStats).
+        """
+        self.tables = self.rules.tables(wild_rank)
+        self.legal_masks = (self.tables.stack_masks if self.pending_draws
+                            else self.tables.legal_masks)
+        if self.tables.jump_in and "play_turn" not in self.__dict__:
+            self.play_turn = self._play_turn_with_jump_ins
+
+    def apply_move(self, chosen_card, chosen_suit=None):
+        """
+        Plays a given move for the current player.
+
+        Args:
+            chosen_card (Card or None): A valid card from the current player's
+                hand, or None to draw a card (all the stacked cards, when
+                DRAW 2 CARDS are stacked).
+            chosen_suit (str, optional): The new suit when chosen_card is an 8.
+                Defaults to asking the player through Player.choose_suit.
+
+        Returns:
+            bool: True if the game is won during this turn, False otherwise.
+
+        Side effects:
+            Modifies player hands, current card, current suit, and current player index.
+        """
+        player_idx = self.current_player_idx
+        player = self.players[player_idx]
+        self.turns += 1
+        events = self.events
 
         if chosen_card:
+            if events.enabled:
+                events.emit("card_played", player=player.name, card=chosen_card)
             player.hand.remove(chosen_card)
-            self.deck.played_cards.append(chosen_card)
+            self.deck.discard(chosen_card)
             self.played_card = chosen_card
 
-            if chosen_card.ranktype == "8":
-                # For CPU, pick a random suit
-                if player.is_cpu:
-                    self.current_suit = random.choice(Deck.SUITS)
-                    print(f"{player.name} changes suit to {self.current_suit}")
-                else:
-                    self.current_suit = self.choose_suit()
+            if self.tables.wild[chosen_card.id]:
+                if chosen_suit is None:
+                    chosen_suit = player.choose_suit(self)
+                self.current_suit = chosen_suit
+                if events.enabled:
+                    events.emit("suit_changed", player=player.name,
+                                suit=self.current_suit)
             else:
+                chosen_suit = None
                 self.current_suit = chosen_card.suit
 
             if chosen_card.action:
                 self.apply_action_card(chosen_card)
             else:
                 self.current_player_idx = self.next_player_index()
+            self.played_by = player_idx
         else:
-            print(f"{player.name} has no valid cards. Drawing a card...")
-            player.draw_card(self.deck)
+            chosen_suit = None
+            count = self.pending_draws
+            if count:
+                self.pending_draws = 0
+                self.legal_masks = self.tables.legal_masks
+                if events.enabled:
+                    events.emit("draw", player=player.name, count=count,
+                                by=self.players[self.played_by].name)
+                player.draw_card(self.deck, count)
+            else:
+                if events.enabled:
+                    events.emit("draw", player=player.name, count=1)
+                player.draw_card(self.deck)
+            self.played_by = None
             self.current_player_idx = self.next_player_index()
+        self.moves.append((player_idx, chosen_card.id if chosen_card else None,
+                           chosen_suit))
 
         if len(player.hand) == 0:
-            print(f"\n{player.name} has won the game! Congratulations!")
+            self.winner = player
+            if events.enabled:
+                events.emit("win", player=player.name)
             return True
         return False
 
@@ -392,21 +2025,319 @@ class Game:
         Side effects:
             Runs the terminal interaction loop for gameplay.
         """
-        print(f"Starting card: {self.played_card}")
+        if self.events.enabled:
+            self.events.emit("start", card=self.played_card)
         while True:
             if self.play_turn():
                 break
 
+    def snapshot(self):
+        """
+        Captures the current state of the game.
+
+        Returns:
+            GameState: Deck order, played pile, hands, direction, current
+            player, current suit, wild rank, counters and stacked draws.
+        """
+        deck = self.deck
+        winner = None if self.winner is None else self.players.index(self.winner)
+        return GameState(deck.piles.draw_ids(), deck.piles.played_ids(),
+                         tuple(pack_cards(p.hand) for p in self.players),
+                         self.current_player_idx, self.direction,
+                         self.current_suit, deck.wild_rank, self.turns, winner,
+                         deck.reshuffles, self.pending_draws, self.played_by)
+
+    def restore(self, state):
+        """
+        Puts the game back into a captured state.
+
+        The players must be the same seats the snapshot was taken with. The
+        random generator and the move history are left alone.
+
+        Args:
+            state (GameState): A snapshot of this game or one of its clones.
+
+        Side effects:
+            Replaces the deck, played pile, hands and turn state.
+        """
+        deck = self.deck
+        total = (len(state.cards) + len(state.played_cards)
+                 + sum(len(hand) for hand in state.hands))
+        deck.piles.load(state.cards, state.played_cards, total)
+        deck.decks = total // len(DECK_TEMPLATE)
+        deck.wild_rank = state.wild_rank
+        deck.reshuffles = state.reshuffles
+        for player, hand in zip(self.players, state.hands):
+            player.hand = Hand.from_ids(hand)
+        self.current_player_idx = state.current_player_idx
+        self.direction = state.direction
+        self.current_suit = state.current_suit
+        self.played_card = CARDS[state.played_cards[-1]]
+        self.turns = state.turns
+        self.winner = None if state.winner is None else self.players[state.winner]
+        self.pending_draws = state.pending_draws
+        self.played_by = state.played_by
+        self._use_tables(state.wild_rank)
+
+    @classmethod
+    def from_state(cls, state, players, events=NULL_SINK, seed=None, rng=None,
+                   rules=None):
+        """
+        Builds a game directly from a snapshot, without shuffling or dealing.
+
+        Args:
+            state (GameState): The state to start from.
+            players (list[Player]): One player per hand in the state. Their
+                hands are replaced.
+            events (EventSink, optional): Where game events go. Defaults to
+                NULL_SINK.
+            seed (int, optional): Seed for the game's random generator.
+            rng (random.Random, optional): Generator to use instead of one
+                created from seed.
+            rules (RuleSet, optional): The rules to play by. Defaults to
+                STANDARD_RULES.
+
+        Returns:
+            Game: A game in the given state.
+        """
+        game = cls.__new__(cls)
+        deck = Deck.__new__(Deck)
+        deck.piles = CardPiles(len(DECK_TEMPLATE))
+        deck.events = events
+        deck.rng = rng if rng is not None else random.Random(seed)
+        game.deck = deck
+        game.players = players
+        game.rng = deck.rng
+        game.seed = seed
+        game.events = events
+        game.moves = []
+        game.stats = None
+        game.rules = rules or STANDARD_RULES
+        game.restore(state)
+        return game
+
+    def clone(self, seed=None, events=NULL_SINK, rng=None):
+        """
+        Makes an independent copy of the game for look-ahead.
+
+        Only the card lists and hands are copied, so the cost grows with the
+        number of cards, not with the objects the game has accumulated. The
+        clone gets its own random generator, so playing it never changes what
+        happens in this game, and it starts with an empty move history.
+
+        Args:
+            seed (int, optional): Seed for the clone's random generator.
+                Defaults to None (unseeded).
+            events (EventSink, optional): Where the clone's events go.
+                Defaults to NULL_SINK.
+            rng (random.Random, optional): Generator to use instead of one
+                created from seed. Searches that clone thousands of times
+                can share one generator and skip the cost of seeding.
+
+        Returns:
+            Game: A game in the same state with copies of the players.
+        """
+        game = Game.__new__(Game)
+        deck = Deck.__new__(Deck)
+        source = self.deck
+        deck.piles = source.piles.copy()
+        deck.decks = source.decks
+        deck.wild_rank = source.wild_rank
+        deck.reshuffles = source.reshuffles
+        deck.events = events
+        deck.rng = rng if rng is not None else random.Random(seed)
+
+        game.players = []
+        for player in self.players:
+            twin = copy.copy(player)
+            twin.hand = player.hand.copy()
+            game.players.append(twin)
+        game.deck = deck
+        game.rng = deck.rng
+        game.seed = seed
+        game.events = events
+        game.moves = []
+        game.stats = None
+        game.current_player_idx = self.current_player_idx
+        game.direction = self.direction
+        game.played_card = self.played_card
+        game.current_suit = self.current_suit
+        game.turns = self.turns
+        game.winner = (None if self.winner is None
+                       else game.players[self.players.index(self.winner)])
+        game.rules = self.rules
+        game.pending_draws = self.pending_draws
+        game.played_by = self.played_by
+        game._use_tables(deck.wild_rank)
+        return game
+
+    def recording(self):
+        """
+        Describes the game so far in a form that replay_game accepts.
+
+        Returns:
+            dict: "seed", "players" as [name, is_cpu, strategy name]
+            entries, "decks", "rules" (the rule set's name) and "moves".
+            Only plain lists, ints and strings, so it can be saved as JSON.
+
+        Raises:
+            ValueError: If the game was created from an rng instead of a seed.
+        """
+        if self.seed is None:
+            raise ValueError("Only games created from a seed can be recorded")
+        return {"seed": self.seed,
+                "players": [[p.name, p.is_cpu,
+                             p.strategy.name if p.strategy else None]
+                            for p in self.players],
+                "decks": self.deck.decks,
+                "rules": self.rules.name,
+                "moves": [list(move) for move in self.moves]}
+
+
+class ReplayPlayer(Player):
+    """
+    Plays back the recorded decisions of a human player.
+
+    CPU seats are replayed by CPU players with the recorded strategy: their
+    decisions follow from the seed. Human decisions never use the game's
+    random generator, so feeding them back reproduces the game exactly.
+    """
+
+    def __init__(self, name, moves):
+        """
+        Creates a player that repeats recorded moves.
+
+        Args:
+            name (str): The name of the player.
+            moves (list): This seat's (turn, card id or None, suit or None)
+                moves, in turn order; turn is the move's index in the game's
+                moves.
+        """
+        super().__init__(name)
+        self._moves = moves
+        self._next = 0
+        self._suit = None
+
+    def play_card(self, played_card, current_suit, masks=LEGAL_MASKS):
+        """
+        Returns the next recorded card.
+
+        Args:
+            played_card (Card): The card currently on top of the pile.
+            current_suit (str): The current suit to match.
+            masks (tuple[int], optional): Unused; the recording decides.
+
+        Returns:
+            Card or None: The recorded card, or None for a recorded draw.
+
+        Raises:
+            ValueError: If there is no recorded move left or the recorded
+                card is not in the hand, meaning the replay no longer
+                matches the recording.
+        """
+        if self._next == len(self._moves):
+            raise ValueError(f"Replay diverged: {self.name} has no recorded "
+                             "move left")
+        _, cid, self._suit = self._moves[self._next]
+        self._next += 1
+        if cid is None:
+            return None
+        card = CARDS[cid]
+        if card not in self.hand:
+            raise ValueError(f"Replay diverged: {self.name} does not hold {card}")
+        return card
+
+    def choose_jump_in(self, game):
+        """
+        Jumps in only if the recording has this seat move next.
+
+        Declined jump-ins leave no move in the recording, so the seat jumps
+        in exactly when the game's next recorded move is one of its own.
+
+        Args:
+            game (Game): The game being played.
+
+        Returns:
+            Card or None: The recorded card, or None to let the chance pass.
+        """
+        if (self._next == len(self._moves)
+                or self._moves[self._next][0] != len(game.moves)):
+            return None
+        return self.play_card(game.played_card, game.current_suit)
+
+    def choose_suit(self, game):
+        """
+        Returns the recorded suit.
+
+        Args:
+            game (Game): The game being played.
+
+        Returns:
+            str: The suit chosen in the recording.
+        """
+        return self._suit
 
-def select_game_mode():
+
+def replay_game(recording, events=NULL_SINK):
+    """
+    Replays a recorded game turn by turn.
+
+    Every replayed turn is compared with the recording, so a change in the
+    rules or the CPU policy shows up as a ValueError at the first turn that
+    differs.
+
+    Args:
+        recording (dict): Output of Game.recording.
+        events (EventSink, optional): Where the replayed events go. Defaults
+            to NULL_SINK for full-speed replays.
+
+    Yields:
+        Game: The game after each turn.
+
+    Raises:
+        ValueError: If the replay diverges from the recording.
+    """
+    moves = [tuple(move) for move in recording["moves"]]
+    players = []
+    for idx, (name, is_cpu, *strategy) in enumerate(recording["players"]):
+        if is_cpu:
+            strategy = strategy[0] if strategy else None
+            if strategy in (None, FIRST_VALID.name):
+                players.append(Player(name, is_cpu=True))
+            else:
+                # Imported here because strategies imports this module.
+                from strategies import make_strategy
+                players.append(Player(name, strategy=make_strategy(strategy)))
+        else:
+            players.append(ReplayPlayer(
+                name, [(turn,) + move[1:] for turn, move in enumerate(moves)
+                       if move[0] == idx]))
+
+    game = Game(players, events, seed=recording["seed"],
+                decks=recording.get("decks"),
+                rules=RULESETS[recording.get("rules", STANDARD_RULES.name)])
+    if events.enabled:
+        events.emit("start", card=game.played_card)
+    for move in moves:
+        game.play_turn()
+        if game.moves[-1] != move:
+            raise ValueError(f"Replay diverged at turn {game.turns}: "
+                             f"recorded {move}, replayed {game.moves[-1]}")
+        yield game
+
+
+def select_game_mode(n_players=2):
     """
     Prompts the user to choose a game mode.
 
+    Args:
+        n_players (int, optional): Seats at the table. Defaults to 2.
+
     Returns:
         str: Either "hotseat" or "cpu" indicating the selected mode.
     """
     print("Select Game Mode:")
-    print("1: Hot-seat two-player")
+    print(f"1: Hot-seat {n_players}-player")
     print("2: Player vs CPU")
     while True:
         choice = input("Enter 1 or 2: ")
@@ -417,22 +2348,170 @@ def select_game_mode():
         print("Invalid choice. Try again.")
 
 
-def main():
+def parse_args(arglist):
+    """
+    Parse command-line arguments.
+
+    With no subcommand (or "play") the interactive game starts as before. The
+    "simulate" subcommand plays CPU-vs-CPU games headlessly across a process
+    pool and prints aggregated results, and "replay" prints a past game turn
+    by turn. "--rules" picks a rule variant from RULESETS.
+
+    Args:
+        arglist (list of str): list of command-line arguments.
+
+    Returns:
+        namespace: a namespace with a "command" attribute plus the options of
+        the selected subcommand.
+    """
+    parser = ArgumentParser(description="Crazy Eights/Uno card game")
+    parser.set_defaults(command="play", cpu="basic", budget=1.0, workers=1,
+                        players=2, decks=None, rules=STANDARD_RULES.name,
+                        advisor=False)
+    subparsers = parser.add_subparsers(dest="command")
+    play = subparsers.add_parser("play",
+                                 help="play an interactive game (default)")
+    play.add_argument("--cpu", choices=["basic", "monte-carlo"],
+                      default="basic", help="strategy of the CPU opponent")
+    play.add_argument("-b", "--budget", type=float, default=1.0,
+                      help="seconds the monte-carlo CPU thinks per move")
+    play.add_argument("-w", "--workers", type=int, default=1,
+                      help="processes for monte-carlo rollouts")
+    play.add_argument("-p", "--players", type=int, default=2,
+                      help="seats at the table; against the CPU all but "
+                           "the first are CPU players")
+    play.add_argument("--decks", type=int, default=None,
+                      help="decks in the shoe (default: one per 4 players)")
+    play.add_argument("--rules", choices=list(RULESETS),
+                      default=STANDARD_RULES.name, help="rule variant")
+    play.add_argument("--advisor", action="store_true",
+                      help="show a win estimate for every valid card while "
+                           "you decide")
+
+    simulate = subparsers.add_parser(
+        "simulate", help="play all-CPU games without terminal I/O")
+    simulate.add_argument("-n", "--games", type=int, default=1000,
+                          help="number of games to play")
+    simulate.add_argument("-p", "--players", type=int, default=2,
+                          help="CPU players per game")
+    simulate.add_argument("-w", "--workers", type=int, default=None,
+                          help="worker processes (default: all cores)")
+    simulate.add_argument("-s", "--seed", type=int, default=None,
+                          help="base seed for reproducible runs")
+    simulate.add_argument("--profile", action="store_true",
+                          help="time every turn and print a stats dump")
+    simulate.add_argument("--decks", type=int, default=None,
+                          help="decks in the shoe (default: one per 4 "
+                               "players)")
+    simulate.add_argument("--journal", default=None, metavar="FILE",
+                          help="append every turn to a binary journal")
+    simulate.add_argument("--rules", choices=list(RULESETS),
+                          default=STANDARD_RULES.name, help="rule variant")
+
+    replay = subparsers.add_parser(
+        "replay", help="replay a recorded game or an all-CPU game by seed")
+    replay.add_argument("seed", type=int, nargs="?", default=None,
+                        help="seed of an all-CPU game")
+    replay.add_argument("-g", "--game", type=int, default=None,
+                        help="treat seed as a simulation's base seed and "
+                             "replay this game of the run")
+    replay.add_argument("-p", "--players", type=int, default=2,
+                        help="CPU players in the game")
+    replay.add_argument("--decks", type=int, default=None,
+                        help="decks in the shoe (default: one per 4 players)")
+    replay.add_argument("--rules", choices=list(RULESETS),
+                        default=STANDARD_RULES.name,
+                        help="rule variant of the game")
+    replay.add_argument("-f", "--file", default=None,
+                        help="JSON file written from Game.recording")
+    args = parser.parse_args(arglist)
+    if args.cpu == "monte-carlo" and args.rules != STANDARD_RULES.name:
+        parser.error("the monte-carlo CPU only knows the standard rules")
+    if args.advisor and args.rules != STANDARD_RULES.name:
+        parser.error("the advisor only knows the standard rules")
+    if (args.command == "replay" and args.game is not None
+            and args.seed is None):
+        parser.error("--game needs a seed")
+    if args.decks is not None:
+        try:
+            check_shoe(args.players, args.decks)
+        except ValueError as error:
+            parser.error(f"--decks: {error}")
+    return args
+
+
+def main(arglist=None):
     """
     Main function to initialize and start the game based on user-selected mode.
 
+    Args:
+        arglist (list of str, optional): Command-line arguments. Defaults to
+            an empty list, which starts the interactive game.
+
     Side effects:
-        Starts a terminal-based Crazy Eights/Uno game.
+        Starts a terminal-based Crazy Eights/Uno game, runs a headless
+        simulation and prints its summary, or prints a replayed game.
     """
-    mode = select_game_mode()
+    args = parse_args(arglist or [])
+    if args.command == "simulate":
+        # Imported here because simulation imports this module.
+        from simulation import simulate_games
+        results = simulate_games(args.games, n_players=args.players,
+                                 workers=args.workers, seed=args.seed,
+                                 profile=args.profile,
+                                 journal=args.journal, decks=args.decks,
+                                 rules=RULESETS[args.rules])
+        print(results.summary())
+        if results.stats:
+            print(results.stats.dump())
+        return
+    if args.command == "replay":
+        if args.file:
+            with open(args.file, encoding="utf-8") as f:
+                recording = json.load(f)
+            for _ in replay_game(recording, TerminalSink()):
+                pass
+            return
+        seed = args.seed
+        if args.game is not None:
+            seed = derive_seed(seed, args.game)
+        players = [Player(f"CPU {i + 1}", is_cpu=True)
+                   for i in range(args.players)]
+        Game(players, seed=seed, decks=args.decks,
+             rules=RULESETS[args.rules]).start()
+        return
+
+    mode = select_game_mode(args.players)
+    n_cpus = args.players - 1
+    names = ["CPU"] if n_cpus == 1 else [f"CPU {i + 1}" for i in range(n_cpus)]
     if mode == "hotseat":
-        players = [Player("Player 1"), Player("Player 2")]
+        players = [Player(f"Player {i + 1}") for i in range(args.players)]
+    elif args.cpu == "monte-carlo":
+        from monte_carlo import MonteCarloPlayer
+        players = [Player("Player 1")] + [
+            MonteCarloPlayer(name, args.budget, args.workers) for name in names]
     else:  # Player vs CPU
-        players = [Player("Player 1"), Player("CPU", is_cpu=True)]
-
-    game = Game(players)
-    game.start()
+        players = [Player("Player 1")] + [Player(name, is_cpu=True)
+                                          for name in names]
+
+    advisor = None
+    if args.advisor:
+        from advisor import RolloutAdvisor
+        advisor = RolloutAdvisor()
+        for player in players:
+            if not player.is_cpu:
+                player.advisor = advisor
+
+    game = Game(players, decks=args.decks, rules=RULESETS[args.rules])
+    try:
+        game.start()
+    finally:
+        if advisor is not None:
+            advisor.stop()
+        for player in players:
+            if hasattr(player, "close"):
+                player.close()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main(sys.argv[1:])
@@ -0,0 +1,544 @@
+"""Differential fuzzing of the vectorized engine against the reference Game.
+
+Every game is dealt by the reference classes from derive_seed(seed, i) and
+copied into a VectorGames batch with VectorGames.from_states. Both engines
+then play the game in lockstep: after every turn the draw pile, played pile,
+hands in hand order, top card, suit, direction, player to move and outcome
+are compared. The random choices the rules leave open (the suit picked after
+an 8 and the order of a reshuffle) are taken from the reference game, so the
+engines only differ where their rules do.
+
+Any divergence is shrunk: the failure with the fewest players and the
+earliest turn is kept, and the reference game is replayed to the turn before
+it, so the report gives the state one turn away from the difference.
+
+    python3 conformance.py -n 20000 --seed 1
+    python3 conformance.py -n 5000 -p 4 -w 2
+"""
+
+import os
+import random
+import sys
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from collaborative_assignment_card_game_inst326 import (
+    CARDS, NULL_SINK, SUIT_INDEX, Deck, DeckExhausted, Game, Player,
+    derive_seed)
+from simulation import MAX_TURNS, split_games
+from vector_engine import N_CARDS, VectorGames
+
+BATCH_SIZE = 500
+# Fields compared after every turn, in the order they are reported.
+FIELDS = ("done", "winner", "current", "direction", "suit", "top", "draw",
+          "played", "hands")
+
+
+class ScriptedVectorGames(VectorGames):
+    """A VectorGames batch that copies the reference games' random choices.
+
+    Attributes:
+        suits (ndarray): Suit index the reference game picked in its last
+            turn, per game.
+        reloads (list[list[bytes]]): Draw piles the reference game got from
+            reshuffles in its last turn, bottom first, per game.
+    """
+
+    def _reload_order(self, games, count):
+        """Orders the reshuffled cards like the reference game did.
+
+        A card the reference pile holds but this pile does not is left in
+        random order, so the difference shows up in the comparison.
+        """
+        order = super()._reload_order(games, count)
+        for row, g in enumerate(games):
+            if not self.reloads[g]:
+                continue
+            pile = self.reloads[g].pop(0)
+            position = np.full(N_CARDS, -1)
+            position[self.played[g, :count[row]]] = np.arange(count[row])
+            wanted = position[list(pile)]
+            if len(pile) == count[row] and (wanted >= 0).all():
+                order[row, :count[row]] = wanted
+        return order
+
+    def _pick_suits(self, games):
+        """Picks the suits the reference games picked."""
+        return self.suits[games]
+
+
+def record_reloads(game):
+    """Makes a game log the draw pile every reshuffle produces.
+
+    Args:
+        game (Game): The reference game.
+
+    Returns:
+        list[bytes]: The log; the caller empties it between turns.
+
+    Side effects:
+        Replaces reload_played_cards on the game's deck.
+    """
+    log = []
+    deck = game.deck
+    reload_played_cards = deck.reload_played_cards
+
+    def logged_reload_played_cards():
+        reload_played_cards()
+        log.append(deck.piles.draw_ids())
+
+    deck.reload_played_cards = logged_reload_played_cards
+    return log
+
+
+def baseline_choice(cards, played_card, current_suit):
+    """Picks the first valid card by scanning the hand with the plain rules.
+
+    Independent of Hand and LEGAL_MASKS, so it checks the card the reference
+    game chose: a card is valid if it is an action card, an 8, follows the
+    current suit, or has the same rank as the played card.
+
+    Args:
+        cards (list[Card]): The hand, in hand order.
+        played_card (Card): The card on top of the played pile.
+        current_suit (str): The suit to follow.
+
+    Returns:
+        Card or None: The first valid card, or None to draw.
+    """
+    for card in cards:
+        if (card.action is not None or card.ranktype == "8"
+                or card.suit == current_suit
+                or card.ranktype == played_card.ranktype):
+            return card
+    return None
+
+
+def reference_view(game, stalled):
+    """Lists the compared fields of a reference game.
+
+    Args:
+        game (Game): The game.
+        stalled (bool): Whether the game ran out of cards.
+
+    Returns:
+        tuple: The values of FIELDS.
+    """
+    winner = -1 if game.winner is None else game.players.index(game.winner)
+    piles = game.deck.piles
+    return (stalled or winner >= 0, winner, game.current_player_idx,
+            game.direction, SUIT_INDEX[game.current_suit],
+            game.played_card.id, piles.draw_ids(), piles.played_ids(),
+            tuple(bytes(card.id for card in player.hand.cards)
+                  for player in game.players))
+
+
+def engine_views(batch, games):
+    """Lists the compared fields of games of a vectorized batch.
+
+    Args:
+        batch (VectorGames): The batch.
+        games (list[int]): Games to look at.
+
+    Returns:
+        list[tuple]: The values of FIELDS for each of the games.
+    """
+    draw = batch.draw.astype(np.uint8)
+    played = batch.played.astype(np.uint8)
+    order = batch.hands.argsort(axis=2, kind="stable").astype(np.uint8)
+    views = []
+    for g in games:
+        sizes = batch.hand_size[g]
+        views.append((
+            bool(batch.done[g]), int(batch.winner[g]), int(batch.current[g]),
+            int(batch.direction[g]), int(batch.suit[g]), int(batch.top[g]),
+            draw[g, :batch.n_draw[g]].tobytes(),
+            played[g, :batch.n_played[g]].tobytes(),
+            tuple(order[g, p, :sizes[p]].tobytes()
+                  for p in range(batch.n_players))))
+    return views
+
+
+def describe_value(field, value):
+    """Formats a compared value for a report.
+
+    Args:
+        field (str): One of FIELDS.
+        value: Its value.
+
+    Returns:
+        str: Card names for cards, suit names for suits, else the value.
+    """
+    if field == "top":
+        return str(CARDS[value])
+    if field == "suit":
+        return Deck.SUITS[value]
+    if field in ("draw", "played"):
+        return f"{len(value)} cards {list(value)}"
+    if field == "hands":
+        return str([list(hand) for hand in value])
+    return str(value)
+
+
+class Divergence:
+    """A turn after which the two engines disagree.
+
+    Attributes:
+        seed (int): Seed the reference game was dealt from.
+        n_players (int): Players in the game.
+        turn (int): The turn after which the states differ (1 is the first
+            turn).
+        field (str): The first of FIELDS that differs.
+        expected: Its value in the reference game.
+        actual: Its value in the vectorized engine.
+        state (GameState or None): The reference state before the turn, once
+            shrunk.
+        one_turn (bool): Whether playing that one turn from state is enough
+            to reproduce the difference.
+    """
+
+    def __init__(self, seed, n_players, turn, field, expected, actual):
+        """Records a difference.
+
+        Args:
+            seed (int): Seed of the game.
+            n_players (int): Players in the game.
+            turn (int): Turn after which the states differ.
+            field (str): First differing field.
+            expected: Reference value.
+            actual: Vectorized value.
+        """
+        self.seed = seed
+        self.n_players = n_players
+        self.turn = turn
+        self.field = field
+        self.expected = expected
+        self.actual = actual
+        self.state = None
+        self.one_turn = False
+
+    def __repr__(self):
+        """Short description of the divergence."""
+        return (f"Divergence(seed={self.seed}, n_players={self.n_players}, "
+                f"turn={self.turn}, field={self.field!r})")
+
+    def describe(self):
+        """Formats the divergence for the terminal.
+
+        Returns:
+            str: Multi-line report.
+        """
+        lines = [f"{self.n_players}-player game with seed {self.seed} "
+                 f"diverges after turn {self.turn} in {self.field}:",
+                 f"  reference:  {describe_value(self.field, self.expected)}",
+                 f"  vectorized: {describe_value(self.field, self.actual)}"]
+        if self.state is not None:
+            how = ("one turn from it reproduces the difference" if
+                   self.one_turn else "it only reproduces from the seed")
+            lines.append(f"  state before the turn ({how}):")
+            lines.append(f"    {self.state}")
+        return "\n".join(lines)
+
+
+def compare_games(games, max_turns=MAX_TURNS, seed=None):
+    """Plays reference games and their vectorized copies in lockstep.
+
+    Each reference game is played until it ends, stalls or reaches
+    max_turns, or until the engines first disagree about it.
+
+    Args:
+        games (list[Game]): Reference games of all-CPU players with the
+            first-valid policy, the standard rules and one deck. They are
+            played on.
+        max_turns (int, optional): Turn limit per game. Defaults to
+            MAX_TURNS.
+        seed (int, optional): Seed for the vectorized batch. Defaults to
+            None.
+
+    Returns:
+        tuple[int, list]: Turns compared, and (game index, turn, field,
+        expected, actual) for every game that diverged.
+
+    Raises:
+        ValueError: If a game does not fit the vectorized engine.
+    """
+    batch = ScriptedVectorGames.from_states([game.snapshot()
+                                             for game in games], seed)
+    batch.suits = np.zeros(len(games), dtype=np.int64)
+    batch.reloads = [[] for _ in games]
+    logs = [record_reloads(game) for game in games]
+    stalled = [False] * len(games)
+    active = [g for g in range(len(games)) if games[g].winner is None]
+    differences = []
+    turns = 0
+    while active:
+        for g in active:
+            game = games[g]
+            player = game.players[game.current_player_idx]
+            expected = baseline_choice(list(player.hand.cards),
+                                       game.played_card, game.current_suit)
+            try:
+                game.play_turn()
+            except DeckExhausted:
+                # Both the deck and the played pile ran out; nobody can win.
+                stalled[g] = True
+            else:
+                played = game.moves[-1][1]
+                if played != (expected.id if expected else None):
+                    differences.append((g, game.turns, "card_validation",
+                                        expected, CARDS[played]
+                                        if played is not None else None))
+            batch.suits[g] = SUIT_INDEX[game.current_suit]
+            batch.reloads[g] = logs[g][:]
+            del logs[g][:]
+        diverged = {difference[0] for difference in differences}
+        batch.step()
+        turns += len(active)
+        still_active = []
+        for g, actual in zip(active, engine_views(batch, active)):
+            game = games[g]
+            if g not in diverged:
+                expected = reference_view(game, stalled[g])
+                if expected != actual:
+                    field = next(name for name, a, b in
+                                 zip(FIELDS, expected, actual) if a != b)
+                    differences.append((g, game.turns, field,
+                                        expected[FIELDS.index(field)],
+                                        actual[FIELDS.index(field)]))
+                    diverged.add(g)
+                elif not actual[0] and game.turns < max_turns:
+                    still_active.append(g)
+                    continue
+            batch.done[g] = True
+        active = still_active
+    return turns, differences
+
+
+def new_game(seed, n_players):
+    """Deals a reference game of first-valid CPU players.
+
+    Args:
+        seed (int): Seed of the game.
+        n_players (int): Number of players.
+
+    Returns:
+        Game: The game, before its first turn.
+    """
+    players = [Player(f"CPU {i + 1}", is_cpu=True) for i in range(n_players)]
+    return Game(players, NULL_SINK, seed=seed)
+
+
+def check_seeds(seeds, n_players=2, max_turns=MAX_TURNS):
+    """Compares the engines on the games dealt from a list of seeds.
+
+    Args:
+        seeds (list[int]): One seed per game.
+        n_players (int, optional): Players per game. Defaults to 2.
+        max_turns (int, optional): Turn limit per game. Defaults to
+            MAX_TURNS.
+
+    Returns:
+        tuple[int, list[Divergence]]: Turns compared and the divergences.
+    """
+    games = [new_game(seed, n_players) for seed in seeds]
+    turns, differences = compare_games(games, max_turns, seeds[0] if seeds
+                                       else None)
+    return turns, [Divergence(seeds[g], n_players, turn, field, expected,
+                              actual)
+                   for g, turn, field, expected, actual in differences]
+
+
+def shrink(divergences, max_turns=MAX_TURNS):
+    """Reduces divergences to the smallest one that reproduces.
+
+    The divergence with the fewest players and then the earliest turn is
+    kept. Its game is replayed to the turn before the difference, and that
+    state is checked on its own for one turn.
+
+    Args:
+        divergences (list[Divergence]): Divergences found by check_seeds.
+        max_turns (int, optional): Turn limit per game. Defaults to
+            MAX_TURNS.
+
+    Returns:
+        Divergence or None: The smallest divergence, with state set, or None
+        if there were none.
+    """
+    if not divergences:
+        return None
+    smallest = min(divergences, key=lambda d: (d.n_players, d.turn, d.seed))
+    game = new_game(smallest.seed, smallest.n_players)
+    while game.turns < smallest.turn - 1:
+        game.play_turn()
+    smallest.state = game.snapshot()
+    _, differences = compare_games([game], game.turns + 1, smallest.seed)
+    smallest.one_turn = bool(differences)
+    return smallest
+
+
+class ConformanceResults:
+    """Outcome of a fuzzing run.
+
+    Attributes:
+        n_players (int): Players per game.
+        games (int): Games compared.
+        turns (int): Turns compared.
+        divergences (list[Divergence]): Every game the engines disagree on.
+        smallest (Divergence or None): The shrunk divergence, if any.
+        seed (int or None): Base seed of the run.
+        elapsed (float): Wall-clock seconds of the run.
+        workers (int): Number of worker processes used.
+    """
+
+    def __init__(self, n_players=2):
+        """Creates empty results.
+
+        Args:
+            n_players (int, optional): Players per game. Defaults to 2.
+        """
+        self.n_players = n_players
+        self.games = 0
+        self.turns = 0
+        self.divergences = []
+        self.smallest = None
+        self.seed = None
+        self.elapsed = 0.0
+        self.workers = 1
+
+    def merge(self, other):
+        """Adds the totals of another run, e.g. from a worker process.
+
+        Args:
+            other (ConformanceResults): Results to add.
+
+        Side effects:
+            Updates the counters and the divergences.
+        """
+        self.games += other.games
+        self.turns += other.turns
+        self.divergences.extend(other.divergences)
+
+    def games_per_second(self):
+        """Returns how many games were checked per second.
+
+        Returns:
+            float: Throughput, or 0.0 if no time was measured.
+        """
+        return self.games / self.elapsed if self.elapsed else 0.0
+
+    def summary(self):
+        """Formats the results for the terminal.
+
+        Returns:
+            str: Multi-line report.
+        """
+        lines = [f"Games compared: {self.games} with {self.n_players} "
+                 f"players (seed {self.seed})",
+                 f"Turns compared: {self.turns}",
+                 f"Divergent games: {len(self.divergences)}"]
+        if self.smallest is not None:
+            lines.append(self.smallest.describe())
+        lines.append(f"Elapsed: {self.elapsed:.2f}s on {self.workers} "
+                     "worker(s)")
+        lines.append(f"Throughput: {self.games_per_second():.0f} games/s")
+        return "\n".join(lines)
+
+
+def _check_chunk(first, n_games, seed, n_players, max_turns):
+    """Compares a chunk of games inside one worker.
+
+    Args:
+        first (int): Index of the first game of the chunk within the run.
+        n_games (int): Number of games to compare.
+        seed (int): Base seed of the run.
+        n_players (int): Players per game.
+        max_turns (int): Turn limit per game.
+
+    Returns:
+        ConformanceResults: Totals for the chunk.
+    """
+    results = ConformanceResults(n_players)
+    for start in range(first, first + n_games, BATCH_SIZE):
+        end = min(start + BATCH_SIZE, first + n_games)
+        turns, divergences = check_seeds(
+            [derive_seed(seed, index) for index in range(start, end)],
+            n_players, max_turns)
+        results.games += end - start
+        results.turns += turns
+        results.divergences.extend(divergences)
+    return results
+
+
+def fuzz(n_games, n_players=2, workers=None, seed=None, max_turns=MAX_TURNS):
+    """Compares the engines on many seeded games across a process pool.
+
+    Args:
+        n_games (int): Number of games to compare.
+        n_players (int, optional): Players per game. Defaults to 2.
+        workers (int, optional): Worker processes. Defaults to all cores.
+            With one worker the games run in the calling process.
+        seed (int, optional): Base seed. Defaults to a fresh seed, which is
+            reported in the results.
+        max_turns (int, optional): Turn limit per game. Defaults to
+            MAX_TURNS.
+
+    Returns:
+        ConformanceResults: Counts, divergences and throughput.
+
+    Raises:
+        ValueError: If the games need more than one deck.
+    """
+    if n_players * 7 >= N_CARDS:
+        raise ValueError("The vectorized engine plays with one deck only")
+    workers = workers or os.cpu_count() or 1
+    if seed is None:
+        seed = random.getrandbits(64)
+    chunks = [(first, size, seed, n_players, max_turns)
+              for first, size in split_games(n_games, workers)]
+
+    results = ConformanceResults(n_players)
+    start = time.perf_counter()
+    if workers == 1:
+        for chunk in chunks:
+            results.merge(_check_chunk(*chunk))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_check_chunk, *chunk) for chunk in chunks]
+            for future in futures:
+                results.merge(future.result())
+    results.elapsed = time.perf_counter() - start
+    results.smallest = shrink(results.divergences, max_turns)
+    results.workers = workers
+    results.seed = seed
+    return results
+
+
+def parse_args(arglist):
+    """Parse command-line arguments.
+
+    Args:
+        arglist (list of str): list of command-line arguments.
+
+    Returns:
+        namespace: a namespace with attributes "games", "players", "workers"
+        and "seed".
+    """
+    parser = ArgumentParser(description="Check that the vectorized engine "
+                                        "plays exactly like the Game loop")
+    parser.add_argument("-n", "--games", type=int, default=10000)
+    parser.add_argument("-p", "--players", type=int, default=2)
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="worker processes (default: all cores)")
+    parser.add_argument("-s", "--seed", type=int, default=None,
+                        help="base seed for reproducible runs")
+    return parser.parse_args(arglist)
+
+
+if __name__ == "__main__":
+    args = parse_args(sys.argv[1:])
+    results = fuzz(args.games, args.players, args.workers, args.seed)
+    print(results.summary())
+    sys.exit(1 if results.divergences else 0)
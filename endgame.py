@@ -0,0 +1,554 @@
+"""Exact endgame solver for heads-up games.
+
+Once both hands are small, a game can be solved on open information: both
+hands and the order of the draw pile are known, as they are to an analyst
+(or inside a determinized search). The solver runs negamax with alpha-beta
+pruning over every legal card, every suit for an 8 and drawing a card when
+nothing is legal (optionally also when something is), and remembers
+positions in a transposition table keyed by a Zobrist hash of the hands, top
+card, current suit, direction, player to move and position in the draw pile.
+
+A position is worth WIN or LOSS for the player to move, or UNDECIDED when
+the game cannot be decided before the draw pile runs out (the reshuffle
+that follows is random). The "endgame" CPU strategy plays solved moves once
+both hands are at most ENDGAME_CARDS cards, and the first valid card before.
+
+    python3 endgame.py --seed 7
+    python3 endgame.py --seed 7 --cards 5
+"""
+
+import random
+import sys
+import time
+from argparse import ArgumentParser
+from functools import lru_cache
+
+from collaborative_assignment_card_game_inst326 import (
+    CARDS, DECK_TEMPLATE, NULL_SINK, STANDARD_RULES, Deck, DeckExhausted,
+    FirstValidStrategy, Game, Player)
+
+WIN = 1
+UNDECIDED = 0
+LOSS = -1
+
+# Transposition table entry kinds: the exact value, or a bound on it.
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+ENDGAME_CARDS = 3
+TABLE_ENTRIES = 1 << 20
+ZOBRIST_SEED = 326
+
+SKIP = 1
+REVERSE = 2
+DRAW_2 = 3
+_ACTION_KINDS = {"SKIP": SKIP, "REVERSE": REVERSE, "DRAW 2 CARDS": DRAW_2}
+ACTION_KIND = bytes(_ACTION_KINDS.get(card.action, 0) for card in CARDS)
+
+
+@lru_cache(maxsize=None)
+def zobrist_keys(copies):
+    """Returns the random 64-bit keys the position hashes are built from.
+
+    Args:
+        copies (int): Most copies of one card a hand can hold.
+
+    Returns:
+        dict: "hand" keys indexed [seat][copy][card id], and "top", "suit",
+        "direction", "mover" and "drawn" keys for the other parts of a
+        position.
+    """
+    rng = random.Random(ZOBRIST_SEED)
+
+    def keys(n):
+        return [rng.getrandbits(64) for _ in range(n)]
+
+    return {"hand": [[keys(len(CARDS)) for _ in range(copies)]
+                     for _ in range(2)],
+            "top": keys(len(CARDS)),
+            "suit": keys(len(Deck.SUITS)),
+            "direction": {1: 0, -1: rng.getrandbits(64)},
+            "mover": keys(2),
+            "drawn": keys(len(DECK_TEMPLATE) * copies + 1)}
+
+
+class EndgameSolver:
+    """Solves a heads-up position on open information.
+
+    The position is kept in mutable fields and changed and restored in
+    place while searching; top, suit, direction, mover and drawn may be set
+    directly between searches.
+
+    Attributes:
+        top (int): Card id on top of the played pile.
+        suit (int): Index of the current suit in Deck.SUITS.
+        direction (int): 1 or -1.
+        mover (int): Seat to move, 0 or 1.
+        drawn (int): Cards drawn from the pile so far.
+        pile (bytes): The draw pile, next card first.
+        table (dict): Transposition table, from position hash to
+            (value, EXACT/LOWER/UPPER).
+        max_entries (int): Entries after which the table is emptied.
+        voluntary_draws (bool): Whether drawing is searched when a card
+            could be played.
+        nodes (int): Positions searched.
+        probes (int): Transposition table lookups.
+        hits (int): Lookups that found an entry.
+    """
+
+    def __init__(self, state, rules=None, max_entries=TABLE_ENTRIES,
+                 voluntary_draws=False):
+        """Sets up the position of a snapshot.
+
+        Args:
+            state (GameState): A heads-up position, e.g. Game.snapshot().
+            rules (RuleSet, optional): The game's rules. Defaults to
+                STANDARD_RULES.
+            max_entries (int, optional): Size limit of the transposition
+                table. Defaults to TABLE_ENTRIES.
+            voluntary_draws (bool, optional): Also search drawing a card
+                when a card could be played, as humans may. The search then
+                grows far larger. Defaults to False: players draw only when
+                nothing is legal, like the CPU players.
+
+        Raises:
+            ValueError: If the game does not have two players, or its rules
+                stack DRAW 2 CARDS or allow jump-ins.
+        """
+        rules = rules or STANDARD_RULES
+        if len(state.hands) != 2:
+            raise ValueError("The endgame solver needs exactly two players")
+        if rules.stack_draws or rules.jump_in:
+            raise ValueError(f"The endgame solver cannot play {rules.name} "
+                             "rules")
+        tables = rules.tables(state.wild_rank)
+        self.legal_masks = tables.legal_masks
+        self.wild = tables.wild
+        self.pile = bytes(reversed(state.cards))
+        total = (len(state.cards) + len(state.played_cards)
+                 + sum(len(hand) for hand in state.hands))
+        self.keys = zobrist_keys(max(1, total // len(DECK_TEMPLATE)))
+
+        self.drawn = 0
+        self._set_position(state)
+
+        self.voluntary_draws = voluntary_draws
+        self.table = {}
+        self.max_entries = max_entries
+        self.nodes = 0
+        self.probes = 0
+        self.hits = 0
+
+    @classmethod
+    def from_game(cls, game, **kwargs):
+        """Sets up the current position of a game.
+
+        Args:
+            game (Game): A heads-up game.
+            **kwargs: More arguments for the constructor.
+
+        Returns:
+            EndgameSolver: A solver for the game's position.
+        """
+        return cls(game.snapshot(), game.rules, **kwargs)
+
+    def _set_position(self, state):
+        """Sets the hands, top card, suit, direction and player to move."""
+        self.counts = [bytearray(len(CARDS)), bytearray(len(CARDS))]
+        self.masks = [0, 0]
+        self.sizes = [0, 0]
+        self.hand_keys = [0, 0]
+        for seat, hand in enumerate(state.hands):
+            for cid in hand:
+                self._add(seat, cid)
+        self.top = state.played_cards[-1]
+        self.suit = Deck.SUITS.index(state.current_suit)
+        self.direction = state.direction
+        self.mover = state.current_player_idx
+
+    def advance(self, state):
+        """Moves to a later position of the same game, keeping the table.
+
+        Positions are hashed with the number of cards drawn from the
+        solver's pile, so the table stays valid as long as the game has
+        only drawn from that pile since.
+
+        Args:
+            state (GameState): A later snapshot of the solver's game.
+
+        Returns:
+            bool: False, leaving the position unchanged, if the draw pile is
+            not what is left of the solver's pile (e.g. after a reshuffle).
+        """
+        drawn = len(self.pile) - len(state.cards)
+        if drawn < 0 or self.pile[drawn:] != bytes(reversed(state.cards)):
+            return False
+        self.drawn = drawn
+        self._set_position(state)
+        return True
+
+    def _add(self, seat, cid):
+        """Puts a card into a hand and updates its hash."""
+        counts = self.counts[seat]
+        self.hand_keys[seat] ^= self.keys["hand"][seat][counts[cid]][cid]
+        counts[cid] += 1
+        self.masks[seat] |= 1 << cid
+        self.sizes[seat] += 1
+
+    def _remove(self, seat, cid):
+        """Takes a card out of a hand and updates its hash."""
+        counts = self.counts[seat]
+        counts[cid] -= 1
+        self.hand_keys[seat] ^= self.keys["hand"][seat][counts[cid]][cid]
+        if not counts[cid]:
+            self.masks[seat] &= ~(1 << cid)
+        self.sizes[seat] -= 1
+
+    def position_key(self):
+        """Hashes the current position.
+
+        Returns:
+            int: 64-bit Zobrist hash of hands, top card, suit, direction,
+            player to move and cards drawn.
+        """
+        keys = self.keys
+        return (self.hand_keys[0] ^ self.hand_keys[1] ^ keys["top"][self.top]
+                ^ keys["suit"][self.suit] ^ keys["direction"][self.direction]
+                ^ keys["mover"][self.mover] ^ keys["drawn"][self.drawn])
+
+    def moves(self):
+        """Lists the moves of the player to move.
+
+        Returns:
+            list: (card id, suit index or None) for every distinct legal
+            card, once per suit for an 8, then None for drawing a card
+            (only if nothing is legal, unless voluntary_draws is set).
+        """
+        legal = (self.masks[self.mover]
+                 & self.legal_masks[self.top << 2 | self.suit])
+        moves = []
+        while legal:
+            low = legal & -legal
+            legal ^= low
+            cid = low.bit_length() - 1
+            if self.wild[cid]:
+                moves.extend((cid, suit) for suit in range(len(Deck.SUITS)))
+            else:
+                moves.append((cid, None))
+        if not moves or self.voluntary_draws:
+            moves.append(None)
+        return moves
+
+    def _draw(self, seat, count):
+        """Draws cards into a hand; returns False if the pile is too short."""
+        if self.drawn + count > len(self.pile):
+            return False
+        for cid in self.pile[self.drawn:self.drawn + count]:
+            self._add(seat, cid)
+        self.drawn += count
+        return True
+
+    def _undraw(self, seat, count):
+        """Puts the last drawn cards back on the pile."""
+        self.drawn -= count
+        for cid in self.pile[self.drawn:self.drawn + count]:
+            self._remove(seat, cid)
+
+    def _move_value(self, move, alpha, beta):
+        """Plays a move, searches the position after it and takes it back.
+
+        Args:
+            move (tuple or None): A move from moves().
+            alpha (int): Value the player to move already has.
+            beta (int): Value above which the opponent avoids this line.
+
+        Returns:
+            int: Value of the move for the player making it.
+        """
+        seat = self.mover
+        other = 1 - seat
+        if move is None:
+            if not self._draw(seat, 1):
+                return UNDECIDED
+            self.mover = other
+            value = -self._negamax(-beta, -alpha)
+            self.mover = seat
+            self._undraw(seat, 1)
+            return value
+
+        cid, suit = move
+        self._remove(seat, cid)
+        if not self.sizes[seat]:
+            self._add(seat, cid)
+            return WIN
+        top, current_suit, direction = self.top, self.suit, self.direction
+        self.top = cid
+        self.suit = cid >> 4 if suit is None else suit
+        kind = ACTION_KIND[cid]
+        if kind == SKIP:
+            value = self._negamax(alpha, beta)
+        elif kind == DRAW_2 and not self._draw(other, 2):
+            value = UNDECIDED
+        else:
+            if kind == REVERSE:
+                self.direction = -direction
+            self.mover = other
+            value = -self._negamax(-beta, -alpha)
+            self.mover = seat
+            if kind == DRAW_2:
+                self._undraw(other, 2)
+        self.top, self.suit, self.direction = top, current_suit, direction
+        self._add(seat, cid)
+        return value
+
+    def _negamax(self, alpha, beta):
+        """Searches the current position with alpha-beta pruning.
+
+        Args:
+            alpha (int): Lower end of the search window.
+            beta (int): Upper end of the search window.
+
+        Returns:
+            int: Value for the player to move; exact inside the window, a
+            bound outside it.
+        """
+        self.nodes += 1
+        self.probes += 1
+        key = self.position_key()
+        entry = self.table.get(key)
+        if entry is not None:
+            self.hits += 1
+            value, kind = entry
+            if kind == EXACT:
+                return value
+            if kind == LOWER and value > alpha:
+                alpha = value
+            elif kind == UPPER and value < beta:
+                beta = value
+            if alpha >= beta:
+                return value
+
+        start = alpha
+        best = LOSS - 1
+        for move in self.moves():
+            value = self._move_value(move, alpha, beta)
+            if value > best:
+                best = value
+                if best > alpha:
+                    alpha = best
+                    if alpha >= beta:
+                        break
+
+        if len(self.table) >= self.max_entries:
+            self.table.clear()
+        kind = UPPER if best <= start else LOWER if best >= beta else EXACT
+        self.table[key] = (best, kind)
+        return best
+
+    def solve(self):
+        """Finds the value of the position and a best move.
+
+        Returns:
+            tuple: (value, move) where move is a move from moves().
+        """
+        best_value, best_move = LOSS - 1, None
+        for move in self.moves():
+            value = self._move_value(move, best_value, WIN)
+            if value > best_value:
+                best_value, best_move = value, move
+                if value == WIN:
+                    break
+        return best_value, best_move
+
+    def value(self):
+        """Finds the exact value of the position.
+
+        Returns:
+            int: WIN, UNDECIDED or LOSS for the player to move.
+        """
+        return self._negamax(LOSS, WIN)
+
+    def move_values(self):
+        """Finds the exact value of every move of the player to move.
+
+        Returns:
+            list[tuple]: (move, value) pairs in the order of moves().
+        """
+        return [(move, self._move_value(move, LOSS, WIN))
+                for move in self.moves()]
+
+    def hit_rate(self):
+        """Returns the share of table lookups that found an entry."""
+        return self.hits / self.probes if self.probes else 0.0
+
+
+def in_endgame(game, cards=ENDGAME_CARDS):
+    """Checks whether a game is small enough to solve.
+
+    Args:
+        game (Game): The game.
+        cards (int, optional): Most cards either hand may hold. Defaults to
+            ENDGAME_CARDS.
+
+    Returns:
+        bool: True for a heads-up game with both hands at most cards long
+        under rules the solver plays.
+    """
+    return (len(game.players) == 2
+            and not game.rules.stack_draws and not game.rules.jump_in
+            and all(len(player.hand) <= cards for player in game.players))
+
+
+class EndgameStrategy(FirstValidStrategy):
+    """Plays solved moves in small heads-up endgames, first-valid before.
+
+    The solver sees the opponent's hand and the draw pile, so this strategy
+    is for analysis and as a benchmark of perfect play, not a fair opponent.
+    It keeps one solver per game, so the transposition table filled for one
+    move answers most of the positions of the next.
+    """
+    name = "endgame"
+
+    def __init__(self):
+        """Creates the strategy without a solver."""
+        self._game = None
+        self._solver = None
+
+    def solver(self, game):
+        """Returns a solver set to the game's current position.
+
+        The previous solver is reused while the game is the same and has
+        not reshuffled its draw pile.
+
+        Args:
+            game (Game): A game in its endgame (see in_endgame).
+
+        Returns:
+            EndgameSolver: The solver, with the game's player to move.
+        """
+        state = game.snapshot()
+        if self._game is not game or not self._solver.advance(state):
+            self._game = game
+            self._solver = EndgameSolver(state, game.rules)
+        return self._solver
+
+    def choose_card(self, hand, game):
+        """Picks a move that wins if anything does.
+
+        Args:
+            hand (Hand): The player's cards.
+            game (Game): The game being played.
+
+        Returns:
+            Card or None: The card to play, or None to draw.
+        """
+        if not in_endgame(game):
+            return super().choose_card(hand, game)
+        _, move = self.solver(game).solve()
+        return None if move is None else CARDS[move[0]]
+
+    def choose_suit(self, hand, game):
+        """Picks the suit that is worst for the opponent.
+
+        Args:
+            hand (Hand): The player's cards, without the 8 just played.
+            game (Game): The game being played, with the 8 on top.
+
+        Returns:
+            str: One of Deck.SUITS.
+        """
+        if not hand or not in_endgame(game):
+            return super().choose_suit(hand, game)
+        solver = self.solver(game)
+        solver.mover = 1 - game.current_player_idx
+        values = []
+        for suit in range(len(Deck.SUITS)):
+            solver.suit = suit
+            values.append(solver.value())
+        return Deck.SUITS[values.index(min(values))]
+
+
+def play_to_endgame(seed, cards=ENDGAME_CARDS, max_turns=1000):
+    """Plays a first-valid CPU game until both hands are small.
+
+    Args:
+        seed (int): Seed of the game.
+        cards (int, optional): Most cards either hand may hold. Defaults to
+            ENDGAME_CARDS.
+        max_turns (int, optional): Turn limit. Defaults to 1000.
+
+    Returns:
+        Game or None: The game at its first endgame position, or None if it
+        ended (or hit the turn limit) before reaching one.
+    """
+    game = Game([Player("CPU 1", is_cpu=True), Player("CPU 2", is_cpu=True)],
+                NULL_SINK, seed=seed)
+    try:
+        while game.turns < max_turns:
+            if in_endgame(game, cards):
+                return game
+            if game.play_turn():
+                return None
+    except DeckExhausted:
+        pass
+    return None
+
+
+def describe_move(move):
+    """Formats a solver move for the terminal.
+
+    Args:
+        move (tuple or None): A move from EndgameSolver.moves().
+
+    Returns:
+        str: The card (and suit for an 8), or "draw".
+    """
+    if move is None:
+        return "draw"
+    cid, suit = move
+    if suit is None:
+        return str(CARDS[cid])
+    return f"{CARDS[cid]} -> {Deck.SUITS[suit]}"
+
+
+def parse_args(arglist):
+    """Parse command-line arguments.
+
+    Args:
+        arglist (list of str): list of command-line arguments.
+
+    Returns:
+        namespace: a namespace with attributes "seed" and "cards".
+    """
+    parser = ArgumentParser(description="Solve the endgame of a heads-up "
+                                        "CPU game exactly")
+    parser.add_argument("-s", "--seed", type=int, default=1,
+                        help="seed of the game to play into its endgame")
+    parser.add_argument("-c", "--cards", type=int, default=ENDGAME_CARDS,
+                        help="solve once both hands hold at most this many "
+                             "cards")
+    return parser.parse_args(arglist)
+
+
+if __name__ == "__main__":
+    args = parse_args(sys.argv[1:])
+    game = play_to_endgame(args.seed, args.cards)
+    if game is None:
+        sys.exit(f"Game {args.seed} ended before both hands were down to "
+                 f"{args.cards} cards")
+    solver = EndgameSolver.from_game(game)
+    mover = game.players[game.current_player_idx]
+    print(f"Turn {game.turns}: top card {game.played_card} "
+          f"(suit {game.current_suit}), {len(solver.pile)} cards to draw")
+    for player in game.players:
+        print(f"  {player.name}: {player.hand}")
+    start = time.perf_counter()
+    outcomes = {WIN: "wins", UNDECIDED: "undecided", LOSS: "loses"}
+    print(f"Moves for {mover.name}:")
+    for move, value in solver.move_values():
+        print(f"  {describe_move(move):32} {outcomes[value]}")
+    elapsed = time.perf_counter() - start
+    print(f"Nodes: {solver.nodes:,}  table entries: {len(solver.table):,}  "
+          f"hit rate: {solver.hit_rate():.1%}  time: {elapsed:.2f}s "
+          f"({solver.nodes / elapsed:,.0f} nodes/s)")
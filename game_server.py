@@ -0,0 +1,676 @@
+"""Asyncio TCP server hosting many Crazy Eights/Uno tables in one process.
+
+Every table is a Game driven by its own task on one event loop. Human seats
+are network clients; CPU seats fill up the rest of each table. Nothing
+blocks the loop: human moves are awaited with a per-move timeout, and search
+based CPU players think in a thread pool.
+
+The protocol is line based. Clients send plain text commands:
+
+    JOIN <name>            take a seat at the next table
+    PLAY <n> [SUIT]        play valid card n (1-based) or 0 to draw; an 8
+                           needs the new suit, e.g. "PLAY 2 HEARTS"
+    QUIT                   leave
+
+and the server answers with one JSON object per line, each with an "event"
+key: "joined", "your_turn" (with the hand, the valid cards, the top card,
+the suit and the timeout), "error", "timeout", "game_over", plus the game's
+own events ("start", "card_played", "draw", ...). Cards are sent as text.
+A player who does not answer in time, or disconnects, plays the first valid
+card like the built-in CPU. After "game_over" the client may JOIN again.
+
+Try it with "python3 game_server.py serve" and "nc localhost 8326", or
+measure it with "python3 game_server.py load -c 500".
+"""
+
+import asyncio
+import json
+import random
+import sys
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+
+from collaborative_assignment_card_game_inst326 import (
+    Deck, DeckExhausted, EventSink, Game, Player, derive_seed)
+from simulation import MAX_TURNS
+
+PORT = 8326
+
+
+def encode(kind, **fields):
+    """Formats one server message.
+
+    Args:
+        kind (str): The kind of message, e.g. "your_turn".
+        **fields: The message data. Cards are written as their text.
+
+    Returns:
+        bytes: One JSON line.
+    """
+    line = json.dumps({"event": kind, **fields}, default=repr)
+    return (line + "\n").encode()
+
+
+class RemotePlayer(Player):
+    """A human seat played over a network connection.
+
+    Attributes:
+        writer (asyncio.StreamWriter): The client's connection.
+        connected (bool): False once the client has gone away.
+        pending (asyncio.Future or None): Resolves to the client's next
+            command line while the table waits for this player's move.
+        in_game (bool): Whether the player's table is still being played.
+    """
+
+    def __init__(self, name, writer):
+        """Creates a remote seat.
+
+        Args:
+            name (str): The name of the player.
+            writer (asyncio.StreamWriter): Where messages to the client go.
+        """
+        super().__init__(name)
+        self.writer = writer
+        self.connected = True
+        self.pending = None
+        self.in_game = True
+
+    def send(self, kind, **fields):
+        """Queues a message for the client without waiting for it.
+
+        Args:
+            kind (str): The kind of message.
+            **fields: The message data.
+
+        Side effects:
+            Writes to the connection's buffer.
+        """
+        if self.connected and not self.writer.is_closing():
+            self.writer.write(encode(kind, **fields))
+
+    def choose_suit(self, game):
+        """Picks a suit for a move the player did not make in time.
+
+        Args:
+            game (Game): The game being played.
+
+        Returns:
+            str: A suit from the game's random generator.
+        """
+        return game.rng.choice(Deck.SUITS)
+
+
+class TableSink(EventSink):
+    """Sends a table's game events to every human seat.
+
+    Attributes:
+        players (list[RemotePlayer]): The seats that receive the events.
+    """
+
+    def __init__(self, players):
+        """Creates a sink for one table.
+
+        Args:
+            players (list[RemotePlayer]): The human seats of the table.
+        """
+        self.players = players
+
+    def emit(self, kind, **fields):
+        """Broadcasts the event.
+
+        Args:
+            kind (str): The kind of event.
+            **fields: The event data.
+
+        Side effects:
+            Writes one line to every connected seat.
+        """
+        line = encode(kind, **fields)
+        for player in self.players:
+            if player.connected and not player.writer.is_closing():
+                player.writer.write(line)
+
+
+def parse_move(line, valid_cards):
+    """Reads a PLAY command.
+
+    Args:
+        line (str): The command, e.g. "PLAY 2 HEARTS".
+        valid_cards (list[Card]): The cards the player may play.
+
+    Returns:
+        tuple: (Card or None, suit or None); None as the card means draw.
+
+    Raises:
+        ValueError: If the command is not a valid move.
+    """
+    words = line.split()
+    if not words or words[0].upper() != "PLAY" or len(words) not in (2, 3):
+        raise ValueError("expected PLAY <n> [SUIT]")
+    try:
+        choice = int(words[1])
+    except ValueError:
+        raise ValueError(f"not a card number: {words[1]}") from None
+    if choice == 0:
+        return None, None
+    if not 1 <= choice <= len(valid_cards):
+        raise ValueError(f"choose a card from 1 to {len(valid_cards)}, "
+                         "or 0 to draw")
+    card = valid_cards[choice - 1]
+    if card.ranktype != "8":
+        return card, None
+    suit = words[2].upper() if len(words) == 3 else None
+    if suit not in Deck.SUITS:
+        raise ValueError(f"an 8 needs a suit: {', '.join(Deck.SUITS)}")
+    return card, suit
+
+
+class Table:
+    """One game being played on the server.
+
+    Attributes:
+        table_id (int): Number of the table, also used to derive its seed.
+        players (list[Player]): The seats, humans first.
+        game (Game or None): The game, once every seat is taken.
+    """
+
+    def __init__(self, server, table_id):
+        """Creates an empty table.
+
+        Args:
+            server (GameServer): The server the table belongs to.
+            table_id (int): Number of the table.
+        """
+        self.server = server
+        self.table_id = table_id
+        self.players = []
+        self.game = None
+
+    async def run(self):
+        """Plays the game to the end.
+
+        Side effects:
+            Sends the game to the human seats, and updates the server's
+            counters.
+        """
+        server = self.server
+        humans = [player for player in self.players
+                  if isinstance(player, RemotePlayer)]
+        seed = None if server.seed is None else derive_seed(server.seed,
+                                                            self.table_id)
+        self.game = game = Game(self.players, TableSink(humans), seed=seed)
+        game.events.emit("start", card=game.played_card,
+                         players=[player.name for player in self.players])
+        try:
+            while game.turns < server.max_turns:
+                player = game.players[game.current_player_idx]
+                if isinstance(player, RemotePlayer):
+                    card, suit = await self._remote_move(player)
+                else:
+                    card, suit = await self._cpu_move(player)
+                server.moves += 1
+                if game.apply_move(card, suit):
+                    break
+        except DeckExhausted:
+            # Both the deck and the played pile ran out; nobody can win.
+            pass
+        finally:
+            winner = game.winner.name if game.winner else None
+            for player in humans:
+                player.send("game_over", winner=winner, turns=game.turns)
+                player.in_game = False
+            server.games_finished += 1
+
+    async def _remote_move(self, player):
+        """Waits for a human seat's move.
+
+        Args:
+            player (RemotePlayer): The player to move.
+
+        Returns:
+            tuple: (Card or None, suit or None) to pass to Game.apply_move.
+        """
+        game = self.game
+        valid_cards = player.hand.valid_cards(game.played_card,
+                                              game.current_suit,
+                                              game.legal_masks)
+        if not valid_cards:
+            return None, None
+        if player.connected:
+            timeout = self.server.move_timeout
+            player.send("your_turn", hand=list(player.hand), valid=valid_cards,
+                        card=game.played_card, suit=game.current_suit,
+                        timeout=timeout)
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + timeout
+            while player.connected:
+                player.pending = loop.create_future()
+                try:
+                    line = await asyncio.wait_for(player.pending,
+                                                  deadline - loop.time())
+                except asyncio.TimeoutError:
+                    self.server.timeouts += 1
+                    player.send("timeout")
+                    break
+                finally:
+                    player.pending = None
+                if line is None:
+                    break
+                try:
+                    return parse_move(line, valid_cards)
+                except ValueError as error:
+                    player.send("error", message=str(error))
+        return valid_cards[0], None
+
+    async def _cpu_move(self, player):
+        """Lets a CPU seat choose its move.
+
+        Args:
+            player (Player): The CPU player to move.
+
+        Returns:
+            tuple: (Card or None, None); the suit of an 8 is left to
+            Game.apply_move, which asks the player.
+        """
+        executor = self.server.executor
+        if executor is None:
+            card = player.choose_card(self.game)
+            # Let the other tables run between consecutive CPU turns.
+            await asyncio.sleep(0)
+        else:
+            loop = asyncio.get_running_loop()
+            card = await loop.run_in_executor(executor, player.choose_card,
+                                              self.game)
+        return card, None
+
+
+class GameServer:
+    """Seats clients at tables and runs every table on one event loop.
+
+    Attributes:
+        seats (int): Human seats per table; a table starts when they are
+            all taken.
+        cpus (int): CPU seats added to every table.
+        move_timeout (float): Seconds a human has for each move.
+        cpu (str): "basic" or "monte-carlo".
+        budget (float): Seconds per move for Monte Carlo CPU seats.
+        seed (int or None): Base seed; table i is seeded with
+            derive_seed(seed, i).
+        max_turns (int): Turns after which a table ends without a winner.
+        executor (Executor or None): Where search-based CPU seats think.
+            Basic CPU seats only need a table lookup and move inline.
+        tables (int): Tables opened so far.
+        games_finished (int): Tables played to the end.
+        moves (int): Moves played on all tables.
+        timeouts (int): Moves made for players who did not answer in time.
+    """
+
+    def __init__(self, seats=2, cpus=0, move_timeout=30.0, cpu="basic",
+                 budget=1.0, seed=None, max_turns=MAX_TURNS):
+        """Creates a server.
+
+        Args:
+            seats (int, optional): Human seats per table. Defaults to 2.
+            cpus (int, optional): CPU seats per table. Defaults to 0.
+            move_timeout (float, optional): Seconds per human move.
+                Defaults to 30.
+            cpu (str, optional): "basic" or "monte-carlo". Defaults to
+                "basic".
+            budget (float, optional): Seconds per Monte Carlo move.
+                Defaults to 1.0.
+            seed (int, optional): Base seed for the tables. Defaults to
+                unseeded games.
+            max_turns (int, optional): Turn limit per table. Defaults to
+                MAX_TURNS.
+
+        Raises:
+            ValueError: If a table would have no human seat or fewer than
+                two seats.
+        """
+        if seats < 1 or seats + cpus < 2:
+            raise ValueError("a table needs a human seat and two players")
+        self.seats = seats
+        self.cpus = cpus
+        self.move_timeout = move_timeout
+        self.cpu = cpu
+        self.budget = budget
+        self.seed = seed
+        self.max_turns = max_turns
+        self.executor = ThreadPoolExecutor() if cpu != "basic" else None
+        self.tables = 0
+        self.games_finished = 0
+        self.moves = 0
+        self.timeouts = 0
+        self._open_table = None
+        self._tasks = set()
+
+    async def start(self, host="127.0.0.1", port=PORT):
+        """Starts listening.
+
+        Args:
+            host (str, optional): Address to bind. Defaults to localhost.
+            port (int, optional): Port to bind; 0 picks a free one.
+                Defaults to PORT.
+
+        Returns:
+            asyncio.Server: The listening server.
+        """
+        return await asyncio.start_server(self._handle, host, port)
+
+    def _new_cpu(self, table, number):
+        """Creates a CPU seat.
+
+        Args:
+            table (Table): The table the seat is for.
+            number (int): Number of the seat among the CPUs, from 1.
+
+        Returns:
+            Player: A basic or Monte Carlo CPU player.
+        """
+        name = f"CPU {number}"
+        if self.cpu == "monte-carlo":
+            # Imported here because monte_carlo imports the game module.
+            from monte_carlo import MonteCarloPlayer
+            seed = None
+            if self.seed is not None:
+                seed = derive_seed(derive_seed(self.seed, table.table_id),
+                                   number)
+            return MonteCarloPlayer(name, self.budget, seed=seed)
+        return Player(name, is_cpu=True)
+
+    def _seat(self, player):
+        """Puts a player at the open table and starts it once it is full.
+
+        Args:
+            player (RemotePlayer): The player who joined.
+
+        Side effects:
+            Sends "joined" and may start a table task.
+        """
+        table = self._open_table
+        if table is None:
+            table = self._open_table = Table(self, self.tables)
+            self.tables += 1
+        table.players.append(player)
+        player.send("joined", table=table.table_id,
+                    seat=len(table.players) - 1)
+        if len(table.players) == self.seats:
+            table.players += [self._new_cpu(table, i + 1)
+                              for i in range(self.cpus)]
+            self._open_table = None
+            task = asyncio.create_task(table.run())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _handle(self, reader, writer):
+        """Serves one client connection.
+
+        Args:
+            reader (asyncio.StreamReader): Lines from the client.
+            writer (asyncio.StreamWriter): Lines to the client.
+        """
+        player = None
+        try:
+            while True:
+                data = await reader.readline()
+                if not data:
+                    break
+                line = data.decode(errors="replace").strip()
+                command = line.split(maxsplit=1)[0].upper() if line else ""
+                if command == "QUIT":
+                    break
+                if player is not None and player.in_game:
+                    if player.pending is not None and not player.pending.done():
+                        player.pending.set_result(line)
+                    else:
+                        player.send("error", message="not your turn")
+                elif command == "JOIN":
+                    name = line[4:].strip() or f"Player {self.tables + 1}"
+                    player = RemotePlayer(name, writer)
+                    self._seat(player)
+                else:
+                    writer.write(encode("error", message="expected JOIN <name>"))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            if player is not None:
+                player.connected = False
+                if player.pending is not None and not player.pending.done():
+                    player.pending.set_result(None)
+                if self._open_table and player in self._open_table.players:
+                    self._open_table.players.remove(player)
+            writer.close()
+
+    def close(self):
+        """Stops the CPU thread pool.
+
+        Side effects:
+            Shuts down the executor, if there is one.
+        """
+        if self.executor is not None:
+            self.executor.shutdown()
+
+
+class LoadTestResults:
+    """Latency and throughput of a synthetic load test.
+
+    Attributes:
+        clients (int): Simulated clients.
+        games (int): Games the clients finished.
+        moves (int): Moves the clients sent.
+        latencies (list[float]): Seconds from sending a move to receiving
+            the server's answer, one per move.
+        elapsed (float): Wall-clock seconds of the test.
+    """
+
+    def __init__(self, clients):
+        """Creates empty results.
+
+        Args:
+            clients (int): Number of simulated clients.
+        """
+        self.clients = clients
+        self.games = 0
+        self.moves = 0
+        self.latencies = []
+        self.elapsed = 0.0
+
+    def latency_percentile(self, fraction):
+        """Returns a move latency percentile.
+
+        Args:
+            fraction (float): E.g. 0.99 for the 99th percentile.
+
+        Returns:
+            float: The latency in seconds.
+        """
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def summary(self):
+        """Formats the results for the terminal.
+
+        Returns:
+            str: Multi-line summary of the test.
+        """
+        elapsed = self.elapsed or 1.0
+        return "\n".join([
+            f"Clients: {self.clients}  Games: {self.games}  "
+            f"Moves: {self.moves}",
+            f"Elapsed: {self.elapsed:.2f}s",
+            f"Throughput: {self.moves / elapsed:,.0f} moves/s, "
+            f"{self.games / elapsed:,.1f} games/s",
+            f"Move latency: p50 {self.latency_percentile(0.5) * 1e3:.2f}ms, "
+            f"p95 {self.latency_percentile(0.95) * 1e3:.2f}ms, "
+            f"p99 {self.latency_percentile(0.99) * 1e3:.2f}ms, "
+            f"max {max(self.latencies, default=0.0) * 1e3:.2f}ms",
+        ])
+
+
+async def simulated_client(host, port, name, results, games=1, seed=None):
+    """Plays games against the server like a human, with random moves.
+
+    Args:
+        host (str): Server address.
+        port (int): Server port.
+        name (str): Name to join with.
+        results (LoadTestResults): Where moves, games and latencies go.
+        games (int, optional): Games to play before leaving. Defaults to 1.
+        seed (int, optional): Seed for the random moves. Defaults to None.
+
+    Side effects:
+        Updates results.
+    """
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"JOIN {name}\n".encode())
+    sent = None
+    played = 0
+    try:
+        while played < games:
+            data = await reader.readline()
+            if not data:
+                break
+            if sent is not None:
+                results.latencies.append(time.perf_counter() - sent)
+                sent = None
+            message = json.loads(data)
+            kind = message["event"]
+            if kind == "your_turn":
+                choice = rng.randint(1, len(message["valid"]))
+                move = f"PLAY {choice}"
+                if message["valid"][choice - 1].startswith("8 "):
+                    move += " " + rng.choice(Deck.SUITS)
+                writer.write((move + "\n").encode())
+                sent = time.perf_counter()
+                results.moves += 1
+            elif kind == "game_over":
+                played += 1
+                results.games += 1
+                if played < games:
+                    writer.write(f"JOIN {name}\n".encode())
+    finally:
+        writer.write(b"QUIT\n")
+        writer.close()
+
+
+async def load_test(clients=200, games=1, seats=2, cpus=0, host=None,
+                    port=PORT, seed=None):
+    """Runs many simulated clients against a server.
+
+    Args:
+        clients (int, optional): Simulated clients. Defaults to 200.
+        games (int, optional): Games per client. Defaults to 1.
+        seats (int, optional): Human seats per table of the in-process
+            server. Defaults to 2.
+        cpus (int, optional): CPU seats per table of the in-process server.
+            Defaults to 0.
+        host (str, optional): Address of a running server to test. Defaults
+            to starting a server inside this process on a free port.
+        port (int, optional): Port of that server. Defaults to PORT.
+        seed (int, optional): Seed for the clients and the tables. Defaults
+            to None.
+
+    Returns:
+        LoadTestResults: Latency and throughput figures.
+    """
+    server = listener = None
+    if host is None:
+        server = GameServer(seats, cpus, seed=seed)
+        listener = await server.start("127.0.0.1", 0)
+        host, port = listener.sockets[0].getsockname()[:2]
+    results = LoadTestResults(clients)
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*[
+            simulated_client(host, port, f"Client {i + 1}", results, games,
+                             None if seed is None else derive_seed(seed, i))
+            for i in range(clients)])
+    finally:
+        results.elapsed = time.perf_counter() - start
+        if listener is not None:
+            listener.close()
+            await listener.wait_closed()
+            server.close()
+    return results
+
+
+async def serve(server, host, port):
+    """Runs a server until it is interrupted.
+
+    Args:
+        server (GameServer): The server to run.
+        host (str): Address to bind.
+        port (int): Port to bind.
+    """
+    listener = await server.start(host, port)
+    address = listener.sockets[0].getsockname()
+    print(f"Serving Crazy Eights on {address[0]}:{address[1]}")
+    async with listener:
+        await listener.serve_forever()
+
+
+def parse_args(arglist):
+    """Parse command-line arguments.
+
+    Args:
+        arglist (list of str): list of command-line arguments.
+
+    Returns:
+        namespace: a namespace with a "command" attribute ("serve" or
+        "load") and that command's options.
+    """
+    parser = ArgumentParser(description="Host Crazy Eights tables over TCP")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    serve_parser = subparsers.add_parser("serve", help="run the server")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=PORT)
+    serve_parser.add_argument("--seats", type=int, default=2,
+                              help="human seats per table")
+    serve_parser.add_argument("--cpus", type=int, default=0,
+                              help="CPU seats per table")
+    serve_parser.add_argument("-t", "--timeout", type=float, default=30.0,
+                              help="seconds per human move")
+    serve_parser.add_argument("--cpu", choices=["basic", "monte-carlo"],
+                              default="basic")
+    serve_parser.add_argument("-b", "--budget", type=float, default=1.0,
+                              help="seconds per Monte Carlo CPU move")
+    serve_parser.add_argument("-s", "--seed", type=int, default=None)
+    load = subparsers.add_parser("load", help="run a synthetic load test")
+    load.add_argument("-c", "--clients", type=int, default=200)
+    load.add_argument("-g", "--games", type=int, default=1,
+                      help="games per client")
+    load.add_argument("--seats", type=int, default=2,
+                      help="human seats per table")
+    load.add_argument("--cpus", type=int, default=0,
+                      help="CPU seats per table")
+    load.add_argument("--connect", default=None, metavar="HOST:PORT",
+                      help="test a running server instead of a local one")
+    load.add_argument("-s", "--seed", type=int, default=None)
+    return parser.parse_args(arglist)
+
+
+if __name__ == "__main__":
+    args = parse_args(sys.argv[1:])
+    if args.command == "serve":
+        game_server = GameServer(args.seats, args.cpus, args.timeout,
+                                 args.cpu, args.budget, args.seed)
+        try:
+            asyncio.run(serve(game_server, args.host, args.port))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            game_server.close()
+    else:
+        connect_host, connect_port = None, PORT
+        if args.connect:
+            connect_host, _, connect_port = args.connect.rpartition(":")
+            connect_port = int(connect_port)
+        report = asyncio.run(load_test(args.clients, args.games, args.seats,
+                                       args.cpus, connect_host, connect_port,
+                                       args.seed))
+        print(report.summary())
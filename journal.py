@@ -0,0 +1,521 @@
+"""Compact binary journal of every turn of many games.
+
+A journal file is a 16-byte header followed by fixed-width little-endian
+records, one per turn:
+
+    seed     uint64  seed of the game (0 for games created from an rng)
+    turn     uint32  turn number within the game, from 0
+    player   uint16  seat that moved
+    card     uint8   card id played, or NO_CARD when the player drew
+    suit     uint8   suit index chosen with an 8, or NO_SUIT
+    action   uint8   0 none, 1 skip, 2 draw 2, 3 reverse
+    draws    uint8   cards drawn during the turn, by anyone
+    flags    uint8   FLAG_FIRST on a game's first turn, FLAG_WIN on its
+                     winning turn, FLAG_RESHUFFLE when the deck was reloaded
+
+Files are append-only, so several runs can go into one journal. A game's
+records are always contiguous and start with FLAG_FIRST.
+
+    with JournalWriter("games.journal") as journal:
+        journal.attach(game)
+        game.start()
+
+    reader = JournalReader("games.journal")
+    for record in reader.iter_game(0):
+        ...
+    turns = reader.to_numpy()   # needs NumPy
+"""
+
+import mmap
+import os
+import shutil
+import struct
+import sys
+from argparse import ArgumentParser
+from collections import namedtuple
+
+from collaborative_assignment_card_game_inst326 import (
+    ACTION_OFFSET, CARDS, SUIT_INDEX)
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is only needed for to_numpy.
+    np = None
+
+MAGIC = b"C8JOURNL"
+VERSION = 2
+HEADER = struct.Struct("<8sHH4x")
+RECORD = struct.Struct("<QIHBBBBB")
+HEADER_SIZE = HEADER.size
+RECORD_SIZE = RECORD.size
+FLAGS_OFFSET = RECORD_SIZE - 1
+PLAYER_OFFSET = struct.calcsize("<QI")
+
+NO_CARD = 255
+NO_SUIT = 255
+FLAG_FIRST = 1
+FLAG_WIN = 2
+FLAG_RESHUFFLE = 4
+
+# Action code of every card id, in the same numbering as vector_engine.
+ACTION_CODES = bytes(card.id % 16 - ACTION_OFFSET + 1 if card.action else 0
+                     for card in CARDS)
+
+TurnRecord = namedtuple(
+    "TurnRecord", "seed turn player card suit action draws flags")
+
+if np is not None:
+    RECORD_DTYPE = np.dtype([
+        ("seed", "<u8"), ("turn", "<u4"), ("player", "<u2"), ("card", "u1"),
+        ("suit", "u1"), ("action", "u1"), ("draws", "u1"), ("flags", "u1")])
+
+
+class JournalWriter:
+    """Appends turn records to a journal file in bulk writes.
+
+    Records are packed into a preallocated buffer and written batch_size at
+    a time; call close (or use the writer as a context manager) to write the
+    rest.
+
+    Attributes:
+        path (str): The journal file.
+        batch_size (int): Records per write.
+        records (int): Records written or buffered so far.
+    """
+
+    def __init__(self, path, batch_size=4096):
+        """Opens a journal for appending, writing the header of a new file.
+
+        Args:
+            path (str): The journal file.
+            batch_size (int, optional): Records per write. Defaults to 4096.
+
+        Raises:
+            ValueError: If path exists but is not a journal.
+
+        Side effects:
+            Creates or opens path.
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.records = 0
+        self._file = open(path, "ab")
+        if self._file.tell() == 0:
+            self._file.write(HEADER.pack(MAGIC, VERSION, RECORD_SIZE))
+        else:
+            with open(path, "rb") as f:
+                _check_header(f.read(HEADER_SIZE), path)
+        self._buffer = bytearray(batch_size * RECORD_SIZE)
+        self._pending = 0
+
+    def append(self, seed, turn, player, card, suit, action, draws, flags):
+        """Buffers one record.
+
+        Args:
+            seed (int): Seed of the game.
+            turn (int): Turn number within the game.
+            player (int): Seat that moved.
+            card (int): Card id, or NO_CARD.
+            suit (int): Suit index chosen with an 8, or NO_SUIT.
+            action (int): Action code of the card.
+            draws (int): Cards drawn during the turn.
+            flags (int): FLAG_* bits.
+
+        Side effects:
+            Writes to the file when the buffer is full.
+        """
+        RECORD.pack_into(self._buffer, self._pending * RECORD_SIZE, seed, turn,
+                         player, card, suit, action, draws, flags)
+        self._pending += 1
+        self.records += 1
+        if self._pending == self.batch_size:
+            self.flush()
+
+    def attach(self, game):
+        """Records every turn of a freshly dealt game.
+
+        Args:
+            game (Game): The game to record.
+
+        Side effects:
+            Replaces apply_move on the game with a recording wrapper.
+        """
+        append = self.append
+        deck = game.deck
+        seed = game.seed or 0
+        apply_move = game.apply_move
+        # Cards drawn because of a card and the cards that pick a suit.
+        draw_counts = game.tables.draw_counts
+        wild = game.tables.wild
+        first = FLAG_FIRST
+
+        def journaled_apply_move(chosen_card, chosen_suit=None):
+            nonlocal first
+            player_idx = game.current_player_idx
+            turn = game.turns
+            reshuffles = deck.reshuffles
+            stacked = game.pending_draws
+            won = apply_move(chosen_card, chosen_suit)
+
+            flags, first = first, 0
+            if won:
+                flags |= FLAG_WIN
+            if deck.reshuffles != reshuffles:
+                flags |= FLAG_RESHUFFLE
+            if chosen_card:
+                cid = chosen_card.id
+                suit = SUIT_INDEX[game.current_suit] if wild[cid] else NO_SUIT
+                append(seed, turn, player_idx, cid, suit, ACTION_CODES[cid],
+                       draw_counts[cid], flags)
+            else:
+                append(seed, turn, player_idx, NO_CARD, NO_SUIT, 0,
+                       stacked or 1, flags)
+            return won
+
+        game.apply_move = journaled_apply_move
+
+    def flush(self):
+        """Writes the buffered records.
+
+        Side effects:
+            Writes to the file and empties the buffer.
+        """
+        if self._pending:
+            self._file.write(
+                memoryview(self._buffer)[:self._pending * RECORD_SIZE])
+            self._pending = 0
+        self._file.flush()
+
+    def close(self):
+        """Writes the buffered records and closes the file.
+
+        Side effects:
+            Closes the file.
+        """
+        self.flush()
+        self._file.close()
+
+    def __enter__(self):
+        """Returns the writer for use in a with statement."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Closes the writer at the end of a with statement."""
+        self.close()
+
+
+def _check_header(data, path):
+    """Validates a journal header.
+
+    Args:
+        data (bytes): The first HEADER_SIZE bytes of the file.
+        path (str): The file, for the error message.
+
+    Raises:
+        ValueError: If the header is missing or from another format.
+    """
+    if len(data) < HEADER_SIZE:
+        raise ValueError(f"{path} is not a journal file")
+    magic, version, record_size = HEADER.unpack(data)
+    if magic != MAGIC or version != VERSION or record_size != RECORD_SIZE:
+        raise ValueError(f"{path} is not a version {VERSION} journal file")
+
+
+class JournalReader:
+    """Reads a journal through a memory map.
+
+    Nothing is loaded up front: records are unpacked only when they are
+    asked for, and to_numpy returns a view of the mapped file.
+
+    Attributes:
+        path (str): The journal file.
+    """
+
+    def __init__(self, path):
+        """Maps a journal file.
+
+        Args:
+            path (str): The journal file.
+
+        Raises:
+            ValueError: If the file is not a journal.
+        """
+        self.path = path
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        _check_header(self._file.read(HEADER_SIZE), path)
+        self._n_records = (size - HEADER_SIZE) // RECORD_SIZE
+        self._map = None
+        if self._n_records:
+            self._map = mmap.mmap(self._file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        self._starts = None
+
+    def __len__(self):
+        """Number of turn records in the journal."""
+        return self._n_records
+
+    def record(self, index):
+        """Unpacks one record.
+
+        Args:
+            index (int): Record number; negative numbers count from the end.
+
+        Returns:
+            TurnRecord: The record.
+
+        Raises:
+            IndexError: If there is no such record.
+        """
+        if index < 0:
+            index += self._n_records
+        if not 0 <= index < self._n_records:
+            raise IndexError("journal record out of range")
+        return TurnRecord._make(
+            RECORD.unpack_from(self._map, HEADER_SIZE + index * RECORD_SIZE))
+
+    def raw(self, start=0, stop=None):
+        """Returns records as bytes without unpacking them.
+
+        Args:
+            start (int, optional): First record. Defaults to 0.
+            stop (int, optional): Record to stop before. Defaults to the end.
+
+        Returns:
+            memoryview: The packed records.
+        """
+        if self._map is None:
+            return memoryview(b"")
+        stop = self._n_records if stop is None else min(stop, self._n_records)
+        return memoryview(self._map)[HEADER_SIZE + start * RECORD_SIZE:
+                                     HEADER_SIZE + stop * RECORD_SIZE]
+
+    def __iter__(self):
+        """Unpacks the records one at a time, first to last."""
+        return self.iter_records()
+
+    def iter_records(self, start=0, stop=None):
+        """Unpacks a range of records one at a time.
+
+        Args:
+            start (int, optional): First record. Defaults to 0.
+            stop (int, optional): Record to stop before. Defaults to the end.
+
+        Yields:
+            TurnRecord: The records in order.
+        """
+        with self.raw(start, stop) as view:
+            for values in RECORD.iter_unpack(view):
+                yield TurnRecord._make(values)
+
+    def game_starts(self):
+        """Finds where every game begins.
+
+        Only the flag bytes are read, with one strided slice of the map.
+
+        Returns:
+            list[int]: Record number of each game's first turn.
+        """
+        if self._starts is None:
+            self._starts = []
+            if self._map is not None:
+                end = HEADER_SIZE + self._n_records * RECORD_SIZE
+                flags = self._map[HEADER_SIZE + FLAGS_OFFSET:end:RECORD_SIZE]
+                firsts = flags.translate(_FIRST_TABLE)
+                index = firsts.find(1)
+                while index != -1:
+                    self._starts.append(index)
+                    index = firsts.find(1, index + 1)
+        return self._starts
+
+    def n_seats(self):
+        """Returns the number of seats that moved anywhere in the journal.
+
+        The journal does not store table sizes, so this is the highest seat
+        in any record plus one. Only the seat bytes are read, with strided
+        slices of the map.
+
+        Returns:
+            int: The number of seats, or 0 for an empty journal.
+        """
+        if self._map is None:
+            return 0
+        start = HEADER_SIZE + PLAYER_OFFSET
+        end = HEADER_SIZE + self._n_records * RECORD_SIZE
+        low = self._map[start:end:RECORD_SIZE]
+        high = self._map[start + 1:end:RECORD_SIZE]
+        top = max(high)
+        if not top:
+            return max(low) + 1
+        return max(lo for hi, lo in zip(high, low) if hi == top) + (top << 8) + 1
+
+    def n_games(self):
+        """Returns the number of games in the journal.
+
+        Returns:
+            int: Games with at least one recorded turn.
+        """
+        return len(self.game_starts())
+
+    def game_range(self, game):
+        """Returns the records of one game.
+
+        Args:
+            game (int): Game number within the journal; negative numbers
+                count from the end.
+
+        Returns:
+            tuple[int, int]: First record and the record to stop before.
+
+        Raises:
+            IndexError: If there is no such game.
+        """
+        starts = self.game_starts()
+        start = starts[game]
+        game = game % len(starts)
+        stop = starts[game + 1] if game + 1 < len(starts) else self._n_records
+        return start, stop
+
+    def iter_game(self, game):
+        """Unpacks the turns of one game.
+
+        Args:
+            game (int): Game number within the journal.
+
+        Returns:
+            iterator of TurnRecord: The game's turns in order.
+        """
+        return self.iter_records(*self.game_range(game))
+
+    def to_numpy(self, start=0, stop=None):
+        """Returns records as a NumPy structured array.
+
+        The array is a read-only view of the mapped file, so nothing is
+        copied; copy it to keep it after closing the reader.
+
+        Args:
+            start (int, optional): First record. Defaults to 0.
+            stop (int, optional): Record to stop before. Defaults to the end.
+
+        Returns:
+            numpy.ndarray: Records with the fields of RECORD_DTYPE.
+
+        Raises:
+            ImportError: If NumPy is not installed.
+        """
+        if np is None:
+            raise ImportError("to_numpy needs NumPy")
+        return np.frombuffer(self.raw(start, stop), dtype=RECORD_DTYPE)
+
+    def close(self):
+        """Unmaps and closes the file.
+
+        Arrays from to_numpy must be gone first, as they use the map.
+
+        Side effects:
+            Closes the file.
+        """
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __enter__(self):
+        """Returns the reader for use in a with statement."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Closes the reader at the end of a with statement."""
+        self.close()
+
+
+_FIRST_TABLE = bytes(1 if flags & FLAG_FIRST else 0 for flags in range(256))
+
+
+def append_journals(path, part_paths):
+    """Appends the records of other journals to one, then deletes them.
+
+    Used to join the journals written by simulation workers in game order.
+
+    Args:
+        path (str): The journal to append to; created if missing.
+        part_paths (list[str]): Journals to move into it, in order.
+
+    Side effects:
+        Writes to path and removes the part files.
+    """
+    JournalWriter(path).close()
+    with open(path, "ab") as out:
+        for part in part_paths:
+            with open(part, "rb") as f:
+                _check_header(f.read(HEADER_SIZE), part)
+                shutil.copyfileobj(f, out, 1 << 20)
+            os.remove(part)
+
+
+def summarize(reader):
+    """Describes a journal.
+
+    Args:
+        reader (JournalReader): The journal.
+
+    Returns:
+        str: Multi-line summary.
+    """
+    n_games = reader.n_games()
+    lines = [f"{reader.path}: {len(reader)} turns in {n_games} games, "
+             f"{RECORD_SIZE} bytes per turn"]
+    if n_games:
+        lines.append(f"Average turns per game: {len(reader) / n_games:.1f}")
+    return "\n".join(lines)
+
+
+def format_record(record):
+    """Formats one turn for the terminal.
+
+    Args:
+        record (TurnRecord): The turn.
+
+    Returns:
+        str: One line describing the turn.
+    """
+    if record.card == NO_CARD:
+        move = "draws"
+    else:
+        move = f"plays {CARDS[record.card]}"
+        if record.suit != NO_SUIT:
+            move += f", suit {list(SUIT_INDEX)[record.suit]}"
+    line = f"turn {record.turn:>4}  seat {record.player + 1}  {move}"
+    if record.draws and record.card != NO_CARD:
+        line += f"  ({record.draws} drawn)"
+    if record.flags & FLAG_WIN:
+        line += "  WIN"
+    return line
+
+
+def parse_args(arglist):
+    """Parse command-line arguments.
+
+    Args:
+        arglist (list of str): list of command-line arguments.
+
+    Returns:
+        namespace: a namespace with attributes "path" and "game".
+    """
+    parser = ArgumentParser(description="Summarize a game journal")
+    parser.add_argument("path", help="journal file")
+    parser.add_argument("-g", "--game", type=int, default=None,
+                        help="print the turns of this game")
+    return parser.parse_args(arglist)
+
+
+if __name__ == "__main__":
+    args = parse_args(sys.argv[1:])
+    with JournalReader(args.path) as journal_reader:
+        if args.game is None:
+            print(summarize(journal_reader))
+        else:
+            first = journal_reader.record(journal_reader.game_range(args.game)[0])
+            print(f"Game {args.game}, seed {first.seed}")
+            for turn_record in journal_reader.iter_game(args.game):
+                print(format_record(turn_record))
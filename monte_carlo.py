@@ -0,0 +1,228 @@
+"""Monte Carlo search CPU player.
+
+For every candidate move (each valid card, and each suit for an 8) the player
+plays random games to the end and picks the move that won most often. The
+other players' hands are unknown, so each rollout first determinizes the
+game: the cards the player cannot see (the draw pile plus the other hands)
+are shuffled and dealt back out with the same hand sizes. Rollouts then
+continue with the built-in first-valid CPU policy for every seat.
+"""
+
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from collaborative_assignment_card_game_inst326 import (
+    CARDS, Deck, DeckExhausted, Game, Player)
+
+ROLLOUT_TURNS = 1000
+
+
+def candidate_moves(hand, played_card, current_suit):
+    """Lists the distinct moves a hand can make.
+
+    Args:
+        hand (Hand): The hand to move from.
+        played_card (Card): The card on top of the pile.
+        current_suit (str): The suit to follow.
+
+    Returns:
+        list[tuple]: (card id, suit or None) pairs; an 8 appears once per
+        suit it can switch to.
+    """
+    moves = []
+    seen = set()
+    for card in hand.valid_cards(played_card, current_suit):
+        if card.id in seen:
+            continue
+        seen.add(card.id)
+        if card.ranktype == "8":
+            moves.extend((card.id, suit) for suit in Deck.SUITS)
+        else:
+            moves.append((card.id, None))
+    return moves
+
+
+def determinize(state, seat, rng):
+    """Deals the cards a seat cannot see into a random consistent state.
+
+    Args:
+        state (GameState): The real state of the game.
+        seat (int): The seat whose view is kept.
+        rng (random.Random): Source of the random deal.
+
+    Returns:
+        GameState: The state with other hands and the draw pile resampled.
+    """
+    unseen = bytearray(state.cards)
+    for other, hand in enumerate(state.hands):
+        if other != seat:
+            unseen += hand
+    rng.shuffle(unseen)
+
+    hands = []
+    start = 0
+    for other, hand in enumerate(state.hands):
+        if other == seat:
+            hands.append(hand)
+        else:
+            hands.append(bytes(unseen[start:start + len(hand)]))
+            start += len(hand)
+    return state._replace(cards=bytes(unseen[start:]), hands=tuple(hands))
+
+
+def rollout(state, seat, move, players, rng, max_turns=ROLLOUT_TURNS):
+    """Plays one determinized game to the end after a candidate move.
+
+    Args:
+        state (GameState): The real state, with seat to move.
+        seat (int): The seat making the move.
+        move (tuple): (card id, suit or None) to play first.
+        players (list[Player]): First-valid CPU players to play with, one per
+            seat. Their hands are replaced.
+        rng (random.Random): Source of the deal and of the game's randomness.
+        max_turns (int, optional): Turns after which the rollout counts as a
+            draw. Defaults to ROLLOUT_TURNS.
+
+    Returns:
+        float: 1 if seat wins, 0.5 for a draw, 0 otherwise.
+    """
+    game = Game.from_state(determinize(state, seat, rng), players, rng=rng)
+    card_id, suit = move
+    try:
+        if game.apply_move(CARDS[card_id], suit):
+            return 1.0
+        for _ in range(max_turns):
+            if game.play_turn():
+                return 1.0 if game.winner is players[seat] else 0.0
+    except DeckExhausted:
+        # The deck and the played pile ran out.
+        pass
+    return 0.5
+
+
+def search(state, seat, moves, budget, seed=None):
+    """Runs rollouts round-robin over the moves until the budget is spent.
+
+    Every move gets at least one rollout.
+
+    Args:
+        state (GameState): The real state, with seat to move.
+        seat (int): The seat to move.
+        moves (list[tuple]): Candidate (card id, suit or None) moves.
+        budget (float): Seconds to spend.
+        seed (int, optional): Seed for the rollouts. Defaults to None.
+
+    Returns:
+        tuple[list[float], list[int]]: Total score and rollout count per move.
+    """
+    rng = random.Random(seed)
+    players = [Player(f"Rollout {i + 1}", is_cpu=True)
+               for i in range(len(state.hands))]
+    scores = [0.0] * len(moves)
+    visits = [0] * len(moves)
+    deadline = time.perf_counter() + budget
+    while True:
+        for i, move in enumerate(moves):
+            scores[i] += rollout(state, seat, move, players, rng)
+            visits[i] += 1
+        if time.perf_counter() >= deadline:
+            return scores, visits
+
+
+class MonteCarloPlayer(Player):
+    """A CPU player that picks moves by determinized Monte Carlo rollouts.
+
+    Attributes:
+        budget (float): Seconds of thinking per move.
+        workers (int): Processes the rollouts are spread over.
+        rng (random.Random): Source of the rollout seeds.
+        last_search (dict or None): Scores and rollout counts of the most
+            recent decision, for display and debugging.
+    """
+
+    def __init__(self, name, budget=1.0, workers=1, seed=None):
+        """Creates a Monte Carlo CPU player.
+
+        Args:
+            name (str): The name of the player.
+            budget (float, optional): Seconds per move. Defaults to 1.0.
+            workers (int, optional): Worker processes for rollouts. With one
+                worker rollouts run in this process. Defaults to 1.
+            seed (int, optional): Seed for the rollouts. Defaults to None.
+        """
+        super().__init__(name, is_cpu=True)
+        self.budget = budget
+        self.workers = workers
+        self.rng = random.Random(seed)
+        self.last_search = None
+        self._suit = None
+        self._pool = None
+
+    def choose_card(self, game):
+        """Searches for the move with the best rollout win rate.
+
+        Args:
+            game (Game): The game being played.
+
+        Returns:
+            Card or None: The card to play, or None when nothing is valid.
+
+        Side effects:
+            Remembers the suit to pick if the card is an 8, and starts the
+            worker pool on first use.
+        """
+        moves = candidate_moves(self.hand, game.played_card, game.current_suit)
+        if not moves:
+            return None
+        if len(moves) == 1:
+            card_id, self._suit = moves[0]
+            return CARDS[card_id]
+
+        state = game.snapshot()
+        seat = game.players.index(self)
+        if self.workers > 1:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            futures = [self._pool.submit(search, state, seat, moves,
+                                         self.budget, self.rng.getrandbits(64))
+                       for _ in range(self.workers)]
+            scores = [0.0] * len(moves)
+            visits = [0] * len(moves)
+            for future in futures:
+                part_scores, part_visits = future.result()
+                scores = [a + b for a, b in zip(scores, part_scores)]
+                visits = [a + b for a, b in zip(visits, part_visits)]
+        else:
+            scores, visits = search(state, seat, moves, self.budget,
+                                    self.rng.getrandbits(64))
+
+        rates = [score / count for score, count in zip(scores, visits)]
+        best = max(range(len(moves)), key=rates.__getitem__)
+        self.last_search = {"moves": moves, "win_rates": rates,
+                            "rollouts": sum(visits)}
+        card_id, self._suit = moves[best]
+        return CARDS[card_id]
+
+    def choose_suit(self, game):
+        """Returns the suit picked during the search.
+
+        Args:
+            game (Game): The game being played.
+
+        Returns:
+            str: The suit that came with the chosen 8.
+        """
+        if self._suit is None:
+            return super().choose_suit(game)
+        return self._suit
+
+    def close(self):
+        """Shuts down the worker pool, if one was started.
+
+        Side effects:
+            Stops the worker processes.
+        """
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
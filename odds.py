@@ -0,0 +1,407 @@
+"""Exact odds of playable cards from one player's point of view.
+
+A player sees their own hand and the played pile. Every other card of the
+shoe is unseen, and as far as the player knows each unseen card is equally
+likely to be in any opponent's hand or anywhere in the draw pile. A hand of
+k unseen cards therefore holds no legal card with probability
+
+    C(U - L, k) / C(U, k) = prod over i < k of (U - L - i) / (U - i)
+
+where U is the number of unseen cards and L the number of them that are
+legal (a hypergeometric probability, computed in closed form rather than by
+sampling). The next card_pull is playable with probability L / U.
+
+L comes from one product of the legal-play matrix (one row per top card and
+suit, see LEGAL_MASKS) with the vector of unseen counts, so every candidate
+move is evaluated at once. The odds of all rows are cached by the unseen
+counts and the hand size, and the counts only change when a card is seen,
+so repeated questions during a turn are dictionary lookups.
+
+    python3 odds.py --seed 7 --turns 12
+
+NumPy is required for this file only.
+"""
+
+import sys
+from argparse import ArgumentParser
+from functools import lru_cache
+
+import numpy as np
+
+from collaborative_assignment_card_game_inst326 import (
+    CARDS, LEGAL_MASKS, NULL_SINK, SUIT_INDEX, Deck, DeckExhausted,
+    FirstValidStrategy, Game, Player)
+
+CACHE_SIZE = 4096
+# Extra cards the player after a DRAW 2 CARDS holds when they reply.
+DRAW_2_EXTRA = 2
+
+# Legal-play matrices by id() of their mask tuple. The tuples of
+# LEGAL_MASKS and of cached RuleTables live as long as the program, so their
+# ids are never reused.
+_MATRICES = {}
+
+
+def legal_matrix(masks):
+    """Expands legal-play masks into a 0/1 matrix.
+
+    Args:
+        masks (tuple[int]): Masks laid out like LEGAL_MASKS.
+
+    Returns:
+        numpy.ndarray: matrix[top id * 4 + suit index, card id] is 1 when
+        the card may be played.
+    """
+    entry = _MATRICES.get(id(masks))
+    if entry is None or entry[0] is not masks:
+        matrix = np.array([[mask >> cid & 1 for cid in range(len(CARDS))]
+                           for mask in masks], dtype=np.int64)
+        matrix.flags.writeable = False
+        entry = _MATRICES[id(masks)] = (masks, matrix)
+    return entry[1]
+
+
+def no_legal_probability(legal, unseen, k):
+    """Probability that k cards dealt from the unseen cards are all illegal.
+
+    Args:
+        legal (numpy.ndarray): Legal unseen cards, one count per row.
+        unseen (int): Unseen cards in total.
+        k (int): Cards in the hidden hand; at most unseen are used.
+
+    Returns:
+        numpy.ndarray: The probability for each row, as float64.
+    """
+    k = min(k, unseen)
+    steps = np.arange(k)
+    illegal = (unseen - np.asarray(legal, dtype=np.float64))[..., None]
+    factors = np.clip((illegal - steps) / (unseen - steps), 0.0, None)
+    return factors.prod(axis=-1)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _row_odds(unseen, k, masks_id):
+    """Cached odds that k unseen cards hold a legal card, for every row."""
+    counts = np.frombuffer(unseen, dtype=np.uint8).astype(np.int64)
+    legal = _MATRICES[masks_id][1] @ counts
+    odds = 1.0 - no_legal_probability(legal, int(counts.sum()), k)
+    odds.flags.writeable = False
+    return odds
+
+
+def row_odds(unseen, k, masks=LEGAL_MASKS):
+    """Odds that a hand of k unseen cards can follow each top card and suit.
+
+    Args:
+        unseen (bytes): Unseen copies of each card id.
+        k (int): Cards in the hand.
+        masks (tuple[int], optional): Legal plays. Defaults to LEGAL_MASKS.
+
+    Returns:
+        numpy.ndarray: One probability per row of masks (read-only; results
+        are cached).
+    """
+    legal_matrix(masks)
+    return _row_odds(bytes(unseen), k, id(masks))
+
+
+class PlayerView:
+    """What one player knows about a game, and the odds that follow from it.
+
+    Attributes:
+        hand (Hand): The player's cards.
+        seat (int): The player's seat.
+        played_card (Card): The card on top of the played pile.
+        current_suit (str): The suit to follow.
+        unseen (bytes): Copies of each card id the player has not seen: the
+            shoe minus the hand and the played pile.
+        reload (bytes): Copies of each card id the next reshuffle brings
+            back, i.e. the played pile without its top card.
+        hand_sizes (tuple[int]): Cards held by every seat.
+        direction (int): Direction of play.
+        draw_size (int): Cards in the draw pile.
+        masks (tuple[int]): Legal plays, laid out like LEGAL_MASKS.
+        wild (bytes): 1 for every card id that lets its player pick a suit.
+    """
+
+    def __init__(self, hand, played_cards, current_suit, hand_sizes, seat=0,
+                 direction=1, decks=1, draw_size=None, masks=LEGAL_MASKS,
+                 wild=None, played_counts=None):
+        """Builds the view.
+
+        Args:
+            hand (Hand): The player's cards.
+            played_cards (sequence of Card): The played pile, top last.
+            current_suit (str): The suit to follow.
+            hand_sizes (sequence of int): Cards held by every seat,
+                including this one.
+            seat (int, optional): The player's seat. Defaults to 0.
+            direction (int, optional): Direction of play. Defaults to 1.
+            decks (int, optional): Decks in the shoe. Defaults to 1.
+            draw_size (int, optional): Cards in the draw pile. Defaults to
+                every unseen card not in another hand.
+            masks (tuple[int], optional): Legal plays. Defaults to
+                LEGAL_MASKS.
+            wild (bytes, optional): Wild card ids, see RuleTables.wild.
+                Defaults to the 8s.
+            played_counts (sequence of int, optional): Copies of each card
+                id in played_cards, if already counted (CardPiles keeps
+                them).
+
+        Raises:
+            ValueError: If the cards seen do not fit in the shoe.
+        """
+        if played_counts is None:
+            played_counts = [0] * len(CARDS)
+            for card in played_cards:
+                played_counts[card.id] += 1
+        top = played_cards[-1]
+        unseen = [decks - held - played for held, played
+                  in zip(hand.counts, played_counts)]
+        if min(unseen) < 0:
+            raise ValueError("More copies of a card seen than the shoe holds")
+        reload = list(played_counts)
+        reload[top.id] -= 1
+
+        self.hand = hand
+        self.seat = seat
+        self.played_card = top
+        self.current_suit = current_suit
+        self.unseen = bytes(unseen)
+        self.reload = bytes(reload)
+        self.hand_sizes = tuple(hand_sizes)
+        self.direction = direction
+        if draw_size is None:
+            draw_size = sum(unseen) - (sum(self.hand_sizes)
+                                       - self.hand_sizes[seat])
+        self.draw_size = draw_size
+        self.masks = masks
+        self.wild = wild if wild is not None else bytes(
+            card.action is None and card.ranktype == "8" for card in CARDS)
+
+    @classmethod
+    def from_game(cls, game, seat=None):
+        """Takes a seat's view of a game.
+
+        Only what the seat can see is used: its own hand, the played pile,
+        the size of every hand and of the draw pile.
+
+        Args:
+            game (Game): The game.
+            seat (int, optional): The seat. Defaults to the player to move.
+
+        Returns:
+            PlayerView: The view.
+
+        Raises:
+            ValueError: Under rules that stack DRAW 2 CARDS.
+        """
+        if game.rules.stack_draws:
+            raise ValueError("Odds are not available when DRAW 2 CARDS "
+                             "stack")
+        if seat is None:
+            seat = game.current_player_idx
+        deck = game.deck
+        return cls(game.players[seat].hand, deck.played_cards,
+                   game.current_suit,
+                   [len(player.hand) for player in game.players], seat,
+                   game.direction, deck.decks, deck.piles.n_draw,
+                   game.legal_masks, game.tables.wild,
+                   deck.piles.played_counts)
+
+    def row(self, card_id, suit):
+        """Index of a top card and suit in masks.
+
+        Args:
+            card_id (int): The top card.
+            suit (str): The suit to follow.
+
+        Returns:
+            int: The row.
+        """
+        return card_id << 2 | SUIT_INDEX[suit]
+
+    def draw_odds(self):
+        """Probability that the next card_pull can be played right away.
+
+        Returns:
+            float: The share of legal cards among the unseen ones, or among
+            the cards a reshuffle brings back when the draw pile is empty.
+        """
+        legal_mask = self.masks[self.row(self.played_card.id,
+                                         self.current_suit)]
+        pool = self.reload if not self.draw_size else self.unseen
+        total = sum(pool)
+        if not total:
+            return 0.0
+        legal = sum(count for cid, count in enumerate(pool)
+                    if legal_mask >> cid & 1)
+        return legal / total
+
+    def moves(self):
+        """Lists the distinct moves the player can make.
+
+        Returns:
+            list[tuple]: (card id, suit or None) pairs in hand order; a wild
+            card appears once per suit it can switch to.
+        """
+        legal = self.hand.legal_mask(self.played_card, self.current_suit,
+                                     self.masks)
+        moves = []
+        for card in self.hand.cards:
+            cid = card.id
+            if legal >> cid & 1:
+                legal &= ~(1 << cid)
+                if self.wild[cid]:
+                    moves.extend((cid, suit) for suit in Deck.SUITS)
+                else:
+                    moves.append((cid, None))
+        return moves
+
+    def responder(self, card_id):
+        """Finds who replies to a card and how many cards they will hold.
+
+        Args:
+            card_id (int): The card played by this player.
+
+        Returns:
+            tuple[int, int]: The seat to move next and their hand size then.
+        """
+        n = len(self.hand_sizes)
+        action = CARDS[card_id].action
+        extra = 0
+        if action == "SKIP":
+            seat = (self.seat + 2 * self.direction) % n
+        elif action == "REVERSE":
+            seat = (self.seat - self.direction) % n
+        else:
+            seat = (self.seat + self.direction) % n
+            if action == "DRAW 2 CARDS":
+                extra = DRAW_2_EXTRA
+        return seat, self.hand_sizes[seat] + extra
+
+    def reply_odds(self, moves=None):
+        """Probability that the next player can follow each move.
+
+        The player to move next is found as in Game.apply_action_card; after
+        a DRAW 2 CARDS they reply with two more (unseen) cards. When the turn
+        comes back to this player, the answer is 0 or 1 from their own hand.
+        Jump-ins are not taken into account.
+
+        Args:
+            moves (list[tuple], optional): (card id, suit or None) pairs.
+                Defaults to moves().
+
+        Returns:
+            tuple[list[tuple], numpy.ndarray]: The moves and one
+            probability per move.
+        """
+        if moves is None:
+            moves = self.moves()
+        odds = np.zeros(len(moves))
+        groups = {}
+        for i, (cid, suit) in enumerate(moves):
+            row = self.row(cid, suit or CARDS[cid].suit)
+            seat, k = self.responder(cid)
+            if seat == self.seat:
+                mask = self.hand.mask
+                if self.hand.counts[cid] == 1:
+                    mask &= ~(1 << cid)
+                odds[i] = 1.0 if mask & self.masks[row] else 0.0
+            else:
+                groups.setdefault(k, ([], []))
+                groups[k][0].append(i)
+                groups[k][1].append(row)
+        for k, (index, rows) in groups.items():
+            odds[index] = row_odds(self.unseen, k, self.masks)[rows]
+        return moves, odds
+
+    def best_move(self):
+        """Picks the move the next player is least likely to follow.
+
+        Returns:
+            tuple or None: (card id, suit or None) with the lowest reply
+            odds, the first in hand order on ties, or None when nothing is
+            legal.
+        """
+        moves, odds = self.reply_odds()
+        if not moves:
+            return None
+        return moves[int(odds.argmin())]
+
+
+class OddsStrategy(FirstValidStrategy):
+    """Plays the card, and picks the suit, the next player is least likely to
+    follow, by the exact odds of PlayerView.
+    """
+    name = "odds"
+
+    def choose_card(self, hand, game):
+        """Picks the legal card with the lowest reply odds.
+
+        Args:
+            hand (Hand): The player's cards.
+            game (Game): The game being played.
+
+        Returns:
+            Card or None: The card to play, or None to draw.
+        """
+        move = PlayerView.from_game(game).best_move()
+        return None if move is None else CARDS[move[0]]
+
+    def choose_suit(self, hand, game):
+        """Picks the suit with the lowest reply odds for the wild card played.
+
+        Args:
+            hand (Hand): The player's cards, without the card just played.
+            game (Game): The game being played, with that card on top.
+
+        Returns:
+            str: One of Deck.SUITS.
+        """
+        view = PlayerView.from_game(game)
+        top = game.played_card.id
+        _, odds = view.reply_odds([(top, suit) for suit in Deck.SUITS])
+        return Deck.SUITS[int(odds.argmin())]
+
+
+def parse_args(arglist):
+    """Parse command-line arguments.
+
+    Args:
+        arglist (list of str): list of command-line arguments.
+
+    Returns:
+        namespace: a namespace with attributes "seed", "turns" and
+        "players".
+    """
+    parser = ArgumentParser(description="Print the exact odds of every move "
+                                        "in a CPU game")
+    parser.add_argument("-s", "--seed", type=int, default=1)
+    parser.add_argument("-t", "--turns", type=int, default=10)
+    parser.add_argument("-p", "--players", type=int, default=2)
+    return parser.parse_args(arglist)
+
+
+if __name__ == "__main__":
+    args = parse_args(sys.argv[1:])
+    players = [Player(f"CPU {i + 1}", is_cpu=True)
+               for i in range(args.players)]
+    game = Game(players, NULL_SINK, seed=args.seed)
+    while game.turns < args.turns and game.winner is None:
+        view = PlayerView.from_game(game)
+        print(f"Turn {game.turns + 1}: {players[view.seat].name} on "
+              f"{game.played_card} ({game.current_suit}), "
+              f"{len(view.hand)} cards")
+        moves, odds = view.reply_odds()
+        for (cid, suit), p in zip(moves, odds):
+            choice = f" -> {suit}" if suit else ""
+            print(f"    {str(CARDS[cid]) + choice:32} next player can follow: "
+                  f"{p:6.1%}")
+        if not moves:
+            print(f"    no legal card; the draw is playable: "
+                  f"{view.draw_odds():6.1%}")
+        try:
+            game.play_turn()
+        except DeckExhausted:
+            break
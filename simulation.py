@@ -0,0 +1,334 @@
+"""Headless batch simulation of all-CPU Crazy Eights/Uno games.
+
+Games are played without any terminal I/O and spread across a process pool.
+Game i of a run is seeded with derive_seed(base seed, i), so a run with a
+fixed base seed produces the same results on any number of workers, and any
+single game can be replayed from its seed.
+"""
+
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from collaborative_assignment_card_game_inst326 import (
+    NULL_SINK, DeckExhausted, Game, GameStats, Player, check_shoe,
+    derive_seed)
+from journal import JournalWriter, append_journals
+
+MAX_TURNS = 10000
+CHUNKS_PER_WORKER = 4
+# Larger tables only show the seats with the lowest and highest win rate.
+SEATS_LISTED = 12
+
+
+class SimulationResults:
+    """Aggregated results of a batch of headless games.
+
+    Attributes:
+        n_players (int): Number of players in every game.
+        games (int): Number of games played.
+        wins (list[int]): Games won by each seat.
+        draws (int): Games that ended without a winner, either because the
+            deck could not be reloaded or the turn limit was reached.
+        turns (int): Total turns played over all games.
+        reshuffles (int): Total number of times the played pile was
+            shuffled back into the deck.
+        elapsed (float): Wall-clock seconds spent playing.
+        workers (int): Number of worker processes used.
+        seed (int or None): Base seed of the run.
+        stats (GameStats or None): Merged instrumentation, when profiling.
+    """
+
+    def __init__(self, n_players):
+        """Creates an empty set of results.
+
+        Args:
+            n_players (int): Number of players in every game.
+        """
+        self.n_players = n_players
+        self.games = 0
+        self.wins = [0] * n_players
+        self.draws = 0
+        self.turns = 0
+        self.reshuffles = 0
+        self.elapsed = 0.0
+        self.workers = 1
+        self.seed = None
+        self.stats = None
+
+    def add(self, result):
+        """Adds the outcome of one game.
+
+        Args:
+            result (dict): Game outcome as returned by play_headless_game.
+
+        Side effects:
+            Updates the running totals.
+        """
+        self.games += 1
+        if result["winner"] is None:
+            self.draws += 1
+        else:
+            self.wins[result["winner"]] += 1
+        self.turns += result["turns"]
+        self.reshuffles += result["reshuffles"]
+        if result.get("stats"):
+            self._merge_stats(result["stats"])
+
+    def _merge_stats(self, stats):
+        """Adds game instrumentation to the merged stats.
+
+        Args:
+            stats (GameStats): Stats of a game or of another batch.
+        """
+        if self.stats is None:
+            self.stats = GameStats()
+        self.stats.merge(stats)
+
+    def merge(self, other):
+        """Adds the totals of another batch (e.g. from a worker) to this one.
+
+        Args:
+            other (SimulationResults): Results to merge in.
+
+        Side effects:
+            Updates the running totals.
+        """
+        self.games += other.games
+        self.wins = [a + b for a, b in zip(self.wins, other.wins)]
+        self.draws += other.draws
+        self.turns += other.turns
+        self.reshuffles += other.reshuffles
+        if other.stats:
+            self._merge_stats(other.stats)
+
+    def games_per_second(self):
+        """Returns the overall throughput of the run.
+
+        Returns:
+            float: Games played per wall-clock second.
+        """
+        return self.games / self.elapsed if self.elapsed else 0.0
+
+    def games_per_second_per_core(self):
+        """Returns the throughput of the run divided by the worker count.
+
+        Returns:
+            float: Games played per second per worker process.
+        """
+        return self.games_per_second() / self.workers
+
+    def summary(self):
+        """Formats the results for the terminal.
+
+        Returns:
+            str: Multi-line summary of the run.
+        """
+        lines = [f"Games played: {self.games} (seed {self.seed})"]
+        shares = [wins / self.games if self.games else 0.0
+                  for wins in self.wins]
+        if self.n_players > SEATS_LISTED:
+            low = min(range(self.n_players), key=shares.__getitem__)
+            high = max(range(self.n_players), key=shares.__getitem__)
+            lines.append(f"  Seat wins: lowest seat {low + 1} ({shares[low]:.1%}),"
+                         f" highest seat {high + 1} ({shares[high]:.1%})")
+        else:
+            for seat, wins in enumerate(self.wins):
+                lines.append(f"  Seat {seat + 1} wins: {wins} "
+                             f"({shares[seat]:.1%})")
+        lines.append(f"  Draws: {self.draws}")
+        if self.games:
+            lines.append(f"Average turns per game: {self.turns / self.games:.1f}")
+            lines.append("Average reshuffles per game: "
+                         f"{self.reshuffles / self.games:.2f}")
+        lines.append(f"Elapsed: {self.elapsed:.2f}s on {self.workers} worker(s)")
+        lines.append(f"Throughput: {self.games_per_second():.0f} games/s "
+                     f"({self.games_per_second_per_core():.0f} games/s per core)")
+        return "\n".join(lines)
+
+
+def play_headless_game(n_players=2, max_turns=MAX_TURNS, seed=None,
+                       profile=False, journal=None, keep_moves=False,
+                       decks=None, rules=None):
+    """Plays one all-CPU game with no terminal output.
+
+    Args:
+        n_players (int, optional): Number of CPU players. Defaults to 2.
+        max_turns (int, optional): Turn limit after which the game counts as a
+            draw. Defaults to MAX_TURNS.
+        seed (int, optional): Seed for the game. Defaults to a fresh seed.
+        profile (bool, optional): Instrument the game. Defaults to False.
+        journal (JournalWriter, optional): Records every turn of the game.
+            Defaults to None.
+        keep_moves (bool, optional): Include the game's moves in the result.
+            Defaults to False.
+        decks (int, optional): Decks in the shoe. Defaults to the game's
+            default for the number of players.
+        rules (RuleSet, optional): The rules to play by. Defaults to
+            STANDARD_RULES.
+
+    Returns:
+        dict: "seed", "winner" (seat index or None), "turns" and
+        "reshuffles", plus "stats" (GameStats) when profiling and "moves"
+        (see Game.moves) when keep_moves is set.
+    """
+    players = [Player(f"CPU {i + 1}", is_cpu=True) for i in range(n_players)]
+    game = Game(players, NULL_SINK, seed=seed, profile=profile, decks=decks,
+                rules=rules)
+    if journal is not None:
+        journal.attach(game)
+    try:
+        while game.turns < max_turns:
+            if game.play_turn():
+                break
+    except DeckExhausted:
+        # Both the deck and the played pile ran out; nobody can win.
+        pass
+
+    winner = players.index(game.winner) if game.winner else None
+    result = {"seed": game.seed, "winner": winner, "turns": game.turns,
+              "reshuffles": game.deck.reshuffles}
+    if profile:
+        result["stats"] = game.stats
+    if keep_moves:
+        result["moves"] = game.moves
+    return result
+
+
+def headless_games(n_games, n_players=2, seed=0, first=0,
+                   max_turns=MAX_TURNS):
+    """Plays all-CPU games one after another, as a stream.
+
+    Game i is seeded with derive_seed(seed, i), as in simulate_games.
+
+    Args:
+        n_games (int): Number of games to play.
+        n_players (int, optional): CPU players per game. Defaults to 2.
+        seed (int, optional): Base seed. Defaults to 0.
+        first (int, optional): Index of the first game. Defaults to 0.
+        max_turns (int, optional): Turn limit per game. Defaults to MAX_TURNS.
+
+    Yields:
+        dict: The result of each game, with its moves.
+    """
+    for index in range(first, first + n_games):
+        yield play_headless_game(n_players, max_turns, derive_seed(seed, index),
+                                 keep_moves=True)
+
+
+def split_games(n_games, workers):
+    """Splits a run into chunks, a few per worker.
+
+    Args:
+        n_games (int): Number of games in the run.
+        workers (int): Worker processes.
+
+    Returns:
+        list[tuple[int, int]]: Index of the first game and number of games
+        of every chunk.
+    """
+    n_chunks = min(n_games, workers * CHUNKS_PER_WORKER) or 1
+    chunks = []
+    first = 0
+    for i in range(n_chunks):
+        size = n_games // n_chunks + (1 if i < n_games % n_chunks else 0)
+        chunks.append((first, size))
+        first += size
+    return chunks
+
+
+def _play_chunk(first, n_games, seed, n_players, max_turns, profile,
+                journal=None, decks=None, rules=None):
+    """Plays a chunk of games inside one worker.
+
+    Args:
+        first (int): Index of the first game of the chunk within the run.
+        n_games (int): Number of games to play.
+        seed (int): Base seed of the run.
+        n_players (int): CPU players per game.
+        max_turns (int): Turn limit per game.
+        profile (bool): Whether to instrument the games.
+        journal (str, optional): Journal file for the chunk's turns.
+            Defaults to None.
+        decks (int, optional): Decks in the shoe. Defaults to None.
+        rules (RuleSet, optional): The rules to play by. Defaults to None.
+
+    Returns:
+        SimulationResults: Totals for the chunk.
+    """
+    results = SimulationResults(n_players)
+    writer = JournalWriter(journal) if journal else None
+    try:
+        for index in range(first, first + n_games):
+            results.add(play_headless_game(n_players, max_turns,
+                                           derive_seed(seed, index), profile,
+                                           writer, decks=decks,
+                                           rules=rules))
+    finally:
+        if writer is not None:
+            writer.close()
+    return results
+
+
+def simulate_games(n_games, n_players=2, workers=None, seed=None,
+                   max_turns=MAX_TURNS, profile=False, journal=None,
+                   decks=None, rules=None):
+    """Plays many all-CPU games headlessly across a process pool.
+
+    The games are split into chunks, a few per worker so that slow chunks do
+    not leave cores idle. Every game gets its own seed derived from the base
+    seed, so the aggregated results only depend on the base seed.
+
+    Args:
+        n_games (int): Number of games to play.
+        n_players (int, optional): CPU players per game. Defaults to 2.
+        workers (int, optional): Worker processes. Defaults to all cores.
+            With one worker the games run in the calling process.
+        seed (int, optional): Base seed. Defaults to a fresh seed, which is
+            reported in the results.
+        max_turns (int, optional): Turn limit per game. Defaults to MAX_TURNS.
+        profile (bool, optional): Instrument every game and merge the stats
+            into the results. Defaults to False.
+        journal (str, optional): Journal file to append every turn to, in
+            game order. Each chunk writes its own part file, and the parts
+            are joined at the end. Defaults to None.
+        decks (int, optional): Decks in the shoe. Defaults to the game's
+            default for the number of players.
+        rules (RuleSet, optional): The rules to play by. Defaults to
+            STANDARD_RULES.
+
+    Returns:
+        SimulationResults: Aggregated results, including elapsed time and
+        throughput.
+
+    Raises:
+        ValueError: If decks cannot deal n_players hands (see check_shoe).
+    """
+    if decks is not None:
+        check_shoe(n_players, decks)
+    workers = workers or os.cpu_count() or 1
+    if seed is None:
+        seed = random.getrandbits(64)
+    chunks = []
+    for i, (first, size) in enumerate(split_games(n_games, workers)):
+        part = f"{journal}.part{i}" if journal else None
+        chunks.append((first, size, seed, n_players, max_turns, profile, part,
+                       decks, rules))
+
+    results = SimulationResults(n_players)
+    start = time.perf_counter()
+    if workers == 1:
+        for chunk in chunks:
+            results.merge(_play_chunk(*chunk))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_play_chunk, *chunk) for chunk in chunks]
+            for future in futures:
+                results.merge(future.result())
+    if journal:
+        append_journals(journal, [chunk[6] for chunk in chunks])
+    results.elapsed = time.perf_counter() - start
+    results.workers = workers
+    results.seed = seed
+    return results
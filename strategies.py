@@ -0,0 +1,186 @@
+"""Built-in CPU strategies.
+
+Every strategy is a Strategy from the game module. Card choices work on the
+hand's bitmask of legal card ids, so a decision costs a mask AND plus one
+scan of the hand in draw order, like the first-valid CPU. Questions about the
+hand's make-up (how many 8s, which suit) read the running counts of Hand and
+the played pile instead of scanning anything.
+
+    first-valid        first legal card, random suit (the default CPU)
+    hold-8s            keeps its 8s until nothing else is legal
+    dump-actions       plays SKIP, REVERSE and DRAW 2 CARDS as soon as it can
+    most-common-suit   first legal card; after an 8, the suit it holds most of,
+                       ties going to the suit most seen in the played pile
+    odds               the move the next player is least likely to follow
+                       (odds.py; only when NumPy is installed)
+
+ANALYSIS_STRATEGIES are not fair opponents and are only used when named:
+
+    endgame            solves small heads-up endgames exactly, seeing the
+                       opponent's hand and the draw pile (endgame.py)
+
+Use make_strategy(name) to build one by name, e.g. for Player(name,
+strategy=make_strategy("hold-8s")).
+"""
+
+from collaborative_assignment_card_game_inst326 import (
+    CARDS, FIRST_VALID, Deck, FirstValidStrategy, Strategy)
+from endgame import EndgameStrategy
+
+try:
+    from odds import OddsStrategy
+except ImportError:  # NumPy is only needed for the odds strategy.
+    OddsStrategy = None
+
+EIGHT = Deck.RANKS.index("8")
+EIGHT_MASK = sum(1 << card.id for card in CARDS if card.ranktype == "8")
+ACTION_MASK = sum(1 << card.id for card in CARDS if card.action)
+
+
+def first_in_mask(hand, mask):
+    """Finds the first card of a hand whose id is in a mask.
+
+    Args:
+        hand (Hand): The cards to scan, in draw order.
+        mask (int): Bitmask of card ids.
+
+    Returns:
+        Card or None: The first matching card, if any.
+    """
+    if mask:
+        for card in hand.cards:
+            if mask >> card.id & 1:
+                return card
+    return None
+
+
+def most_common_suit(hand, deck=None):
+    """Finds the suit a hand holds most cards of.
+
+    Args:
+        hand (Hand): The cards to count.
+        deck (Deck, optional): If given, ties go to the suit with the most
+            cards in the played pile, since opponents are then least likely
+            to hold it.
+
+    Returns:
+        str: The suit; remaining ties go to the suit listed first in
+        Deck.SUITS.
+    """
+    sizes = hand.suit_counts
+    most = max(sizes)
+    tied = [suit for suit, size in zip(Deck.SUITS, sizes) if size == most]
+    if deck is None or len(tied) == 1:
+        return tied[0]
+    return max(tied, key=deck.played_count)
+
+
+class HoldEightsStrategy(Strategy):
+    """Plays any legal card but an 8 first, keeping the 8s for emergencies.
+    """
+    name = "hold-8s"
+
+    def choose_card(self, hand, game):
+        """Picks the first legal card that is not an 8, else the first 8.
+
+        Args:
+            hand (Hand): The player's cards.
+            game (Game): The game being played.
+
+        Returns:
+            Card or None: The card to play, or None to draw.
+        """
+        legal = hand.legal_mask(game.played_card, game.current_suit,
+                                game.legal_masks)
+        if not hand.rank_counts[EIGHT]:
+            return first_in_mask(hand, legal)
+        return (first_in_mask(hand, legal & ~EIGHT_MASK)
+                or first_in_mask(hand, legal))
+
+
+class DumpActionsStrategy(Strategy):
+    """Gets rid of action cards first, then plays like hold-8s.
+    """
+    name = "dump-actions"
+
+    def choose_card(self, hand, game):
+        """Picks the first legal action card, else a non-8, else an 8.
+
+        Args:
+            hand (Hand): The player's cards.
+            game (Game): The game being played.
+
+        Returns:
+            Card or None: The card to play, or None to draw.
+        """
+        legal = hand.legal_mask(game.played_card, game.current_suit,
+                                game.legal_masks)
+        if hand.action_count:
+            card = first_in_mask(hand, legal & ACTION_MASK)
+            if card:
+                return card
+        if not hand.rank_counts[EIGHT]:
+            return first_in_mask(hand, legal)
+        return (first_in_mask(hand, legal & ~EIGHT_MASK)
+                or first_in_mask(hand, legal))
+
+
+class MostCommonSuitStrategy(FirstValidStrategy):
+    """Plays the first legal card and changes to the suit it holds most of.
+    """
+    name = "most-common-suit"
+
+    def choose_suit(self, hand, game):
+        """Picks the suit with the most cards in hand, then the most played.
+
+        Args:
+            hand (Hand): The player's cards, without the 8 just played.
+            game (Game): The game being played.
+
+        Returns:
+            str: The most common suit in the hand.
+        """
+        return most_common_suit(hand, game.deck)
+
+
+STRATEGIES = {
+    FIRST_VALID.name: FirstValidStrategy,
+    HoldEightsStrategy.name: HoldEightsStrategy,
+    DumpActionsStrategy.name: DumpActionsStrategy,
+    MostCommonSuitStrategy.name: MostCommonSuitStrategy,
+}
+if OddsStrategy is not None:
+    STRATEGIES[OddsStrategy.name] = OddsStrategy
+
+# Strategies that see hidden cards: never entered by default.
+ANALYSIS_STRATEGIES = {
+    EndgameStrategy.name: EndgameStrategy,
+}
+
+
+def make_strategy(name):
+    """Builds a strategy by name.
+
+    Args:
+        name (str): A key of STRATEGIES or ANALYSIS_STRATEGIES.
+
+    Returns:
+        Strategy: A new instance of that strategy.
+
+    Raises:
+        ValueError: If there is no strategy with that name.
+    """
+    strategy = STRATEGIES.get(name) or ANALYSIS_STRATEGIES.get(name)
+    if strategy is None:
+        raise ValueError(f"Unknown strategy {name!r}; choose from "
+                         f"{', '.join(strategy_names())}")
+    return strategy()
+
+
+def strategy_names():
+    """Lists every strategy that make_strategy can build.
+
+    Returns:
+        list[str]: The names in STRATEGIES, then ANALYSIS_STRATEGIES.
+    """
+    return list(STRATEGIES) + list(ANALYSIS_STRATEGIES)
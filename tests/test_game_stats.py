@@ -0,0 +1,26 @@
+"""Tests for GameStats profiling."""
+
+import unittest
+
+from collaborative_assignment_card_game_inst326 import RULESETS
+from simulation import play_headless_game
+
+
+class ProfiledJumpInTest(unittest.TestCase):
+    """Profiling must not change how a game is played."""
+
+    def test_jump_ins_same_with_and_without_profiling(self):
+        rules = RULESETS["jump-in"]
+        for seed in range(20):
+            plain = play_headless_game(4, seed=seed, keep_moves=True,
+                                       decks=2, rules=rules)
+            profiled = play_headless_game(4, seed=seed, keep_moves=True,
+                                          decks=2, rules=rules, profile=True)
+            self.assertEqual(plain["winner"], profiled["winner"])
+            self.assertEqual(plain["turns"], profiled["turns"])
+            self.assertEqual(plain["moves"], profiled["moves"])
+            self.assertEqual(profiled["stats"].turns, profiled["turns"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+"""Tests for recording and replaying games."""
+
+import builtins
+import contextlib
+import io
+import json
+import unittest
+from unittest import mock
+
+from collaborative_assignment_card_game_inst326 import (
+    NULL_SINK, RULESETS, DeckExhausted, Game, Player, replay_game)
+from strategies import make_strategy
+
+MAX_TURNS = 2000
+
+
+def play(game):
+    """Plays a game to the end or MAX_TURNS."""
+    try:
+        while game.turns < MAX_TURNS and not game.play_turn():
+            pass
+    except DeckExhausted:
+        pass
+
+
+class ScriptedInput:
+    """Answers the human prompts: alternates jump-in answers, plays the
+    first valid card and picks the first suit."""
+
+    def __init__(self):
+        self.asked = 0
+        self.declined = 0
+
+    def __call__(self, prompt=""):
+        if "Jump in" in prompt:
+            self.asked += 1
+            if self.asked % 2:
+                self.declined += 1
+                return "n"
+            return "y"
+        return "1"
+
+
+class ReplayJumpInTest(unittest.TestCase):
+    """Replays must reproduce jump-ins that humans took or declined."""
+
+    def test_human_declining_jump_ins_replays(self):
+        declined = 0
+        for seed in range(10):
+            answers = ScriptedInput()
+            players = [Player("H1"), Player("CPU 1", is_cpu=True),
+                       Player("CPU 2", is_cpu=True)]
+            game = Game(players, NULL_SINK, seed=seed, decks=2,
+                        rules=RULESETS["jump-in"])
+            with mock.patch.object(builtins, "input", answers), \
+                    contextlib.redirect_stdout(io.StringIO()):
+                play(game)
+            declined += answers.declined
+            recording = game.recording()
+            replayed = None
+            for replayed in replay_game(recording):
+                pass
+            self.assertEqual(replayed.moves, game.moves)
+            self.assertEqual(replayed.winner is None, game.winner is None)
+        self.assertGreater(declined, 0)
+
+
+class RoundTripTest(unittest.TestCase):
+    """Recordings saved as JSON replay to the same game."""
+
+    def round_trip(self, game):
+        """Replays a finished game from its JSON recording."""
+        recording = json.loads(json.dumps(game.recording()))
+        replayed = None
+        for replayed in replay_game(recording):
+            pass
+        self.assertEqual(replayed.moves, game.moves)
+        self.assertEqual(replayed.snapshot(), game.snapshot())
+
+    def test_rule_variants_with_a_human(self):
+        for rules in ("jump-in", "stacking", "house"):
+            for seed in range(5):
+                with self.subTest(rules=rules, seed=seed):
+                    players = [Player("CPU 1", is_cpu=True), Player("H1"),
+                               Player("CPU 2", strategy=make_strategy(
+                                   "hold-8s"))]
+                    game = Game(players, NULL_SINK, seed=seed, decks=2,
+                                rules=RULESETS[rules])
+                    with mock.patch.object(builtins, "input",
+                                           ScriptedInput()), \
+                            contextlib.redirect_stdout(io.StringIO()):
+                        play(game)
+                    self.round_trip(game)
+
+    def test_rule_variants_all_cpu(self):
+        for rules in ("jump-in", "stacking", "house"):
+            for seed in range(5):
+                with self.subTest(rules=rules, seed=seed):
+                    players = [Player(f"CPU {i + 1}", is_cpu=True)
+                               for i in range(4)]
+                    game = Game(players, NULL_SINK, seed=seed,
+                                rules=RULESETS[rules])
+                    play(game)
+                    self.round_trip(game)
+
+
+if __name__ == "__main__":
+    unittest.main()
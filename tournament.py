@@ -0,0 +1,265 @@
+"""Round-robin tournaments between CPU strategies.
+
+Every pair of strategies plays the same number of heads-up games. Game k of
+every pairing is dealt from derive_seed(seed, k // 2), and each deal is
+played twice with the seats swapped, so all pairings face the same deals and
+neither strategy profits from moving first. The games are spread over a
+process pool; the results are a win matrix and Elo ratings.
+
+    python3 tournament.py -n 2000 --seed 1
+    python3 tournament.py first-valid hold-8s -n 10000
+"""
+
+import math
+import os
+import random
+import sys
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+
+from collaborative_assignment_card_game_inst326 import (
+    NULL_SINK, DeckExhausted, Game, Player, derive_seed)
+from simulation import MAX_TURNS, split_games
+from strategies import STRATEGIES, make_strategy, strategy_names
+
+ELO_BASE = 1500
+ELO_SCALE = 400
+
+
+def play_pairing(names, first, n_games, seed, max_turns=MAX_TURNS):
+    """Plays a chunk of heads-up games between two strategies.
+
+    Args:
+        names (tuple[str, str]): The two strategies.
+        first (int): Index of the first game within the pairing.
+        n_games (int): Number of games to play.
+        seed (int): Base seed of the tournament.
+        max_turns (int, optional): Turn limit per game. Defaults to MAX_TURNS.
+
+    Returns:
+        tuple[int, int, int]: Wins of the first strategy, wins of the second
+        and draws.
+    """
+    strategies = [make_strategy(name) for name in names]
+    wins = [0, 0]
+    draws = 0
+    for index in range(first, first + n_games):
+        order = (1, 0) if index % 2 else (0, 1)
+        players = [Player(names[side], strategy=strategies[side])
+                   for side in order]
+        game = Game(players, NULL_SINK, seed=derive_seed(seed, index // 2))
+        try:
+            while game.turns < max_turns:
+                if game.play_turn():
+                    break
+        except DeckExhausted:
+            # Both the deck and the played pile ran out; nobody can win.
+            pass
+        if game.winner is None:
+            draws += 1
+        else:
+            wins[order[players.index(game.winner)]] += 1
+    return wins[0], wins[1], draws
+
+
+def elo_ratings(wins, draws):
+    """Fits Elo ratings to a win matrix (Bradley-Terry model).
+
+    Every pairing gets one extra virtual draw, so a strategy that never
+    wins still gets a finite rating.
+
+    Args:
+        wins (list[list[int]]): wins[i][j] is the games i won against j.
+        draws (list[list[int]]): draws[i][j] is the drawn games of i and j.
+
+    Returns:
+        list[float]: Rating of each strategy, averaging ELO_BASE.
+    """
+    n = len(wins)
+    games = [[wins[i][j] + wins[j][i] + draws[i][j] + (i != j)
+              for j in range(n)] for i in range(n)]
+    scores = [sum(wins[i][j] + (draws[i][j] + (i != j)) / 2
+                  for j in range(n) if j != i) for i in range(n)]
+    strength = [1.0] * n
+    for _ in range(10000):
+        updated = [scores[i] / sum(games[i][j] / (strength[i] + strength[j])
+                                   for j in range(n) if j != i)
+                   if n > 1 else 1.0 for i in range(n)]
+        scale = math.exp(sum(math.log(s) for s in updated) / n)
+        updated = [s / scale for s in updated]
+        change = max(abs(a - b) for a, b in zip(updated, strength))
+        strength = updated
+        if change < 1e-12:
+            break
+    return [ELO_BASE + ELO_SCALE * math.log10(s) for s in strength]
+
+
+class TournamentResults:
+    """Outcome of a round-robin tournament.
+
+    Attributes:
+        names (list[str]): The strategies.
+        games (int): Games per pairing.
+        wins (list[list[int]]): wins[i][j] is the games i won against j.
+        draws (list[list[int]]): draws[i][j] is the drawn games of i and j.
+        seed (int): Base seed of the deals.
+        elapsed (float): Wall-clock seconds spent playing.
+        workers (int): Number of worker processes used.
+    """
+
+    def __init__(self, names, games, seed):
+        """Creates empty results.
+
+        Args:
+            names (list[str]): The strategies.
+            games (int): Games per pairing.
+            seed (int): Base seed of the deals.
+        """
+        self.names = names
+        self.games = games
+        self.seed = seed
+        n = len(names)
+        self.wins = [[0] * n for _ in range(n)]
+        self.draws = [[0] * n for _ in range(n)]
+        self.elapsed = 0.0
+        self.workers = 1
+
+    def add(self, i, j, result):
+        """Adds the outcome of a chunk of games between two strategies.
+
+        Args:
+            i (int): Index of the first strategy.
+            j (int): Index of the second strategy.
+            result (tuple[int, int, int]): Output of play_pairing.
+
+        Side effects:
+            Updates the matrices.
+        """
+        wins_i, wins_j, draws = result
+        self.wins[i][j] += wins_i
+        self.wins[j][i] += wins_j
+        self.draws[i][j] += draws
+        self.draws[j][i] += draws
+
+    def ratings(self):
+        """Returns the Elo rating of every strategy.
+
+        Returns:
+            list[float]: Ratings in the order of names.
+        """
+        return elo_ratings(self.wins, self.draws)
+
+    def summary(self):
+        """Formats the win matrix and the ratings for the terminal.
+
+        Returns:
+            str: Multi-line report. Each cell is the share of games the row
+            strategy won against the column strategy.
+        """
+        width = max(len(name) for name in self.names) + 2
+        lines = [f"{self.games} games per pairing (seed {self.seed})",
+                 " " * width + "".join(f"{name:>{width}}"
+                                       for name in self.names)]
+        for i, name in enumerate(self.names):
+            cells = []
+            for j in range(len(self.names)):
+                played = self.wins[i][j] + self.wins[j][i] + self.draws[i][j]
+                cells.append(f"{'-':>{width}}" if i == j or not played else
+                             f"{self.wins[i][j] / played:>{width}.1%}")
+            lines.append(f"{name:<{width}}" + "".join(cells))
+        lines.append("Elo ratings:")
+        ratings = self.ratings()
+        for i in sorted(range(len(self.names)), key=lambda i: -ratings[i]):
+            lines.append(f"  {self.names[i]:<{width}}{ratings[i]:7.0f}")
+        lines.append(f"Elapsed: {self.elapsed:.2f}s on {self.workers} "
+                     "worker(s)")
+        return "\n".join(lines)
+
+
+def run_tournament(names=None, games=1000, workers=None, seed=None,
+                   max_turns=MAX_TURNS):
+    """Plays every pair of strategies against each other.
+
+    Args:
+        names (list[str], optional): Strategies to enter. Defaults to all of
+            STRATEGIES; ANALYSIS_STRATEGIES only play when named.
+        games (int, optional): Games per pairing, rounded up to an even
+            number so every deal is played from both seats. Defaults to 1000.
+        workers (int, optional): Worker processes. Defaults to all cores.
+            With one worker the games run in the calling process.
+        seed (int, optional): Base seed of the deals. Defaults to a fresh
+            seed, which is reported in the results.
+        max_turns (int, optional): Turn limit per game. Defaults to MAX_TURNS.
+
+    Returns:
+        TournamentResults: The win matrix, draws and timing.
+
+    Raises:
+        ValueError: If a strategy name is unknown.
+    """
+    names = list(names or STRATEGIES)
+    for name in names:
+        make_strategy(name)
+    games += games % 2
+    workers = workers or os.cpu_count() or 1
+    if seed is None:
+        seed = random.getrandbits(64)
+    results = TournamentResults(names, games, seed)
+    tasks = [(i, j, first, size)
+             for i, j in combinations(range(len(names)), 2)
+             for first, size in split_games(games, workers)]
+
+    start = time.perf_counter()
+    if workers == 1:
+        for i, j, first, size in tasks:
+            results.add(i, j, play_pairing((names[i], names[j]), first, size,
+                                           seed, max_turns))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [(i, j, pool.submit(play_pairing, (names[i], names[j]),
+                                          first, size, seed, max_turns))
+                       for i, j, first, size in tasks]
+            for i, j, future in futures:
+                results.add(i, j, future.result())
+    results.elapsed = time.perf_counter() - start
+    results.workers = workers
+    return results
+
+
+def parse_args(arglist):
+    """Parse command-line arguments.
+
+    Args:
+        arglist (list of str): list of command-line arguments.
+
+    Returns:
+        namespace: a namespace with attributes "strategies", "games",
+        "workers" and "seed".
+    """
+    parser = ArgumentParser(description="Round-robin tournament between CPU "
+                                        "strategies")
+    parser.add_argument("strategies", nargs="*",
+                        help="strategies to enter, from "
+                             f"{', '.join(strategy_names())} (default: "
+                             f"{', '.join(STRATEGIES)})")
+    parser.add_argument("-n", "--games", type=int, default=1000,
+                        help="games per pairing")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="worker processes (default: all cores)")
+    parser.add_argument("-s", "--seed", type=int, default=None,
+                        help="base seed for reproducible runs")
+    args = parser.parse_args(arglist)
+    unknown = [name for name in args.strategies
+               if name not in strategy_names()]
+    if unknown:
+        parser.error(f"unknown strategy {', '.join(map(repr, unknown))}; "
+                     f"choose from {', '.join(strategy_names())}")
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args(sys.argv[1:])
+    print(run_tournament(args.strategies, args.games, args.workers,
+                         args.seed).summary())
@@ -0,0 +1,425 @@
+"""Vectorized engine that plays a batch of CPU games in lockstep with NumPy.
+
+Every game in the batch is held as rows of NumPy arrays: the draw pile and
+played pile as card ids, each player's hand as the turn a card was drawn on,
+plus the top card, current suit, direction and current player. One call to
+VectorGames.step plays one turn in every unfinished game, with SKIP, REVERSE,
+DRAW 2 CARDS and the wild 8 applied through masks.
+
+The rules match Game.play_turn and Game.apply_action_card for the built-in
+CPU policy: play the first valid card in hand order, pick a random suit after
+an 8, and draw one card when nothing is valid.
+"""
+
+import random
+import sys
+import time
+from argparse import ArgumentParser
+
+import numpy as np
+
+from collaborative_assignment_card_game_inst326 import (
+    CARDS, DECK_TEMPLATE, LEGAL_MASKS, SUIT_INDEX, Deck)
+from simulation import MAX_TURNS, SimulationResults, simulate_games
+
+N_CARDS = len(CARDS)
+HAND_SIZE = 7
+NOT_HELD = np.iinfo(np.int32).max
+
+NO_ACTION, SKIP, DRAW_2, REVERSE = 0, 1, 2, 3
+_ACTION_CODES = {"SKIP": SKIP, "DRAW 2 CARDS": DRAW_2, "REVERSE": REVERSE}
+
+TEMPLATE_IDS = np.array([card.id for card in DECK_TEMPLATE], dtype=np.int64)
+CARD_SUIT = np.array([card.id >> 4 for card in CARDS], dtype=np.int64)
+IS_EIGHT = np.array([card.action is None and card.ranktype == "8"
+                     for card in CARDS])
+IS_ACTION = np.array([card.action is not None for card in CARDS])
+ACTION_KIND = np.array([_ACTION_CODES.get(card.action, NO_ACTION)
+                        for card in CARDS], dtype=np.int64)
+# LEGAL[top id * 4 + suit index] is a boolean row over card ids.
+LEGAL = np.array([[mask >> cid & 1 for cid in range(N_CARDS)]
+                  for mask in LEGAL_MASKS], dtype=bool)
+
+
+class VectorGames:
+    """A batch of independent CPU games advanced in lockstep.
+
+    Attributes:
+        n_games (int): Number of games in the batch.
+        n_players (int): Players per game.
+        rng (numpy.random.Generator): Source of shuffles and suit picks.
+        draw (ndarray): Draw pile card ids per game; the top is at
+            n_draw - 1, matching Deck.card_pull popping from the end.
+        n_draw (ndarray): Cards left in each draw pile.
+        played (ndarray): Played pile card ids per game, top at n_played - 1.
+        n_played (ndarray): Cards in each played pile.
+        hands (ndarray): hands[g, p, cid] is the draw order of card cid in
+            player p's hand, or NOT_HELD. The smallest value is the first
+            card in hand order.
+        hand_size (ndarray): Number of cards in each hand.
+        clock (ndarray): Next draw-order value per game.
+        top (ndarray): Top card id per game.
+        suit (ndarray): Current suit index per game.
+        direction (ndarray): 1 or -1 per game.
+        current (ndarray): Index of the player to move per game.
+        done (ndarray): Whether each game has finished.
+        winner (ndarray): Winning player per game, or -1.
+        turns (ndarray): Turns played per game.
+        reshuffles (ndarray): Played-pile reloads per game.
+    """
+
+    def __init__(self, n_games, n_players=2, seed=None):
+        """Shuffles, picks a starting card and deals 7 cards in every game.
+
+        Args:
+            n_games (int): Number of games in the batch.
+            n_players (int, optional): Players per game. Defaults to 2.
+            seed (int, optional): Seed for the batch. Defaults to None.
+
+        Raises:
+            ValueError: If the deck is too small to deal to every player.
+        """
+        if n_players * HAND_SIZE >= N_CARDS:
+            raise ValueError("Not enough cards to deal to every player")
+        self.n_games = n_games
+        self.n_players = n_players
+        self.rng = np.random.default_rng(seed)
+        rows = np.arange(n_games)
+
+        self.draw = TEMPLATE_IDS[self.rng.random((n_games, N_CARDS))
+                                 .argsort(axis=1)]
+        self.n_draw = np.full(n_games, N_CARDS, dtype=np.int64)
+        self.played = np.zeros((n_games, N_CARDS), dtype=np.int64)
+        self.n_played = np.zeros(n_games, dtype=np.int64)
+        self.hands = np.full((n_games, n_players, N_CARDS), NOT_HELD,
+                             dtype=np.int32)
+        self.hand_size = np.zeros((n_games, n_players), dtype=np.int64)
+        self.clock = np.zeros(n_games, dtype=np.int32)
+        self.direction = np.ones(n_games, dtype=np.int64)
+        self.current = np.zeros(n_games, dtype=np.int64)
+        self.done = np.zeros(n_games, dtype=bool)
+        self.winner = np.full(n_games, -1, dtype=np.int64)
+        self.turns = np.zeros(n_games, dtype=np.int64)
+        self.reshuffles = np.zeros(n_games, dtype=np.int64)
+
+        # Deck.start_game: an action card goes back and the deck reshuffles.
+        retry = rows[IS_ACTION[self.draw[:, -1]]]
+        while len(retry):
+            self.draw[retry] = self.draw[retry][
+                np.arange(len(retry))[:, None],
+                self.rng.random((len(retry), N_CARDS)).argsort(axis=1)]
+            retry = retry[IS_ACTION[self.draw[retry, -1]]]
+        self.top = self.draw[:, -1].copy()
+        self.n_draw -= 1
+        self.played[:, 0] = self.top
+        self.n_played[:] = 1
+        self.suit = CARD_SUIT[self.top]
+
+        for player in range(n_players):
+            self._draw(rows, np.full(n_games, player), HAND_SIZE)
+
+    @classmethod
+    def from_states(cls, states, seed=None):
+        """Builds a batch that continues games captured with Game.snapshot.
+
+        Args:
+            states (list[GameState]): One state per game, all with the same
+                number of players, one 64-card deck and no stacked draws.
+            seed (int, optional): Seed for the batch's random choices.
+                Defaults to None.
+
+        Returns:
+            VectorGames: The batch, with hand order kept as in the states.
+
+        Raises:
+            ValueError: If a state does not fit the vectorized engine.
+        """
+        n_games = len(states)
+        n_players = len(states[0].hands) if states else 2
+        batch = cls.__new__(cls)
+        batch.n_games = n_games
+        batch.n_players = n_players
+        batch.rng = np.random.default_rng(seed)
+        batch.draw = np.zeros((n_games, N_CARDS), dtype=np.int64)
+        batch.n_draw = np.zeros(n_games, dtype=np.int64)
+        batch.played = np.zeros((n_games, N_CARDS), dtype=np.int64)
+        batch.n_played = np.zeros(n_games, dtype=np.int64)
+        batch.hands = np.full((n_games, n_players, N_CARDS), NOT_HELD,
+                              dtype=np.int32)
+        batch.hand_size = np.zeros((n_games, n_players), dtype=np.int64)
+        batch.clock = np.zeros(n_games, dtype=np.int32)
+        batch.top = np.zeros(n_games, dtype=np.int64)
+        batch.suit = np.zeros(n_games, dtype=np.int64)
+        batch.direction = np.zeros(n_games, dtype=np.int64)
+        batch.current = np.zeros(n_games, dtype=np.int64)
+        batch.done = np.zeros(n_games, dtype=bool)
+        batch.winner = np.full(n_games, -1, dtype=np.int64)
+        batch.turns = np.zeros(n_games, dtype=np.int64)
+        batch.reshuffles = np.zeros(n_games, dtype=np.int64)
+        for g, state in enumerate(states):
+            ids = (bytes(state.cards) + bytes(state.played_cards)
+                   + b"".join(map(bytes, state.hands)))
+            if (len(state.hands) != n_players or state.pending_draws
+                    or sorted(ids) != list(range(N_CARDS))):
+                raise ValueError(f"State {g} does not fit the vectorized "
+                                 "engine")
+            batch.draw[g, :len(state.cards)] = list(state.cards)
+            batch.n_draw[g] = len(state.cards)
+            batch.played[g, :len(state.played_cards)] = list(state.played_cards)
+            batch.n_played[g] = len(state.played_cards)
+            for p, hand in enumerate(state.hands):
+                batch.hands[g, p, list(hand)] = np.arange(len(hand))
+                batch.hand_size[g, p] = len(hand)
+            batch.clock[g] = max(map(len, state.hands))
+            batch.top[g] = state.played_cards[-1]
+            batch.suit[g] = SUIT_INDEX[state.current_suit]
+            batch.direction[g] = state.direction
+            batch.current[g] = state.current_player_idx
+            batch.turns[g] = state.turns
+            batch.reshuffles[g] = state.reshuffles
+            if state.winner is not None:
+                batch.done[g] = True
+                batch.winner[g] = state.winner
+        return batch
+
+    def _reload_order(self, games, count):
+        """Picks the order of the reshuffled cards.
+
+        Args:
+            games (ndarray): Games being reshuffled.
+            count (ndarray): Played cards going back, per game.
+
+        Returns:
+            ndarray: Per game, positions in the played pile; the first count
+            of them become the new draw pile, bottom first.
+        """
+        keys = self.rng.random((len(games), N_CARDS))
+        keys[np.arange(N_CARDS) >= count[:, None]] = 2.0
+        return keys.argsort(axis=1)
+
+    def _pick_suits(self, games):
+        """Picks the new suit in games where an 8 was just played.
+
+        Args:
+            games (ndarray): Those games.
+
+        Returns:
+            ndarray: A suit index per game.
+        """
+        return self.rng.integers(0, len(Deck.SUITS), len(games))
+
+    def _reload(self, games):
+        """Shuffles the played pile, minus its top card, into the draw pile.
+
+        Args:
+            games (ndarray): Games whose draw pile is empty and whose played
+                pile holds more than one card.
+
+        Side effects:
+            Replaces the draw pile and leaves only the top played card.
+        """
+        count = self.n_played[games] - 1
+        order = self._reload_order(games, count)
+        self.draw[games] = np.take_along_axis(self.played[games], order, 1)
+        self.n_draw[games] = count
+        self.played[games, 0] = self.played[games, count]
+        self.n_played[games] = 1
+        self.reshuffles[games] += 1
+
+    def _draw(self, games, players, count):
+        """Moves cards from the draw pile into hands, reloading when needed.
+
+        A game whose draw pile and played pile are both exhausted stalls, the
+        way Deck.reload_played_cards raises ValueError, and ends as a draw.
+
+        Args:
+            games (ndarray): Games in which a player draws.
+            players (ndarray): The drawing player in each of those games.
+            count (int): Cards each of them draws.
+
+        Side effects:
+            Updates piles, hands and, for stalled games, done.
+        """
+        for _ in range(count):
+            empty = self.n_draw[games] == 0
+            if empty.any():
+                stuck = empty & (self.n_played[games] <= 1)
+                self.done[games[stuck]] = True
+                self._reload(games[empty & ~stuck])
+                games, players = games[~stuck], players[~stuck]
+            self.n_draw[games] -= 1
+            cards = self.draw[games, self.n_draw[games]]
+            self.hands[games, players, cards] = self.clock[games]
+            self.clock[games] += 1
+            self.hand_size[games, players] += 1
+
+    def step(self):
+        """Plays one turn in every unfinished game.
+
+        Returns:
+            int: Number of games that were still running.
+
+        Side effects:
+            Updates every array of the unfinished games.
+        """
+        games = np.flatnonzero(~self.done)
+        if not len(games):
+            return 0
+        self.turns[games] += 1
+        players = self.current[games]
+        hands = self.hands[games, players]
+        legal = (hands != NOT_HELD) & LEGAL[self.top[games] << 2
+                                            | self.suit[games]]
+        has_play = legal.any(axis=1)
+        choice = np.where(legal, hands, NOT_HELD).argmin(axis=1)
+        following = (players + self.direction[games]) % self.n_players
+
+        # No valid card: draw one and pass the turn. A game that runs out
+        # of cards stops before the turn passes, as Game.apply_move does.
+        stuck = ~has_play
+        drawing = games[stuck]
+        self._draw(drawing, players[stuck], 1)
+        self.current[drawing] = np.where(self.done[drawing],
+                                         self.current[drawing], following[stuck])
+
+        games, players = games[has_play], players[has_play]
+        cards, following = choice[has_play], following[has_play]
+        self.hands[games, players, cards] = NOT_HELD
+        self.hand_size[games, players] -= 1
+        self.played[games, self.n_played[games]] = cards
+        self.n_played[games] += 1
+        self.top[games] = cards
+
+        suits = CARD_SUIT[cards]
+        eights = IS_EIGHT[cards]
+        suits[eights] = self._pick_suits(games[eights])
+        self.suit[games] = suits
+
+        kind = ACTION_KIND[cards]
+        after = following.copy()
+        skip = kind == SKIP
+        after[skip] = (following[skip]
+                       + self.direction[games[skip]]) % self.n_players
+        reverse = kind == REVERSE
+        self.direction[games[reverse]] *= -1
+        after[reverse] = (players[reverse]
+                          + self.direction[games[reverse]]) % self.n_players
+        self.current[games] = after
+        draw_2 = kind == DRAW_2
+        self._draw(games[draw_2], following[draw_2], 2)
+        stalled = draw_2 & self.done[games]
+        self.current[games[stalled]] = players[stalled]
+
+        won = (self.hand_size[games, players] == 0) & ~self.done[games]
+        self.done[games[won]] = True
+        self.winner[games[won]] = players[won]
+        return len(games) + int(stuck.sum())
+
+    def run(self, max_turns=MAX_TURNS):
+        """Plays every game to the end or to the turn limit.
+
+        Args:
+            max_turns (int, optional): Turn limit after which unfinished games
+                count as draws. Defaults to MAX_TURNS.
+
+        Returns:
+            VectorGames: This batch, for chaining.
+        """
+        for _ in range(max_turns):
+            if not self.step():
+                break
+        self.done[:] = True
+        return self
+
+    def results(self):
+        """Aggregates the batch the same way simulate_games does.
+
+        Returns:
+            SimulationResults: Wins, draws, turns and reshuffles.
+        """
+        results = SimulationResults(self.n_players)
+        results.games = self.n_games
+        results.wins = np.bincount(self.winner[self.winner >= 0],
+                                   minlength=self.n_players).tolist()
+        results.draws = int((self.winner < 0).sum())
+        results.turns = int(self.turns.sum())
+        results.reshuffles = int(self.reshuffles.sum())
+        return results
+
+
+def simulate_vectorized(n_games, n_players=2, seed=None, batch_size=10000,
+                        max_turns=MAX_TURNS):
+    """Plays many CPU games with the vectorized engine, in batches.
+
+    Args:
+        n_games (int): Number of games to play.
+        n_players (int, optional): Players per game. Defaults to 2.
+        seed (int, optional): Seed for the run. Defaults to a fresh seed.
+        batch_size (int, optional): Games advanced in lockstep at once.
+            Defaults to 10000.
+        max_turns (int, optional): Turn limit per game. Defaults to MAX_TURNS.
+
+    Returns:
+        SimulationResults: Aggregated results, including elapsed time.
+    """
+    if seed is None:
+        seed = random.getrandbits(64)
+    seeds = np.random.SeedSequence(seed).spawn(
+        (n_games + batch_size - 1) // batch_size)
+    results = SimulationResults(n_players)
+    results.seed = seed
+    start = time.perf_counter()
+    for i, batch_seed in enumerate(seeds):
+        size = min(batch_size, n_games - i * batch_size)
+        batch = VectorGames(size, n_players, batch_seed)
+        results.merge(batch.run(max_turns).results())
+    results.elapsed = time.perf_counter() - start
+    return results
+
+
+def benchmark(n_games=20000, n_players=2, seed=None):
+    """Times the vectorized engine against the object-based Game loop.
+
+    Both engines play n_games games in one process, so the numbers compare
+    per-core throughput.
+
+    Args:
+        n_games (int, optional): Games per engine. Defaults to 20000.
+        n_players (int, optional): Players per game. Defaults to 2.
+        seed (int, optional): Seed for both runs. Defaults to None.
+
+    Returns:
+        tuple[SimulationResults, SimulationResults]: Vectorized and
+        object-based results.
+    """
+    vectorized = simulate_vectorized(n_games, n_players, seed)
+    reference = simulate_games(n_games, n_players, workers=1, seed=seed)
+    return vectorized, reference
+
+
+def parse_args(arglist):
+    """Parse command-line arguments.
+
+    Args:
+        arglist (list of str): list of command-line arguments.
+
+    Returns:
+        namespace: a namespace with attributes "games", "players" and "seed".
+    """
+    parser = ArgumentParser(description="Benchmark the vectorized engine "
+                                        "against the Game loop")
+    parser.add_argument("-n", "--games", type=int, default=20000)
+    parser.add_argument("-p", "--players", type=int, default=2)
+    parser.add_argument("-s", "--seed", type=int, default=None)
+    return parser.parse_args(arglist)
+
+
+if __name__ == "__main__":
+    args = parse_args(sys.argv[1:])
+    vectorized, reference = benchmark(args.games, args.players, args.seed)
+    print("Vectorized engine")
+    print(vectorized.summary())
+    print("\nGame loop")
+    print(reference.summary())
+    print(f"\nSpeedup: "
+          f"{vectorized.games_per_second() / reference.games_per_second():.1f}x")